@@ -0,0 +1,116 @@
+"""Compare the vectorized evaluator against the original scalar matching loop.
+
+Usage::
+
+    python benchmarks/bench_evaluator.py --images 50 --boxes 300
+
+Both implementations run on the same random crowded images; the script
+checks that TP/FP/FN counts and confusion matrices are identical and prints
+the timings.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.datasets.xml_loader import Annotation, Box  # noqa: E402
+from src.metrics.evaluator import Evaluator, iou  # noqa: E402
+
+
+def scalar_counts(annotations, predictions, labels, iou_threshold):
+    """Reference implementation: the nested Python loop used before."""
+    labels = list(labels) + ["background"]
+    bg_idx = len(labels) - 1
+    idx = {l: i for i, l in enumerate(labels)}
+    confusion = [[0 for _ in labels] for _ in labels]
+    tp = fp = fn = 0
+    for ann in annotations:
+        gts = ann.boxes
+        preds = predictions.get(ann.image_path, [])
+        matched_gt: set[int] = set()
+        for pred in preds:
+            best_i = 0.0
+            best_j = -1
+            for j, gt in enumerate(gts):
+                if j in matched_gt:
+                    continue
+                iv = iou(pred, gt)
+                if iv >= iou_threshold and iv > best_i:
+                    best_i = iv
+                    best_j = j
+            p_idx = idx.get(pred.label, bg_idx)
+            if best_j >= 0:
+                matched_gt.add(best_j)
+                tp += 1
+                confusion[idx.get(gts[best_j].label, bg_idx)][p_idx] += 1
+            else:
+                fp += 1
+                confusion[bg_idx][p_idx] += 1
+        for j, gt in enumerate(gts):
+            if j not in matched_gt:
+                fn += 1
+                confusion[idx.get(gt.label, bg_idx)][bg_idx] += 1
+    return tp, fp, fn, confusion
+
+
+def make_data(n_images: int, n_boxes: int, n_classes: int, seed: int = 0):
+    rng = random.Random(seed)
+    labels = [f"class{i}" for i in range(n_classes)]
+    annotations = []
+    predictions = {}
+    for i in range(n_images):
+        gts = []
+        preds = []
+        for _ in range(n_boxes):
+            x = rng.randint(0, 1800)
+            y = rng.randint(0, 1000)
+            w = rng.randint(10, 120)
+            h = rng.randint(10, 120)
+            gts.append(Box(rng.choice(labels), x, y, x + w, y + h, 1.0))
+            dx = rng.randint(-8, 8)
+            dy = rng.randint(-8, 8)
+            preds.append(
+                Box(rng.choice(labels), x + dx, y + dy, x + w + dx, y + h + dy, rng.random())
+            )
+        path = f"img{i}.jpg"
+        annotations.append(Annotation(path, gts))
+        predictions[path] = preds
+    return labels, annotations, predictions
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=20)
+    parser.add_argument("--boxes", type=int, default=300)
+    parser.add_argument("--classes", type=int, default=10)
+    parser.add_argument("--iou", type=float, default=0.45)
+    args = parser.parse_args()
+
+    labels, annotations, predictions = make_data(args.images, args.boxes, args.classes)
+
+    start = time.perf_counter()
+    ref = scalar_counts(annotations, predictions, labels, args.iou)
+    t_scalar = time.perf_counter() - start
+
+    evaluator = Evaluator(args.iou, labels)
+    start = time.perf_counter()
+    res = evaluator.evaluate(annotations, predictions)
+    t_vec = time.perf_counter() - start
+
+    same = ref == (res.tp, res.fp, res.fn, res.confusion_matrix)
+    print(f"images={args.images} boxes/image={args.boxes} classes={args.classes}")
+    print(f"scalar:     {t_scalar:.3f}s")
+    print(f"vectorized: {t_vec:.3f}s  ({t_scalar / t_vec:.1f}x)")
+    print(f"identical:  {same}")
+    if not same:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""Measure inference throughput for different worker/thread splits.
+
+Usage::
+
+    python benchmarks/bench_parallel.py --model models/yolov8n.pt \
+        --data test_data --workers 1 2 4 8 --batch-size 8
+
+Every configuration predicts the same images; the timings include starting
+the worker processes and loading the model in each of them, as a real run
+would. Predictions of every configuration are checked against the first.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.inference.parallel import default_threads  # noqa: E402
+from src.inference.predictor import Predictor  # noqa: E402
+from src.utils.file_utils import list_images  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", required=True)
+    parser.add_argument("--data", required=True, help="Directory of images")
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--threads", type=int, default=None, help="Threads per worker (default: cores / workers)")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--img-size", type=int, nargs=2, default=(192, 320))
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--limit", type=int, default=None, help="Use at most this many images")
+    args = parser.parse_args()
+
+    paths = sorted(list_images(args.data))[: args.limit]
+    print(f"images={len(paths)} cores={os.cpu_count()} batch={args.batch_size}")
+    print(f"{'workers':>7} {'threads':>7} {'seconds':>8} {'img/s':>8}  same")
+    reference = None
+    for workers in args.workers:
+        threads = args.threads or default_threads(workers)
+        predictor = Predictor(
+            args.model,
+            args.conf,
+            tuple(args.img_size),
+            args.batch_size,
+            workers=workers,
+            threads_per_worker=threads,
+        )
+        if workers == 1:
+            # the in-process model only follows the pinning if asked to
+            try:
+                import torch  # type: ignore
+
+                torch.set_num_threads(threads)
+            except Exception:
+                pass
+        start = time.perf_counter()
+        table = predictor.predict_all(paths)
+        elapsed = time.perf_counter() - start
+        if reference is None:
+            reference = table
+        same = all(table[p] == reference[p] for p in paths)
+        print(f"{workers:>7} {threads:>7} {elapsed:>8.2f} {len(paths) / elapsed:>8.1f}  {same}")
+
+
+if __name__ == "__main__":
+    main()
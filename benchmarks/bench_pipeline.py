@@ -0,0 +1,283 @@
+"""Time every pipeline stage on a synthetic dataset and save the results as JSON.
+
+Usage::
+
+    python benchmarks/bench_pipeline.py --images 500 --boxes 20 --classes 10 \
+        --output bench.json
+    python benchmarks/bench_pipeline.py --images 500 --boxes 20 --classes 10 \
+        --baseline bench.json
+
+A Pascal VOC dataset is generated (see ``benchmarks/synthetic.py``) and the
+model is a stub, so no weights are needed. Each stage runs ``--repeat``
+times and its median time is recorded together with the stage's item count
+and throughput. The JSON also holds the git commit and the arguments, so
+results of different commits can be compared: ``--baseline`` prints the
+ratio of every stage against an earlier file and exits with status 1 if
+any stage is more than ``--tolerance`` slower.
+"""
+
+from __future__ import annotations
+
+import argparse
+import functools
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from PIL import Image  # noqa: E402
+
+from benchmarks.synthetic import (  # noqa: E402
+    StubBackend,
+    class_names,
+    generate_dataset,
+    synthetic_predictions,
+)
+from src.datasets.annotation_index import INDEX_NAME  # noqa: E402
+from src.datasets.detections import DetectionTable  # noqa: E402
+from src.datasets.prediction_store import PredictionWriter, load_predictions  # noqa: E402
+from src.datasets.xml_loader import load_dataset  # noqa: E402
+from src.inference.predictor import Predictor  # noqa: E402
+from src.inference.prefetch import ImagePrefetcher, load_image_reduced  # noqa: E402
+from src.metrics.confusion import FAST_DPI, plot_confusion_matrix  # noqa: E402
+from src.metrics.evaluator import Evaluator  # noqa: E402
+from src.metrics.report import write_html_report  # noqa: E402
+from src.utils.lazy import pyplot  # noqa: E402
+from src.utils.visualization import draw_boxes, render_image  # noqa: E402
+
+
+def measure(fn: Callable[[], object], repeat: int, setup: Callable[[], None] | None = None) -> List[float]:
+    times = []
+    for _ in range(repeat):
+        if setup is not None:
+            setup()
+        start = time.perf_counter()
+        fn()
+        times.append(time.perf_counter() - start)
+    return times
+
+
+def git_commit() -> str | None:
+    try:
+        out = subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"],
+            cwd=Path(__file__).resolve().parents[1],
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+    except Exception:
+        return None
+    return out.stdout.strip() or None
+
+
+def run_stages(args: argparse.Namespace, data_dir: Path, work_dir: Path) -> Dict[str, dict]:
+    labels = class_names(args.classes)
+    stages: Dict[str, dict] = {}
+
+    def record(name: str, times: List[float], items: int, unit: str) -> None:
+        median = statistics.median(times)
+        stages[name] = {
+            "seconds": median,
+            "min_seconds": min(times),
+            "runs": times,
+            "items": items,
+            "unit": unit,
+            "per_second": items / median if median else None,
+        }
+        print(f"{name:<24} {median:>9.4f}s {items / median if median else 0:>12.1f} {unit}/s")
+
+    def drop_index() -> None:
+        for p in data_dir.glob(INDEX_NAME + "*"):
+            p.unlink()
+
+    annotations: list = []
+
+    def load_cold() -> None:
+        annotations[:] = load_dataset(str(data_dir), workers=args.workers)
+
+    record("load_dataset_cold", measure(load_cold, args.repeat, drop_index), len(annotations), "images")
+    record(
+        "load_dataset_indexed",
+        measure(lambda: load_dataset(str(data_dir), workers=args.workers), args.repeat),
+        len(annotations),
+        "images",
+    )
+    paths = [a.image_path for a in annotations]
+    n_gt = sum(len(a.boxes) for a in annotations)
+
+    def decode() -> None:
+        for _ in ImagePrefetcher(paths, args.batch_size, args.decode_workers, 2):
+            pass
+
+    record("decode", measure(decode, args.repeat), len(paths), "images")
+
+    def decode_reduced() -> None:
+        loader = functools.partial(load_image_reduced, image_size=args.img_size)
+        for _ in ImagePrefetcher(paths, args.batch_size, args.decode_workers, 2, loader):
+            pass
+
+    record("decode_reduced", measure(decode_reduced, args.repeat), len(paths), "images")
+
+    stub = StubBackend(labels, boxes=args.boxes, latency_ms=args.stub_latency_ms)
+    predictor = Predictor(
+        "stub",
+        batch_size=args.batch_size,
+        decode_workers=args.decode_workers,
+        engine=stub,
+    )
+    tables: List[DetectionTable] = []
+    record(
+        "predict_all_stub",
+        measure(lambda: tables.append(predictor.predict_all(paths)), args.repeat),
+        len(paths),
+        "images",
+    )
+    table = tables[-1]
+
+    store_dir = work_dir / "store"
+
+    def write_store() -> None:
+        with PredictionWriter(store_dir, labels, text_path=work_dir / "predictions.txt") as writer:
+            writer.write(table)
+
+    record("store_write", measure(write_store, args.repeat), len(table.boxes), "boxes")
+    record("store_load", measure(lambda: load_predictions(store_dir), args.repeat), len(table.boxes), "boxes")
+
+    predictions = DetectionTable.from_mapping(
+        synthetic_predictions(annotations, labels, tuple(args.size), seed=args.seed), labels
+    )
+    evaluator = Evaluator(0.5, labels)
+    record("evaluate", measure(lambda: evaluator.evaluate(annotations, predictions), args.repeat), n_gt, "gt boxes")
+    results: dict = {}
+    record(
+        "evaluate_folders",
+        measure(lambda: results.update(evaluator.evaluate_folders(annotations, predictions, str(data_dir))), args.repeat),
+        n_gt,
+        "gt boxes",
+    )
+    record("sweep", measure(lambda: evaluator.sweep(annotations, predictions), args.repeat), n_gt, "gt boxes")
+
+    overall = results["overall"]
+    plot_path = str(work_dir / "confusion.png")
+    pyplot()  # keep the one-off matplotlib import out of the timings
+    record(
+        "plot_confusion_fast",
+        measure(
+            lambda: plot_confusion_matrix(overall.confusion_matrix, overall.labels, False, plot_path, FAST_DPI, True),
+            args.repeat,
+        ),
+        1,
+        "figures",
+    )
+    if args.plot_dpi:
+        record(
+            "plot_confusion",
+            measure(
+                lambda: plot_confusion_matrix(overall.confusion_matrix, overall.labels, False, plot_path, args.plot_dpi),
+                args.repeat,
+            ),
+            1,
+            "figures",
+        )
+    record(
+        "html_report",
+        measure(lambda: write_html_report(results, work_dir / "report.html"), args.repeat),
+        len(results),
+        "groups",
+    )
+
+    sample = paths[: args.draw_images]
+    images = [Image.open(p).convert("RGB") for p in sample]
+
+    def draw() -> None:
+        for img, p in zip(images, sample):
+            draw_boxes(img.copy(), predictions[p])
+
+    record("draw_boxes", measure(draw, args.repeat), len(sample), "images")
+
+    def render() -> None:
+        for i, p in enumerate(sample):
+            render_image(p, work_dir / "rendered" / f"{i}.jpg", predictions[p])
+
+    record("render_image", measure(render, args.repeat), len(sample), "images")
+    return stages
+
+
+def compare(stages: Dict[str, dict], baseline_path: str, tolerance: float) -> bool:
+    with open(baseline_path, "r", encoding="utf-8") as fh:
+        baseline = json.load(fh)
+    print(f"\nagainst {baseline_path} (commit {baseline.get('commit')}):")
+    ok = True
+    for name, stage in stages.items():
+        old = baseline.get("stages", {}).get(name)
+        if old is None:
+            print(f"{name:<24} (new)")
+            continue
+        ratio = stage["seconds"] / old["seconds"] if old["seconds"] else float("inf")
+        slower = ratio > 1 + tolerance
+        ok &= not slower
+        print(f"{name:<24} {ratio:>6.2f}x {'SLOWER' if slower else ''}")
+    return ok
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--boxes", type=int, default=10, help="Boxes per image")
+    parser.add_argument("--classes", type=int, default=10)
+    parser.add_argument("--depth", type=int, default=2, help="Folder levels below the dataset root")
+    parser.add_argument("--size", type=int, nargs=2, default=(640, 480), metavar=("W", "H"))
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--workers", type=int, default=None, help="XML parsing processes (default: CPU count)")
+    parser.add_argument("--img-size", type=int, nargs=2, default=(192, 320), metavar=("H", "W"), help="Model input size for reduced decoding")
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--decode-workers", type=int, default=2)
+    parser.add_argument("--stub-latency-ms", type=float, default=0.0, help="Simulated model time per image")
+    parser.add_argument("--draw-images", type=int, default=50, help="Images drawn/rendered in the drawing stages")
+    parser.add_argument("--plot-dpi", type=int, default=None, help="Also time a full-resolution confusion matrix at this DPI")
+    parser.add_argument("--data", default=None, help="Reuse/generate the dataset here instead of a temporary directory")
+    parser.add_argument("--output", default=None, help="JSON file for the results")
+    parser.add_argument("--baseline", default=None, help="Earlier results to compare with")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed slowdown against --baseline")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory(prefix="bench_pipeline_") as tmp:
+        data_dir = Path(args.data) if args.data else Path(tmp) / "data"
+        if not data_dir.exists() or not any(data_dir.rglob("*.xml")):
+            start = time.perf_counter()
+            generate_dataset(data_dir, args.images, args.boxes, args.classes, args.depth, tuple(args.size), args.seed)
+            print(f"generated {args.images} images in {time.perf_counter() - start:.1f}s")
+        work_dir = Path(tmp) / "work"
+        work_dir.mkdir()
+        print(f"{'stage':<24} {'median':>10} {'throughput':>12}")
+        stages = run_stages(args, data_dir, work_dir)
+
+    result = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "args": {k: v for k, v in vars(args).items() if k not in ("output", "baseline")},
+        "stages": stages,
+    }
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as fh:
+            json.dump(result, fh, indent=2)
+        print(f"results saved to {args.output}")
+    if args.baseline and not compare(stages, args.baseline, args.tolerance):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
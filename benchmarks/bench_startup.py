@@ -0,0 +1,101 @@
+"""Check process start-up times against a budget.
+
+Usage::
+
+    python benchmarks/bench_startup.py --data test_data
+    python benchmarks/bench_startup.py --data test_data --model models/yolov8n.onnx
+
+Each scenario is started ``--repeat`` times as a fresh interpreter and the
+median wall time is compared with its budget:
+
+* ``help``: ``main.py --help``
+* ``stats``: ``main.py --stats`` on ``--data`` (dataset statistics only)
+* ``eval-imports``: importing everything an evaluation run needs before
+  the model is loaded, i.e. the fixed cost every scheduled job pays
+* ``eval``: a complete ``main.py`` evaluation of ``--data`` without plots,
+  only when ``--model`` is given
+
+``--importtime`` lists the slowest imports of every scenario over budget.
+The script exits with status 1 if any scenario is over budget.
+"""
+
+from __future__ import annotations
+
+import argparse
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def timed(cmd: list[str], repeat: int) -> float:
+    """Median wall time of running ``cmd`` ``repeat`` times."""
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        subprocess.run(cmd, cwd=ROOT, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, check=True)
+        times.append(time.perf_counter() - start)
+    return statistics.median(times)
+
+
+def slowest_imports(cmd: list[str], top: int = 10) -> list[tuple[int, str]]:
+    """Modules with the largest cumulative import time (µs) under ``cmd``."""
+    proc = subprocess.run(
+        [cmd[0], "-X", "importtime", *cmd[1:]], cwd=ROOT, capture_output=True, text=True
+    )
+    rows = []
+    for line in proc.stderr.splitlines():
+        m = re.match(r"import time:\s+\d+ \|\s+(\d+) \|(\s*)(\S+)", line)
+        if m and len(m.group(2)) <= 3:  # top-level imports only
+            rows.append((int(m.group(1)), m.group(3)))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default="test_data", help="Dataset directory")
+    parser.add_argument("--model", default=None, help="Model for the full evaluation scenario")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--budget-help", type=float, default=0.5, help="Seconds")
+    parser.add_argument("--budget-stats", type=float, default=1.0, help="Seconds")
+    parser.add_argument("--budget-imports", type=float, default=1.0, help="Seconds")
+    parser.add_argument("--budget-eval", type=float, default=None, help="Seconds (default: report only)")
+    parser.add_argument("--importtime", action="store_true", help="Show the slowest imports of scenarios over budget")
+    args = parser.parse_args()
+
+    py = sys.executable
+    scenarios = [
+        ("python", [py, "-c", "pass"], None),
+        ("help", [py, "main.py", "--help"], args.budget_help),
+        ("stats", [py, "main.py", "--stats", "--data", args.data], args.budget_stats),
+        ("eval-imports", [py, "-c", "import src.ui.gui"], args.budget_imports),
+    ]
+    out_dir = tempfile.mkdtemp(prefix="bench_startup_")
+    if args.model:
+        eval_cmd = [
+            py, "main.py", "--model", args.model, "--data", args.data, "--output", out_dir,
+            "--no-plots", "--no-save",
+        ]
+        scenarios.append(("eval", eval_cmd, args.budget_eval))
+
+    print(f"{'scenario':<14} {'median s':>9} {'budget s':>9}  ok")
+    failed = False
+    for name, cmd, budget in scenarios:
+        elapsed = timed(cmd, args.repeat)
+        ok = budget is None or elapsed <= budget
+        failed |= not ok
+        print(f"{name:<14} {elapsed:>9.3f} {budget if budget is not None else '-':>9}  {'yes' if ok else 'NO'}")
+        if not ok and args.importtime:
+            for us, module in slowest_imports(cmd):
+                print(f"    {us / 1e6:7.3f}s  {module}")
+    if failed:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,157 @@
+"""Check the ONNX Runtime backend against ultralytics and compare their speed.
+
+Usage::
+
+    python benchmarks/parity_onnx.py --model models/yolov8n.onnx --data test_data
+
+Both backends run the same ``.onnx`` file over the images in ``--data``
+(``--reference`` runs ultralytics on other weights instead, e.g. the
+``.pt`` the model was exported from). Each backend is given the image
+paths and decodes, letterboxes and scales boxes back itself, exactly as in
+a normal run. Detections are paired per image by class and IoU; the
+script prints the worst coordinate and confidence differences plus the
+throughput of each backend, and exits with status 1 if any detection is
+unmatched or differs by more than the tolerances. Boxes whose confidence
+is within ``--conf-tol`` of ``--conf`` may exist on one side only and are
+not counted as unmatched. ``tests/test_onnx_parity.py`` runs the same
+check under pytest.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.inference.predictor import Predictor  # noqa: E402
+from src.metrics.evaluator import box_iou  # noqa: E402
+from src.utils.file_utils import list_images  # noqa: E402
+
+
+def compare(ref, out, min_iou: float, borderline: float = 0.0):
+    """Pair detections of one image; return ``(unmatched, max_dxy, max_dconf)``.
+
+    Detections below ``borderline`` confidence are paired when possible
+    but not counted as unmatched.
+    """
+    ref_xyxy, ref_cls, ref_conf = ref
+    out_xyxy, out_cls, out_conf = out
+    unmatched = 0
+    max_dxy = max_dconf = 0.0
+    taken = np.zeros(len(out_cls), dtype=bool)
+    for i in np.argsort(-ref_conf):
+        j = -1
+        if len(out_cls):
+            ious = box_iou(ref_xyxy[i][None].astype(np.float64), out_xyxy.astype(np.float64))
+            ious[(out_cls != ref_cls[i]) | taken] = -1
+            j = int(ious.argmax())
+            if ious[j] < min_iou:
+                j = -1
+        if j < 0:
+            unmatched += int(ref_conf[i] >= borderline)
+            continue
+        taken[j] = True
+        max_dxy = max(max_dxy, float(np.abs(ref_xyxy[i] - out_xyxy[j]).max()))
+        max_dconf = max(max_dconf, abs(float(ref_conf[i]) - float(out_conf[j])))
+    unmatched += int((out_conf[~taken] >= borderline).sum())
+    return unmatched, max_dxy, max_dconf
+
+
+def run(predictor: Predictor, paths, batch_size: int):
+    results = []
+    start = time.perf_counter()
+    for i in range(0, len(paths), batch_size):
+        results.extend(predictor.engine.infer(paths[i : i + batch_size]))
+    return results, time.perf_counter() - start
+
+
+def check(
+    model: str,
+    paths,
+    reference: str | None = None,
+    image_size=(192, 320),
+    conf: float = 0.25,
+    batch_size: int = 8,
+    min_iou: float = 0.9,
+    conf_tol: float = 0.02,
+) -> dict:
+    """Run both backends over ``paths`` and return the parity figures."""
+    ort_pred = Predictor(model, conf, tuple(image_size), batch_size, backend="onnxruntime")
+    # a static ONNX model fixes the input size for both
+    ref_pred = Predictor(
+        reference or model, conf, tuple(ort_pred.engine.image_size), batch_size, backend="ultralytics"
+    )
+
+    # warm up both before timing
+    run(ort_pred, paths[:batch_size], batch_size)
+    run(ref_pred, paths[:batch_size], batch_size)
+    ort_out, t_ort = run(ort_pred, paths, batch_size)
+    ref_out, t_ref = run(ref_pred, paths, batch_size)
+
+    stats = {
+        "images": len(paths),
+        "boxes": 0,
+        "unmatched": 0,
+        "max_dxy": 0.0,
+        "max_dconf": 0.0,
+        "names_equal": ort_pred.names == ref_pred.names,
+        "ultralytics_s": t_ref,
+        "onnxruntime_s": t_ort,
+    }
+    for ref, out in zip(ref_out, ort_out):
+        u, dxy, dconf = compare(ref, out, min_iou, conf + conf_tol)
+        stats["unmatched"] += u
+        stats["max_dxy"] = max(stats["max_dxy"], dxy)
+        stats["max_dconf"] = max(stats["max_dconf"], dconf)
+        stats["boxes"] += len(ref[1])
+    return stats
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--model", required=True, help="Exported .onnx model")
+    parser.add_argument("--reference", help="Weights for the ultralytics run (default: --model)")
+    parser.add_argument("--data", required=True, help="Directory of images")
+    parser.add_argument("--img-size", type=int, nargs=2, default=(192, 320))
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--batch-size", type=int, default=8)
+    parser.add_argument("--limit", type=int, default=200)
+    parser.add_argument("--min-iou", type=float, default=0.9, help="IoU pairing a reference box with an ORT box")
+    parser.add_argument("--xy-tol", type=float, default=2.0, help="Allowed coordinate difference in pixels")
+    parser.add_argument("--conf-tol", type=float, default=0.02, help="Allowed confidence difference")
+    args = parser.parse_args()
+
+    paths = sorted(list_images(args.data))[: args.limit]
+    s = check(
+        args.model,
+        paths,
+        args.reference,
+        args.img_size,
+        args.conf,
+        args.batch_size,
+        args.min_iou,
+        args.conf_tol,
+    )
+    t_ref, t_ort = s["ultralytics_s"], s["onnxruntime_s"]
+    print(f"images={s['images']} reference boxes={s['boxes']} classes equal={s['names_equal']}")
+    print(f"ultralytics: {t_ref:.2f}s ({len(paths) / t_ref:.1f} img/s)")
+    print(f"onnxruntime: {t_ort:.2f}s ({len(paths) / t_ort:.1f} img/s, {t_ref / t_ort:.1f}x)")
+    print(f"unmatched={s['unmatched']} max |dxy|={s['max_dxy']:.3f}px max |dconf|={s['max_dconf']:.4f}")
+    ok = (
+        s["unmatched"] == 0
+        and s["max_dxy"] <= args.xy_tol
+        and s["max_dconf"] <= args.conf_tol
+        and s["names_equal"]
+    )
+    print("parity: " + ("OK" if ok else "FAILED"))
+    if not ok:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+"""Synthetic Pascal VOC datasets and a stub model for benchmarks.
+
+Usage::
+
+    python benchmarks/synthetic.py /tmp/synth --images 1000 --boxes 20 --classes 10 --depth 2
+
+Images are smooth gradients with filled rectangles for the boxes, which
+compress and decode like real photos rather than noise. Everything is
+derived from ``--seed``, so the same arguments produce the same dataset.
+"""
+
+from __future__ import annotations
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+from typing import List, Sequence, Tuple
+from xml.sax.saxutils import escape
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+
+from src.datasets.xml_loader import Annotation, Box  # noqa: E402
+from src.inference.backends import Backend, Detections, read_image  # noqa: E402
+
+_XML = """<annotation>
+<folder>{folder}</folder>
+<filename>{filename}</filename>
+<size><width>{width}</width><height>{height}</height><depth>3</depth></size>
+{objects}</annotation>
+"""
+_OBJECT = """<object><name>{name}</name><difficult>0</difficult><bndbox>\
+<xmin>{xmin}</xmin><ymin>{ymin}</ymin><xmax>{xmax}</xmax><ymax>{ymax}</ymax>\
+</bndbox></object>
+"""
+
+
+def class_names(classes: int) -> List[str]:
+    return [f"class{i}" for i in range(classes)]
+
+
+def folder_tree(depth: int, branching: int = 2) -> List[Path]:
+    """Every folder of a tree ``depth`` levels deep below the dataset root."""
+    levels = [[Path()]]
+    for _ in range(depth):
+        levels.append([p / f"dir{i}" for p in levels[-1] for i in range(branching)])
+    return [p for level in levels[1:] for p in level] or [Path()]
+
+
+def random_boxes(
+    rng: random.Random, count: int, width: int, height: int, labels: Sequence[str]
+) -> List[Box]:
+    boxes = []
+    for _ in range(count):
+        w = rng.randint(max(4, width // 40), max(5, width // 4))
+        h = rng.randint(max(4, height // 40), max(5, height // 4))
+        x = rng.randint(0, width - w)
+        y = rng.randint(0, height - h)
+        boxes.append(Box(rng.choice(labels), x, y, x + w, y + h, 1.0))
+    return boxes
+
+
+def generate_dataset(
+    root: str | Path,
+    images: int = 200,
+    boxes: int = 10,
+    classes: int = 5,
+    depth: int = 2,
+    size: Tuple[int, int] = (640, 480),
+    seed: int = 0,
+) -> List[Annotation]:
+    """Write ``images`` JPEG + VOC XML pairs under ``root`` and return their annotations.
+
+    Images are spread round-robin over every folder of a binary tree
+    ``depth`` levels deep; each has ``boxes`` boxes of ``classes`` classes.
+    """
+    root = Path(root)
+    rng = random.Random(seed)
+    labels = class_names(classes)
+    width, height = size
+    folders = folder_tree(depth)
+    for folder in folders:
+        (root / folder).mkdir(parents=True, exist_ok=True)
+    yy, xx = np.mgrid[0:height, 0:width]
+    annotations: List[Annotation] = []
+    for i in range(images):
+        folder = folders[i % len(folders)]
+        phase = rng.random() * 6.28
+        base = np.stack(
+            [
+                127 + 100 * np.sin(xx / (37 + c * 11) + phase + c) * np.cos(yy / (53 + c * 7))
+                for c in range(3)
+            ],
+            axis=-1,
+        ).astype(np.uint8)
+        img = Image.fromarray(base)
+        draw = ImageDraw.Draw(img)
+        img_boxes = random_boxes(rng, boxes, width, height, labels)
+        for b in img_boxes:
+            color = tuple(rng.randrange(256) for _ in range(3))
+            draw.rectangle((b.xmin, b.ymin, b.xmax, b.ymax), fill=color)
+        name = f"img{i:06d}"
+        img.save(root / folder / f"{name}.jpg", quality=90)
+        objects = "".join(
+            _OBJECT.format(name=escape(b.label), xmin=b.xmin, ymin=b.ymin, xmax=b.xmax, ymax=b.ymax)
+            for b in img_boxes
+        )
+        xml = _XML.format(
+            folder=escape(folder.name or root.name),
+            filename=f"{name}.jpg",
+            width=width,
+            height=height,
+            objects=objects,
+        )
+        (root / folder / f"{name}.xml").write_text(xml, encoding="utf-8")
+        annotations.append(Annotation(str(root / folder / f"{name}.jpg"), img_boxes))
+    return annotations
+
+
+def synthetic_predictions(
+    annotations: Sequence[Annotation],
+    labels: Sequence[str],
+    size: Tuple[int, int] = (640, 480),
+    recall: float = 0.8,
+    false_positives: float = 0.2,
+    seed: int = 0,
+) -> dict:
+    """Plausible detections for ``annotations``: jittered, partly relabelled
+    ground truth with misses (``1 - recall``) and extra random boxes."""
+    rng = random.Random(seed)
+    out = {}
+    for ann in annotations:
+        preds: List[Box] = []
+        for b in ann.boxes:
+            if rng.random() > recall:
+                continue
+            w, h = b.xmax - b.xmin, b.ymax - b.ymin
+            dx, dy = int(w * rng.uniform(-0.1, 0.1)), int(h * rng.uniform(-0.1, 0.1))
+            label = b.label if rng.random() < 0.9 else rng.choice(labels)
+            preds.append(Box(label, b.xmin + dx, b.ymin + dy, b.xmax + dx, b.ymax + dy, rng.uniform(0.3, 1.0)))
+        n_fp = int(len(ann.boxes) * false_positives + rng.random())
+        for b in random_boxes(rng, n_fp, size[0], size[1], labels):
+            b.confidence = rng.uniform(0.0, 0.6)
+            preds.append(b)
+        out[ann.image_path] = preds
+    return out
+
+
+class StubBackend(Backend):
+    """Model stand-in that returns ``boxes`` random detections per image.
+
+    Detections depend only on the image shape and its position in the
+    batch, so runs are repeatable. ``latency_ms`` per image is spent
+    sleeping to mimic a model's compute time.
+    """
+
+    def __init__(self, names: Sequence[str], boxes: int = 10, latency_ms: float = 0.0) -> None:
+        self.names = list(names)
+        self.boxes = boxes
+        self.latency_ms = latency_ms
+
+    def infer(self, sources) -> List[Detections]:
+        out: List[Detections] = []
+        for i, src in enumerate(sources):
+            h, w = read_image(src).shape[:2]
+            rng = np.random.default_rng((h, w, i))
+            xy = rng.uniform(0, [w, h], size=(self.boxes, 2))
+            wh = rng.uniform(4, [w / 4, h / 4], size=(self.boxes, 2))
+            xyxy = np.concatenate([xy, np.minimum(xy + wh, [w, h])], axis=1).astype(np.float32)
+            cls = rng.integers(0, len(self.names), self.boxes).astype(np.float32)
+            conf = rng.uniform(0.0, 1.0, self.boxes).astype(np.float32)
+            out.append((xyxy, cls, conf))
+        if self.latency_ms:
+            time.sleep(self.latency_ms * len(sources) / 1000)
+        return out
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("root", help="Directory to create the dataset in")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--boxes", type=int, default=10, help="Boxes per image")
+    parser.add_argument("--classes", type=int, default=5)
+    parser.add_argument("--depth", type=int, default=2, help="Folder levels below the root")
+    parser.add_argument("--size", type=int, nargs=2, default=(640, 480), metavar=("W", "H"))
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    start = time.perf_counter()
+    anns = generate_dataset(args.root, args.images, args.boxes, args.classes, args.depth, tuple(args.size), args.seed)
+    print(f"wrote {len(anns)} images to {args.root} in {time.perf_counter() - start:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,36 +1,97 @@
 import argparse
+import json
 
-from src.config import Config
-from src.ui import gui
+# only configuration is imported up front: the GUI, the model backends and
+# matplotlib are loaded by the code paths that use them, so ``--help`` and
+# ``--stats`` start quickly
+from src.config import BACKENDS, Config
 
 
 def parse_args() -> argparse.Namespace:
     """
     --config 配置文件路径（通常是 yaml 或 json）
 
-    --model 模型文件路径（例如 yolov8.pt）
+    --model 模型文件路径（例如 yolov8.pt）；给出多个路径时进入多模型对比模式：
+            数据集只加载一次，每批图片只解码一次并送入所有模型，
+            输出每个模型各自的运行目录以及并列的 comparison.csv / comparison.json；
+            CPU 核心在各 ONNX Runtime 模型之间平分，所有 PyTorch 模型共用一份
+            （torch 的线程池属于整个进程）
 
     --data 数据集目录（如包含 images 和 labels 的目录）
 
     --output 输出目录（结果、预测等保存位置）
 
+    --reduced-decode JPEG 按 1/2、1/4、1/8 缩小解码（不小于推理尺寸），检测框换算回原图坐标，
+                     大图时显著减少解码耗时
+
+    --tensor-cache 缓存目录：把数据集按推理尺寸 letterbox 后的 uint8 张量存进一个内存映射文件，
+                   同一数据集、同一尺寸的后续运行（换模型/权重）直接按批切片读取，跳过解码与缩放
+
     --save-images 是否保存带有标注的图片（加这个参数会保存，默认不保存）
 
-    --no-save 不保存预测结果的 txt 文件（加了就不保存，默认会保存）
+    --no-save 不保存预测结果（二进制 predictions/ 与 txt，加了就不保存，默认会保存）
+
+    --no-text 只保存二进制预测结果，不额外写 predictions.txt
+
+    --resume 继续一个被中断的运行目录（沿用其原始参数，跳过已完成的图片）
+
+    --fast-plots 快速绘制混淆矩阵（低分辨率，不标注空单元格）
+
+    --plot-dpi 混淆矩阵 PNG 的分辨率（默认 200，--fast-plots 时 150；需要高清图时可设为 800）
+
+    --report 额外生成一个自包含的 report.html（浏览器端绘制混淆矩阵）
+
+    --profile 记录各阶段耗时（数据加载、解码、推理、后处理、评估、绘图、保存图片），
+              写入运行目录下的 profile.json（各阶段总耗时、单张图片延迟 p50/p95/p99、峰值内存）
+
+    --trace 同 --profile，并额外写出 Chrome trace 格式的 trace.json（chrome://tracing 打开）
+
+    --stats 只统计数据集（图片数、标注框数、各类别数量），输出 JSON 后退出，不加载模型
+
+    --serve 启动本地 HTTP 推理服务：模型只加载一次，POST /predict 发送图片、返回 JSON 检测框；
+            并发请求合并成最多 --batch-size 张的批次（最多等待 --max-wait-ms 毫秒），
+            GET /health 与 GET /metrics 查看状态、队列深度和批大小分布
 
     --gui 用 GUI 图形界面选参数（直接点选，不用命令行）
 
     """
     parser = argparse.ArgumentParser(description="Automated YOLO model testing")
     parser.add_argument("--config", help="Config file", default=None)
-    parser.add_argument("--model", help="Model path", default=None)
+    parser.add_argument("--model", nargs="+", help="Model path; several paths compare the models on one pass over the data (CPU cores are split between ONNX Runtime models; all PyTorch models together get one share)", default=None)
     parser.add_argument("--data", help="Dataset directory", default=None)
     parser.add_argument("--output", help="Output directory", default=None)
     parser.add_argument("--img-size", type=int, nargs=2, metavar=("H", "W"), help="Inference image size", default=None)
     parser.add_argument("--batch-size", type=int, help="Batch size", default=None)
+    parser.add_argument("--backend", choices=BACKENDS, help="Inference backend (auto: ONNX Runtime for .onnx files)", default=None)
+    parser.add_argument("--reduced-decode", action="store_true", help="Decode JPEGs at the smallest 1/2, 1/4 or 1/8 scale that covers the image size")
+    parser.add_argument("--prefetch", type=int, help="Batches decoded ahead of inference (0 disables)", default=None)
+    parser.add_argument("--decode-workers", type=int, help="Image decode threads", default=None)
+    parser.add_argument("--cache-dir", help="Directory of the prediction cache (disabled if omitted)", default=None)
+    parser.add_argument("--cache-size-mb", type=int, help="Prediction cache size limit in MB", default=None)
+    parser.add_argument("--tensor-cache", metavar="DIR", help="Directory caching letterboxed model inputs for repeated runs on the same images", default=None)
+    parser.add_argument("--inference-workers", type=int, help="Model processes for data-parallel inference", default=None)
+    parser.add_argument("--threads-per-worker", type=int, help="Intra-op threads of each inference process (default: cores / workers)", default=None)
     parser.add_argument("--save-images", action="store_true", help="Save annotated images")
     parser.add_argument("--img-dir", help="Directory for saved images", default=None)
-    parser.add_argument("--no-save", action="store_true", help="Do not save prediction txt")
+    parser.add_argument("--render-workers", type=int, help="Processes rendering saved images (0 renders inline)", default=None)
+    parser.add_argument("--jpeg-quality", type=int, help="JPEG quality of saved images (PIL default if omitted)", default=None)
+    parser.add_argument("--image-max-size", type=int, help="Shrink saved images to fit this many pixels", default=None)
+    parser.add_argument("--fast-plots", action="store_true", help="Render confusion matrices at low resolution without empty-cell text")
+    parser.add_argument("--plot-dpi", type=int, help="Resolution of confusion matrix PNGs (default 200, 150 with --fast-plots)", default=None)
+    parser.add_argument("--plot-workers", type=int, help="Processes rendering confusion matrices", default=None)
+    parser.add_argument("--report", action="store_true", help="Also write a self-contained report.html")
+    parser.add_argument("--no-plots", action="store_true", help="Do not save confusion matrix PNGs")
+    parser.add_argument("--no-save", action="store_true", help="Do not save predictions")
+    parser.add_argument("--no-text", action="store_true", help="Do not also write predictions.txt")
+    parser.add_argument("--sweep", action="store_true", help="Evaluate a grid of confidence thresholds from one inference run")
+    parser.add_argument("--resume", metavar="RUN_DIR", help="Continue an interrupted run in RUN_DIR with its original settings", default=None)
+    parser.add_argument("--profile", action="store_true", help="Write per-stage timings to profile.json in the run directory")
+    parser.add_argument("--trace", action="store_true", help="Like --profile, plus a Chrome trace in trace.json")
+    parser.add_argument("--stats", action="store_true", help="Print dataset statistics as JSON and exit without loading a model")
+    parser.add_argument("--serve", action="store_true", help="Serve the model over HTTP, batching concurrent requests")
+    parser.add_argument("--host", help="Address the server listens on", default="127.0.0.1")
+    parser.add_argument("--port", type=int, help="Port the server listens on", default=8000)
+    parser.add_argument("--max-wait-ms", type=float, help="Longest a request waits for its batch to fill", default=10.0)
     parser.add_argument("--gui", action="store_true", help="Launch GUI for parameter selection")
     return parser.parse_args()
 
@@ -38,13 +99,20 @@ def parse_args() -> argparse.Namespace:
 def main() -> None:
     args = parse_args()
     if args.gui:
+        from src.ui import gui
+
         gui.launch()
         return
     cfg = Config.from_file(args.config)
     if args.model:
-        cfg.model_path = args.model
+        cfg.model_path = args.model[0]
     if args.data:
         cfg.data_dir = args.data
+    if args.stats:
+        from src.datasets.dataset_stats import stats_from_dir
+
+        print(json.dumps(stats_from_dir(cfg.data_dir), ensure_ascii=False, indent=2))
+        return
     if args.output:
         cfg.output_dir = args.output
     if args.no_save:
@@ -55,8 +123,57 @@ def main() -> None:
         cfg.img_size = tuple(args.img_size)
     if args.batch_size is not None:
         cfg.batch_size = args.batch_size
+    if args.backend:
+        cfg.backend = args.backend
+    if args.reduced_decode:
+        cfg.reduced_decode = True
+    if args.tensor_cache:
+        cfg.tensor_cache_dir = args.tensor_cache
+    if args.prefetch is not None:
+        cfg.prefetch_depth = args.prefetch
+    if args.decode_workers is not None:
+        cfg.decode_workers = args.decode_workers
+    if args.cache_dir:
+        cfg.cache_dir = args.cache_dir
+    if args.cache_size_mb is not None:
+        cfg.cache_size_mb = args.cache_size_mb
+    if args.inference_workers is not None:
+        cfg.inference_workers = args.inference_workers
+    if args.threads_per_worker is not None:
+        cfg.threads_per_worker = args.threads_per_worker
     img_dir = args.img_dir
 
+    if args.serve:
+        import logging
+
+        from src.serve import serve
+
+        logging.basicConfig(level=logging.INFO, format="%(asctime)s [%(levelname)s] %(message)s")
+        serve(cfg, args.host, args.port, args.max_wait_ms)
+        return
+
+    if args.model and len(args.model) > 1:
+        if args.resume:
+            raise SystemExit("--resume is not supported when comparing models")
+        if args.no_text:
+            cfg.save_predictions_text = False
+        if args.fast_plots:
+            cfg.fast_plots = True
+        if args.plot_dpi is not None:
+            cfg.plot_dpi = args.plot_dpi
+        if args.plot_workers is not None:
+            cfg.plot_workers = args.plot_workers
+        if args.report:
+            cfg.html_report = True
+        if args.no_plots:
+            cfg.save_plots = False
+        from src.compare import run_comparison
+
+        run_comparison(args.model, cfg, sweep=args.sweep)
+        return
+
+    from src.ui import gui
+
     gui.run_evaluation(
         cfg.model_path,
         cfg.data_dir,
@@ -69,6 +186,28 @@ def main() -> None:
         cfg.iou_threshold,
         cfg.img_size,
         cfg.batch_size,
+        prefetch_depth=cfg.prefetch_depth,
+        decode_workers=cfg.decode_workers,
+        cache_dir=cfg.cache_dir,
+        cache_size_mb=cfg.cache_size_mb,
+        inference_workers=cfg.inference_workers,
+        threads_per_worker=cfg.threads_per_worker,
+        backend=cfg.backend,
+        reduced_decode=cfg.reduced_decode,
+        tensor_cache_dir=cfg.tensor_cache_dir,
+        sweep=args.sweep,
+        predictions_text=False if args.no_text else None,
+        resume_dir=args.resume,
+        render_workers=args.render_workers,
+        image_quality=args.jpeg_quality,
+        image_max_size=args.image_max_size,
+        fast_plots=True if args.fast_plots else None,
+        plot_dpi=args.plot_dpi,
+        plot_workers=args.plot_workers,
+        html_report=True if args.report else None,
+        save_plots=False if args.no_plots else None,
+        profile=True if args.profile else None,
+        profile_trace=True if args.trace else None,
     )
 
 
@@ -2,10 +2,12 @@ import logging
 from pathlib import Path
 import sys
 
-from config import Config
+from config import BACKENDS, Config
+from datasets.prediction_store import PREDICTIONS_DIR, PredictionWriter
 from datasets.xml_loader import load_dataset, DatasetConsistencyError
 from inference.predictor import Predictor
 from metrics.evaluator import Evaluator
+from metrics.curves import filter_predictions, plot_sweep_curves, save_sweep
 from log_setup import setup_logging
 import argparse
 
@@ -23,7 +25,16 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output", help="Output directory", default=None)
     parser.add_argument("--img-size", type=int, nargs=2, metavar=("H", "W"), help="Inference image size", default=None)
     parser.add_argument("--batch-size", type=int, help="Batch size", default=None)
+    parser.add_argument("--backend", choices=BACKENDS, help="Inference backend (auto: ONNX Runtime for .onnx files)", default=None)
+    parser.add_argument("--prefetch", type=int, help="Batches decoded ahead of inference (0 disables)", default=None)
+    parser.add_argument("--decode-workers", type=int, help="Image decode threads", default=None)
+    parser.add_argument("--cache-dir", help="Directory of the prediction cache (disabled if omitted)", default=None)
+    parser.add_argument("--cache-size-mb", type=int, help="Prediction cache size limit in MB", default=None)
+    parser.add_argument("--inference-workers", type=int, help="Model processes for data-parallel inference", default=None)
+    parser.add_argument("--threads-per-worker", type=int, help="Intra-op threads of each inference process (default: cores / workers)", default=None)
     parser.add_argument("--no-save", action="store_true", help="Do not save predictions")
+    parser.add_argument("--no-text", action="store_true", help="Do not also write predictions.txt")
+    parser.add_argument("--sweep", action="store_true", help="Evaluate a grid of confidence thresholds from one inference run")
     parser.add_argument("--log-dir", help="Directory for logs", default="logs")
     parser.add_argument(
         "--progress",
@@ -45,19 +56,39 @@ def main() -> None:
         cfg.output_dir = args.output
     if args.no_save:
         cfg.save_predictions = False
+    if args.no_text:
+        cfg.save_predictions_text = False
     if args.img_size:
         cfg.img_size = tuple(args.img_size)
     if args.batch_size is not None:
         cfg.batch_size = args.batch_size
+    if args.backend:
+        cfg.backend = args.backend
+    if args.prefetch is not None:
+        cfg.prefetch_depth = args.prefetch
+    if args.decode_workers is not None:
+        cfg.decode_workers = args.decode_workers
+    if args.cache_dir:
+        cfg.cache_dir = args.cache_dir
+    if args.cache_size_mb is not None:
+        cfg.cache_size_mb = args.cache_size_mb
+    if args.inference_workers is not None:
+        cfg.inference_workers = args.inference_workers
+    if args.threads_per_worker is not None:
+        cfg.threads_per_worker = args.threads_per_worker
 
     # Log run parameters
     logging.info("Model path: %s", cfg.model_path)
     logging.info("Dataset dir: %s", cfg.data_dir)
     logging.info("Output dir: %s", cfg.output_dir)
     logging.info("Confidence threshold: %.3f", cfg.confidence_threshold)
+    if args.sweep:
+        logging.info("Confidence sweep from floor %.3f", cfg.sweep_floor)
     logging.info("IoU threshold: %.3f", cfg.iou_threshold)
     logging.info("Image size: %s", cfg.img_size)
     logging.info("Batch size: %d", cfg.batch_size)
+    logging.info("Prefetch depth: %d (%d decode workers)", cfg.prefetch_depth, cfg.decode_workers)
+    logging.info("Prediction cache: %s", cfg.cache_dir or "disabled")
     logging.info("Save predictions: %s", cfg.save_predictions)
     logging.info("Loading dataset from %s", cfg.data_dir)
     try:
@@ -67,39 +98,60 @@ def main() -> None:
         annotations = exc.annotations
     predictor = Predictor(
         cfg.model_path,
-        cfg.confidence_threshold,
+        min(cfg.confidence_threshold, cfg.sweep_floor) if args.sweep else cfg.confidence_threshold,
         cfg.img_size,
         cfg.batch_size,
+        cfg.prefetch_depth,
+        cfg.decode_workers,
+        cache_dir=cfg.cache_dir,
+        cache_size_mb=cfg.cache_size_mb,
+        workers=cfg.inference_workers,
+        threads_per_worker=cfg.threads_per_worker,
+        backend=cfg.backend,
     )
 
-    predictions = {}
-
-    iterable = annotations
+    progress_cb = None
+    bar = None
     if args.progress:
         if tqdm is not None:
-            iterable = tqdm(annotations, desc="Predicting", unit="img")
+            bar = tqdm(total=len(annotations), desc="Predicting", unit="img")
+
+            def progress_cb(done: int, total: int) -> None:
+                bar.update(done - bar.n)
         else:
-            total = len(annotations)
-
-            def _simple_progress(items: list) -> "list":
-                for idx, item in enumerate(items, 1):
-                    print(f"{idx}/{total}", end="\r", file=sys.stderr)
-                    yield item
-                print(file=sys.stderr)
-
-            iterable = _simple_progress(annotations)
-
-    for ann in iterable:
-        boxes = predictor.predict(ann.image_path)
-        predictions[ann.image_path] = boxes
-
-    names_attr = getattr(predictor.model, "names", None) if predictor.model is not None else None
-    if isinstance(names_attr, dict):
-        class_names = list(names_attr.values())
-    elif names_attr is not None:
-        class_names = list(names_attr)
-    else:
-        class_names = None
+
+            def progress_cb(done: int, total: int) -> None:
+                print(f"{done}/{total}", end="\r", file=sys.stderr)
+
+    class_names = list(predictor.names) or None
+
+    writer = None
+    if cfg.save_predictions:
+        out_dir = Path(cfg.output_dir)
+        out_dir.mkdir(parents=True, exist_ok=True)
+        writer = PredictionWriter(
+            out_dir / PREDICTIONS_DIR,
+            class_names or [],
+            text_path=out_dir / "predictions.txt" if cfg.save_predictions_text else None,
+            text_min_conf=cfg.confidence_threshold,
+        )
+    try:
+        predictions = predictor.predict_all(
+            [ann.image_path for ann in annotations],
+            progress_cb,
+            writer.write if writer is not None else None,
+        )
+    finally:
+        if writer is not None:
+            writer.close()
+    if bar is not None:
+        bar.close()
+    elif args.progress:
+        print(file=sys.stderr)
+    raw_predictions = predictions
+    if args.sweep:
+        predictions = filter_predictions(raw_predictions, cfg.confidence_threshold)
+
     evaluator = Evaluator(cfg.iou_threshold, class_names)
 
     result = evaluator.evaluate(annotations, predictions)
@@ -108,18 +160,23 @@ def main() -> None:
     logging.info("Recall: %.3f", result.recall)
     logging.info("F1: %.3f", result.f1)
     logging.info("mAP50: %.3f", result.map50)
-
-    if cfg.save_predictions:
-        out_dir = Path(cfg.output_dir)
-        out_dir.mkdir(parents=True, exist_ok=True)
-        pred_file = out_dir / "predictions.txt"
-        with pred_file.open("w", encoding="utf-8") as fh:
-            for img, boxes in predictions.items():
-                b_str = " ".join(
-                    f"{b.label},{b.xmin},{b.ymin},{b.xmax},{b.ymax}" for b in boxes
-                )
-                fh.write(f"{img} {b_str}\n")
-        logging.info("Predictions saved to %s", pred_file)
+    logging.info("mAP50-95: %.3f", result.map50_95)
+    for name, ap in result.ap50.items():
+        logging.info("AP50 %s: %.3f (AP50-95 %.3f)", name, ap, result.ap50_95[name])
+
+    if args.sweep:
+        sweep = evaluator.sweep(annotations, raw_predictions)
+        sweep_dir = Path(cfg.output_dir) / "sweep"
+        save_sweep(sweep, sweep_dir)
+        try:
+            plot_sweep_curves(sweep, sweep_dir)
+        except Exception as exc:  # pragma: no cover - matplotlib optional
+            logging.error("Failed to plot sweep curves: %s", exc)
+        for name, thr in sweep.best_threshold.items():
+            logging.info("F1-optimal confidence %s: %.2f", name, thr)
+
+    if writer is not None:
+        logging.info("Predictions saved to %s", out_dir / PREDICTIONS_DIR)
 
 
 if __name__ == "__main__":
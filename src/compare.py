@@ -0,0 +1,196 @@
+"""Evaluate several models on one dataset, loading and decoding it once."""
+
+from __future__ import annotations
+
+import csv
+import dataclasses
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+from src.config import Config
+from src.datasets.prediction_store import PREDICTIONS_DIR, PredictionWriter
+from src.datasets.xml_loader import DatasetConsistencyError, load_dataset
+from src.inference.backends import resolve_backend
+from src.inference.parallel import default_threads
+from src.inference.predictor import Predictor
+from src.inference.prefetch import BatchFanout, ImagePrefetcher
+from src.inference.tensor_cache import TensorCache
+from src.log_setup import setup_logging
+from src.metrics.evaluator import EvalResult
+from src.ui.gui import evaluate_run
+
+COMPARISON_NAME = "comparison"
+METRICS = ("precision", "recall", "f1", "map50", "map50_95")
+
+
+def _run_names(model_paths: Sequence[str]) -> List[str]:
+    """Directory name of every model: its file stem, made unique if repeated."""
+    names: List[str] = []
+    for path in model_paths:
+        p = Path(path)
+        name = p.stem
+        if name in names and p.suffix:
+            name = f"{p.stem}_{p.suffix[1:]}"
+        base, n = name, 1
+        while name in names:
+            n += 1
+            name = f"{base}_{n}"
+        names.append(name)
+    return names
+
+
+def write_comparison(rows: List[Dict[str, object]], out_dir: Path) -> None:
+    """Write the side-by-side table as ``comparison.csv`` and ``comparison.json``."""
+    with (out_dir / f"{COMPARISON_NAME}.csv").open("w", encoding="utf-8", newline="") as fh:
+        writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    with (out_dir / f"{COMPARISON_NAME}.json").open("w", encoding="utf-8") as fh:
+        json.dump(rows, fh, indent=2)
+
+
+def run_comparison(model_paths: Sequence[str], cfg: Config, sweep: bool = False) -> Path:
+    """Evaluate every model of ``model_paths`` on ``cfg.data_dir``.
+
+    The annotations are loaded once and each batch of images is decoded
+    once and fed to all models, which run side by side in threads. The
+    CPU cores are split between the ONNX Runtime sessions, each of which
+    has its own thread pool, plus one share for all PyTorch models
+    together: torch's thread pool belongs to the process, so the models
+    on it share it. Every model gets a run directory
+    named after its weights inside ``<output>/<dataset>_compareN`` with
+    the usual outputs of a single run; the directory itself holds the
+    side-by-side ``comparison.csv``/``comparison.json``, which is also
+    logged. Returns that directory.
+    """
+    repo_root = Path(__file__).resolve().parents[1]
+
+    def resolve(path: str) -> str:
+        return path if Path(path).is_absolute() else str((repo_root / path).resolve())
+
+    models = [resolve(p) for p in model_paths]
+    cfg.data_dir = resolve(cfg.data_dir)
+    cfg.output_dir = resolve(cfg.output_dir)
+    out_root = Path(cfg.output_dir)
+    data_name = Path(cfg.data_dir).name
+    idx = 1
+    while (out_root / f"{data_name}_compare{idx}").exists():
+        idx += 1
+    root = out_root / f"{data_name}_compare{idx}"
+    root.mkdir(parents=True, exist_ok=True)
+    setup_logging(str(root / "run.log"))
+
+    logging.info("Comparing %d models: %s", len(models), ", ".join(models))
+    logging.info("Dataset dir: %s", cfg.data_dir)
+    logging.info("Confidence threshold: %.3f", cfg.confidence_threshold)
+    logging.info("IoU threshold: %.3f", cfg.iou_threshold)
+    logging.info("Image size: %s", cfg.img_size)
+    logging.info("Batch size: %d", cfg.batch_size)
+    if cfg.inference_workers > 1 or cfg.save_images:
+        logging.warning("Inference workers and saved images are not used when comparing models")
+    logging.info("Loading dataset from %s", cfg.data_dir)
+    try:
+        annotations = load_dataset(cfg.data_dir)
+    except DatasetConsistencyError as exc:
+        logging.debug("Dataset issue: %s", exc)
+        annotations = exc.annotations
+    image_paths = [ann.image_path for ann in annotations]
+
+    kinds = [resolve_backend(path, cfg.backend) for path in models]
+    threads = default_threads(kinds.count("onnxruntime") + ("ultralytics" in kinds))
+    predictors = [
+        Predictor(
+            path,
+            min(cfg.confidence_threshold, cfg.sweep_floor) if sweep else cfg.confidence_threshold,
+            cfg.img_size,
+            cfg.batch_size,
+            cache_dir=cfg.cache_dir,
+            cache_size_mb=cfg.cache_size_mb,
+            backend=cfg.backend,
+            threads=threads,
+            reduced_decode=cfg.reduced_decode,
+            tensor_cache_dir=cfg.tensor_cache_dir,
+        )
+        for path in models
+    ]
+    run_dirs = [root / name for name in _run_names(models)]
+    writers: List[PredictionWriter | None] = []
+    for run_dir, predictor in zip(run_dirs, predictors):
+        run_dir.mkdir(parents=True, exist_ok=True)
+        writers.append(
+            PredictionWriter(
+                run_dir / PREDICTIONS_DIR,
+                list(predictor.names),
+                text_path=run_dir / "predictions.txt" if cfg.save_predictions_text else None,
+                text_min_conf=cfg.confidence_threshold,
+            )
+            if cfg.save_predictions
+            else None
+        )
+
+    depth = max(1, cfg.prefetch_depth)
+    # every model has the same input size, so one decode serves all
+    decode = predictors[0].decode
+    tensors: TensorCache | None = None
+    if cfg.tensor_cache_dir:
+        tensors = TensorCache(cfg.tensor_cache_dir, image_paths, cfg.img_size, cfg.reduced_decode)
+        logging.info("Tensor cache: %d of %d images cached", tensors.hits, len(image_paths))
+        decode = tensors.load
+    fanout = BatchFanout(
+        ImagePrefetcher(image_paths, cfg.batch_size, max(1, cfg.decode_workers), depth, decode),
+        len(predictors),
+        depth,
+    )
+
+    def predict(i: int):
+        writer = writers[i]
+        try:
+            return predictors[i].predict_all(
+                image_paths,
+                batch_cb=writer.write if writer is not None else None,
+                batches=fanout.consumer(i),
+            )
+        finally:
+            fanout.close(i)
+            if writer is not None:
+                writer.close()
+
+    try:
+        with ThreadPoolExecutor(max_workers=len(predictors), thread_name_prefix="model") as pool:
+            tables = list(pool.map(predict, range(len(predictors))))
+    finally:
+        if tensors is not None:
+            tensors.save()
+
+    rows: List[Dict[str, object]] = []
+    for path, run_dir, predictor, table in zip(models, run_dirs, predictors, tables):
+        logging.info("Model %s", path)
+        run_cfg = dataclasses.replace(cfg, model_path=path)
+        results: Dict[str, EvalResult] = evaluate_run(
+            run_cfg, run_dir, annotations, table, list(predictor.names) or None, sweep
+        )
+        overall = results["overall"]
+        row: Dict[str, object] = {"model": run_dir.name}
+        row.update({name: round(getattr(overall, name), 4) for name in METRICS})
+        # backend time only, so decoding and cache hits do not blur the speed
+        secs = predictor.infer_seconds
+        row["images_per_s"] = round(predictor.infer_images / secs, 1) if secs else None
+        row["run_dir"] = str(run_dir)
+        rows.append(row)
+
+    width = max(len(r["model"]) for r in rows)
+    logging.info("%-*s %9s %9s %9s %9s %9s %8s", width, "model", *METRICS, "img/s")
+    for r in rows:
+        logging.info(
+            "%-*s %9.3f %9.3f %9.3f %9.3f %9.3f %8s",
+            width,
+            r["model"],
+            *(r[name] for name in METRICS),
+            r["images_per_s"] if r["images_per_s"] is not None else "-",
+        )
+    write_comparison(rows, root)
+    logging.info("Comparison saved to %s", root / f"{COMPARISON_NAME}.csv")
+    return root
@@ -48,6 +48,11 @@ def load_config(path: str) -> Dict[str, Any]:
     return _parse_simple_yaml(path)
 
 
+# values of ``Config.backend``; kept here so argument parsers need not
+# import the inference modules
+BACKENDS = ("auto", "ultralytics", "onnxruntime")
+
+
 @dataclass
 class Config:
     model_path: str
@@ -55,10 +60,31 @@ class Config:
     iou_threshold: float = 0.45
     data_dir: str = "test_data"
     save_predictions: bool = True
+    save_predictions_text: bool = True
     save_images: bool = False
+    render_workers: int = 2
+    image_quality: int | None = None
+    image_max_size: int | None = None
+    save_plots: bool = True
+    fast_plots: bool = False
+    plot_dpi: int | None = None
+    plot_workers: int = 2
+    html_report: bool = False
     output_dir: str = "output"
     img_size: tuple[int, int] | list[int] = (192, 320)
     batch_size: int = 1
+    backend: str = "auto"
+    prefetch_depth: int = 2
+    decode_workers: int = 2
+    reduced_decode: bool = False
+    cache_dir: str | None = None
+    cache_size_mb: int = 1024
+    tensor_cache_dir: str | None = None
+    inference_workers: int = 1
+    threads_per_worker: int | None = None
+    sweep_floor: float = 0.001
+    profile: bool = False
+    profile_trace: bool = False
 
     @classmethod
     def from_file(cls, path: str | None = None) -> "Config":
@@ -3,11 +3,13 @@ import logging
 from pathlib import Path
 
 
-from config import Config
+from config import BACKENDS, Config
+from datasets.prediction_store import PREDICTIONS_DIR, PredictionWriter
 from datasets.xml_loader import load_dataset, DatasetConsistencyError
 from inference.predictor import Predictor
-from metrics.evaluator import Evaluator
-from metrics.confusion import plot_confusion_matrix
+from metrics.evaluator import EvalResult, Evaluator
+from metrics.confusion import DEFAULT_DPI, FAST_DPI, MatrixPlot, render_confusion_matrices
+from metrics.report import write_html_report
 from log_setup import setup_logging
 
 try:
@@ -24,7 +26,20 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument("--output", help="Output directory", default=None)
     parser.add_argument("--img-size", type=int, nargs=2, metavar=("H", "W"), help="Inference image size", default=None)
     parser.add_argument("--batch-size", type=int, help="Batch size", default=None)
-    parser.add_argument("--no-save", action="store_true", help="Do not save prediction txt")
+    parser.add_argument("--backend", choices=BACKENDS, help="Inference backend (auto: ONNX Runtime for .onnx files)", default=None)
+    parser.add_argument("--prefetch", type=int, help="Batches decoded ahead of inference (0 disables)", default=None)
+    parser.add_argument("--decode-workers", type=int, help="Image decode threads", default=None)
+    parser.add_argument("--cache-dir", help="Directory of the prediction cache (disabled if omitted)", default=None)
+    parser.add_argument("--cache-size-mb", type=int, help="Prediction cache size limit in MB", default=None)
+    parser.add_argument("--inference-workers", type=int, help="Model processes for data-parallel inference", default=None)
+    parser.add_argument("--threads-per-worker", type=int, help="Intra-op threads of each inference process (default: cores / workers)", default=None)
+    parser.add_argument("--no-save", action="store_true", help="Do not save predictions")
+    parser.add_argument("--no-text", action="store_true", help="Do not also write predictions.txt")
+    parser.add_argument("--fast-plots", action="store_true", help="Render confusion matrices at low resolution without empty-cell text")
+    parser.add_argument("--plot-dpi", type=int, help="Resolution of confusion matrix PNGs (default 200, 150 with --fast-plots)", default=None)
+    parser.add_argument("--plot-workers", type=int, help="Processes rendering confusion matrices", default=None)
+    parser.add_argument("--report", action="store_true", help="Also write a self-contained report.html")
+    parser.add_argument("--no-plots", action="store_true", help="Do not save confusion matrix PNGs")
     parser.add_argument("--log-dir", help="Directory for logs", default="logs")
     parser.add_argument("--progress", action="store_true", help="Show progress bar")
     return parser.parse_args()
@@ -41,10 +56,36 @@ def main() -> None:
         cfg.output_dir = args.output
     if args.no_save:
         cfg.save_predictions = False
+    if args.no_text:
+        cfg.save_predictions_text = False
+    if args.fast_plots:
+        cfg.fast_plots = True
+    if args.plot_dpi is not None:
+        cfg.plot_dpi = args.plot_dpi
+    if args.plot_workers is not None:
+        cfg.plot_workers = args.plot_workers
+    if args.report:
+        cfg.html_report = True
+    if args.no_plots:
+        cfg.save_plots = False
     if args.img_size:
         cfg.img_size = tuple(args.img_size)
     if args.batch_size is not None:
         cfg.batch_size = args.batch_size
+    if args.backend:
+        cfg.backend = args.backend
+    if args.prefetch is not None:
+        cfg.prefetch_depth = args.prefetch
+    if args.decode_workers is not None:
+        cfg.decode_workers = args.decode_workers
+    if args.cache_dir:
+        cfg.cache_dir = args.cache_dir
+    if args.cache_size_mb is not None:
+        cfg.cache_size_mb = args.cache_size_mb
+    if args.inference_workers is not None:
+        cfg.inference_workers = args.inference_workers
+    if args.threads_per_worker is not None:
+        cfg.threads_per_worker = args.threads_per_worker
 
     out_root = Path(cfg.output_dir)
     data_name = Path(cfg.data_dir).name
@@ -65,6 +106,8 @@ def main() -> None:
     logging.info("IoU threshold: %.3f", cfg.iou_threshold)
     logging.info("Image size: %s", cfg.img_size)
     logging.info("Batch size: %d", cfg.batch_size)
+    logging.info("Prefetch depth: %d (%d decode workers)", cfg.prefetch_depth, cfg.decode_workers)
+    logging.info("Prediction cache: %s", cfg.cache_dir or "disabled")
     logging.info("Save predictions: %s", cfg.save_predictions)
     logging.info("Loading dataset from %s", cfg.data_dir)
     try:
@@ -77,82 +120,95 @@ def main() -> None:
         cfg.confidence_threshold,
         cfg.img_size,
         cfg.batch_size,
+        cfg.prefetch_depth,
+        cfg.decode_workers,
+        cache_dir=cfg.cache_dir,
+        cache_size_mb=cfg.cache_size_mb,
+        workers=cfg.inference_workers,
+        threads_per_worker=cfg.threads_per_worker,
+        backend=cfg.backend,
     )
-    predictions = {}
-
-    iterable = annotations
+    progress_cb = None
+    bar = None
     if args.progress:
         if tqdm is not None:
-            iterable = tqdm(annotations, desc="Predicting", unit="img")
+            bar = tqdm(total=len(annotations), desc="Predicting", unit="img")
+
+            def progress_cb(done: int, total: int) -> None:
+                bar.update(done - bar.n)
         else:
-            total = len(annotations)
-            def _simple_progress(items: list) -> "list":
-                for idx, item in enumerate(items, 1):
-                    print(f"{idx}/{total}", end="\r")
-                    yield item
-                print()
-            iterable = _simple_progress(annotations)
-
-    for ann in iterable:
-        boxes = predictor.predict(ann.image_path)
-        predictions[ann.image_path] = boxes
-
-    names_attr = getattr(predictor.model, "names", None) if predictor.model is not None else None
-    if isinstance(names_attr, dict):
-        class_names = list(names_attr.values())
-    elif names_attr is not None:
-        class_names = list(names_attr)
-    else:
-        class_names = None
+            def progress_cb(done: int, total: int) -> None:
+                print(f"{done}/{total}", end="\r")
+
+    class_names = list(predictor.names) or None
+
+    writer = None
+    if cfg.save_predictions:
+        writer = PredictionWriter(
+            run_dir / PREDICTIONS_DIR,
+            class_names or [],
+            text_path=run_dir / "predictions.txt" if cfg.save_predictions_text else None,
+            text_min_conf=cfg.confidence_threshold,
+        )
+    try:
+        predictions = predictor.predict_all(
+            [ann.image_path for ann in annotations],
+            progress_cb,
+            writer.write if writer is not None else None,
+        )
+    finally:
+        if writer is not None:
+            writer.close()
+    if bar is not None:
+        bar.close()
+    elif args.progress:
+        print()
+
     evaluator = Evaluator(cfg.iou_threshold, class_names)
 
-    def save_result(name: str, anns: list) -> None:
-        preds = {a.image_path: predictions[a.image_path] for a in anns}
-        res = evaluator.evaluate(anns, preds)
+    plots: list[MatrixPlot] = []
+
+    def save_result(name: str, res: EvalResult) -> None:
         logging.info(
-            "%s - Precision: %.3f Recall: %.3f F1: %.3f mAP50: %.3f",
+            "%s - Precision: %.3f Recall: %.3f F1: %.3f mAP50: %.3f mAP50-95: %.3f",
             name,
             res.precision,
             res.recall,
             res.f1,
             res.map50,
+            res.map50_95,
         )
         labels = res.labels
         sub_dir = run_dir / name if name != "overall" else run_dir
         sub_dir.mkdir(parents=True, exist_ok=True)
         cm_path = sub_dir / "confusion_matrix.png"
         cmp_path = sub_dir / "confusion_probability.png"
+        plots.append(MatrixPlot(res.confusion_matrix, labels, False, str(cm_path)))
+        plots.append(MatrixPlot(res.confusion_prob, labels, True, str(cmp_path)))
+
+    # overall first, then every folder level; each image is matched once
+    results = evaluator.evaluate_folders(annotations, predictions, cfg.data_dir)
+    for name, res in results.items():
+        save_result(name, res)
+    if cfg.save_plots:
         try:
-            plot_confusion_matrix(res.confusion_matrix, labels, False, str(cm_path))
-            plot_confusion_matrix(res.confusion_prob, labels, True, str(cmp_path))
+            n_rendered = render_confusion_matrices(
+                plots,
+                run_dir,
+                workers=cfg.plot_workers,
+                dpi=cfg.plot_dpi or (FAST_DPI if cfg.fast_plots else DEFAULT_DPI),
+                fast=cfg.fast_plots,
+                cache_dir=Path(cfg.cache_dir) / "figures" if cfg.cache_dir else None,
+            )
+            logging.info("Confusion matrices: %d of %d figures rendered", n_rendered, len(plots))
         except Exception as exc:
             logging.error("Failed to plot confusion matrix: %s", exc)
+    if cfg.html_report:
+        report = write_html_report(results, run_dir / "report.html", title=run_dir.name)
+        logging.info("Report saved to %s", report)
 
-    # overall
-    save_result("overall", annotations)
-
-    # per folder (all levels)
-    groups: dict[str, list] = {}
-    root = Path(cfg.data_dir)
-    for ann in annotations:
-        rel = Path(ann.image_path).relative_to(root)
-        parts = rel.parts
-        for i in range(1, len(parts)):
-            key = Path(*parts[:i]).as_posix()
-            groups.setdefault(key, []).append(ann)
-
-    for name, anns in groups.items():
-        save_result(name, anns)
-
-    if cfg.save_predictions:
-        pred_file = run_dir / "predictions.txt"
-        with pred_file.open("w", encoding="utf-8") as fh:
-            for img, boxes in predictions.items():
-                b_str = " ".join(
-                    f"{b.label},{b.xmin},{b.ymin},{b.xmax},{b.ymax}" for b in boxes
-                )
-                fh.write(f"{img} {b_str}\n")
-        logging.info("Predictions saved to %s", pred_file)
+    if writer is not None:
+        logging.info("Predictions saved to %s", run_dir / PREDICTIONS_DIR)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,85 @@
+"""Persistent on-disk index of parsed XML annotations."""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sqlite3
+from typing import Dict, List, Tuple
+
+# file name of the index kept in the dataset root
+INDEX_NAME = ".annotation_index.sqlite"
+
+# (filename text from the XML, [label, xmin, ymin, xmax, ymax] rows)
+Record = Tuple[str | None, List[list]]
+
+
+class AnnotationIndex:
+    """SQLite cache of parsed annotations keyed by XML path, mtime and size.
+
+    Paths are stored relative to ``root_dir`` so a dataset can be moved or
+    mounted elsewhere without invalidating its index. If the index cannot
+    be opened (for example on a read-only share) it silently stays empty
+    and every lookup misses.
+    """
+
+    def __init__(self, root_dir: str, path: str | None = None) -> None:
+        self.root_dir = root_dir
+        self.path = path or os.path.join(root_dir, INDEX_NAME)
+        self._conn: sqlite3.Connection | None = None
+        self._rows: Dict[str, Tuple[int, int, str | None, str]] = {}
+        try:
+            self._conn = sqlite3.connect(self.path)
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS annotations ("
+                "path TEXT PRIMARY KEY, mtime_ns INTEGER, size INTEGER, "
+                "filename TEXT, boxes TEXT)"
+            )
+            for rel, mtime_ns, size, filename, boxes in self._conn.execute(
+                "SELECT path, mtime_ns, size, filename, boxes FROM annotations"
+            ):
+                self._rows[rel] = (mtime_ns, size, filename, boxes)
+        except sqlite3.Error as exc:
+            logging.warning("Annotation index %s unavailable: %s", self.path, exc)
+            self.close()
+
+    def _rel(self, xml_path: str) -> str:
+        return os.path.relpath(xml_path, self.root_dir).replace(os.sep, "/")
+
+    def get(self, xml_path: str, stat: os.stat_result) -> Record | None:
+        """Return the cached record for ``xml_path`` if it is still current."""
+        row = self._rows.get(self._rel(xml_path))
+        if row is None or row[0] != stat.st_mtime_ns or row[1] != stat.st_size:
+            return None
+        return row[2], json.loads(row[3])
+
+    def update(
+        self,
+        records: List[Tuple[str, os.stat_result, Record]],
+        keep: List[str],
+    ) -> None:
+        """Store freshly parsed ``records`` and drop entries not in ``keep``."""
+        if self._conn is None:
+            return
+        keep_rel = {self._rel(p) for p in keep}
+        stale = [(rel,) for rel in self._rows if rel not in keep_rel]
+        rows = [
+            (self._rel(p), st.st_mtime_ns, st.st_size, filename, json.dumps(boxes))
+            for p, st, (filename, boxes) in records
+        ]
+        if not rows and not stale:
+            return
+        try:
+            with self._conn:
+                self._conn.executemany("DELETE FROM annotations WHERE path = ?", stale)
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO annotations VALUES (?, ?, ?, ?, ?)", rows
+                )
+        except sqlite3.Error as exc:
+            logging.warning("Failed to update annotation index %s: %s", self.path, exc)
+
+    def close(self) -> None:
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
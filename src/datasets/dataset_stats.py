@@ -8,6 +8,7 @@ from typing import Dict, List
 
 import logging
 from .xml_loader import Annotation, load_dataset, DatasetConsistencyError
+from src.utils.lazy import pyplot
 
 def compute_stats(annotations: List[Annotation]) -> Dict[str, object]:
     """Compute simple statistics for a list of ``Annotation`` objects."""
@@ -32,17 +33,9 @@ def stats_from_dir(root_dir: str) -> Dict[str, object]:
     return compute_stats(annotations)
 
 
-try:
-    import matplotlib.pyplot as plt  # type: ignore
-    import matplotlib
-
-    matplotlib.use("Agg")
-except Exception:  # pragma: no cover - matplotlib optional
-    plt = None  # type: ignore
-
-
 def plot_class_distribution(stats: Dict[str, object], save_path: str | None = None) -> None:
     """Plot class distribution using matplotlib if available."""
+    plt = pyplot()
     if plt is None:
         raise RuntimeError("matplotlib is required for plotting")
 
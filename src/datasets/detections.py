@@ -0,0 +1,212 @@
+"""Columnar storage for the boxes of many images."""
+
+from __future__ import annotations
+
+from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
+
+import numpy as np
+
+from .xml_loader import Annotation, Box
+
+
+class DetectionTable(Mapping[str, List[Box]]):
+    """Struct-of-arrays table of boxes grouped by image.
+
+    Rows of image ``i`` are ``offsets[i]:offsets[i + 1]`` in ``boxes``
+    (``(N, 4)`` int32 ``xmin, ymin, xmax, ymax``), ``class_ids`` (int32
+    indices into ``class_names``) and ``confidences`` (float32; ``1.0`` for
+    ground truth). The table is a read-only ``Mapping[str, List[Box]]`` so it
+    can stand in for the ``predictions`` dict anywhere; indexing by image
+    path builds lightweight :class:`Box` views on demand, while hot paths
+    such as the evaluator read the arrays directly.
+    """
+
+    def __init__(
+        self,
+        image_paths: Sequence[str],
+        offsets: np.ndarray,
+        boxes: np.ndarray,
+        class_ids: np.ndarray,
+        confidences: np.ndarray,
+        class_names: Sequence[str],
+    ) -> None:
+        self.image_paths = list(image_paths)
+        self.offsets = np.asarray(offsets, dtype=np.int64)
+        self.boxes = np.asarray(boxes, dtype=np.int32).reshape(-1, 4)
+        self.class_ids = np.asarray(class_ids, dtype=np.int32)
+        self.confidences = np.asarray(confidences, dtype=np.float32)
+        self.class_names = list(class_names)
+        self._index = {p: i for i, p in enumerate(self.image_paths)}
+
+    @classmethod
+    def from_mapping(
+        cls,
+        mapping: Mapping[str, Iterable[Box]],
+        class_names: Sequence[str] | None = None,
+    ) -> "DetectionTable":
+        """Build a table from ``image path -> boxes``."""
+        if isinstance(mapping, DetectionTable):
+            return mapping
+        builder = TableBuilder(class_names)
+        for path, boxes in mapping.items():
+            builder.add_boxes(path, boxes)
+        return builder.build()
+
+    @classmethod
+    def from_annotations(
+        cls,
+        annotations: Iterable[Annotation],
+        class_names: Sequence[str] | None = None,
+    ) -> "DetectionTable":
+        """Build a table of ground-truth boxes in annotation order."""
+        builder = TableBuilder(class_names)
+        for ann in annotations:
+            builder.add_boxes(ann.image_path, ann.boxes)
+        return builder.build()
+
+    # Mapping interface -------------------------------------------------
+    def __getitem__(self, image_path: str) -> List[Box]:
+        i = self._index[image_path]
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        names = self.class_names
+        return [
+            Box(names[c], x1, y1, x2, y2, conf)
+            for (x1, y1, x2, y2), c, conf in zip(
+                self.boxes[lo:hi].tolist(),
+                self.class_ids[lo:hi].tolist(),
+                self.confidences[lo:hi].tolist(),
+            )
+        ]
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.image_paths)
+
+    def __len__(self) -> int:
+        return len(self.image_paths)
+
+    def __contains__(self, image_path: object) -> bool:
+        return image_path in self._index
+
+    # Columnar access ---------------------------------------------------
+    @property
+    def num_boxes(self) -> int:
+        return len(self.class_ids)
+
+    def index_of(self, image_path: str) -> int:
+        """Return the row of ``image_path`` or ``-1`` if it has no entry."""
+        return self._index.get(image_path, -1)
+
+    def counts(self) -> np.ndarray:
+        """Number of boxes of every image."""
+        return np.diff(self.offsets)
+
+    def arrays(self, image_path: str) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """Return ``(boxes, class_ids, confidences)`` slices for one image."""
+        i = self._index[image_path]
+        lo, hi = int(self.offsets[i]), int(self.offsets[i + 1])
+        return self.boxes[lo:hi], self.class_ids[lo:hi], self.confidences[lo:hi]
+
+    def filter(self, min_conf: float) -> "DetectionTable":
+        """Return a table keeping only boxes with ``confidence >= min_conf``."""
+        # a float64 scalar keeps the comparison exact; a Python float would
+        # be rounded to float32 first and differ from ``>=`` on Python floats
+        keep = self.confidences >= np.float64(min_conf)
+        image_of = np.repeat(np.arange(len(self)), self.counts())
+        counts = np.bincount(image_of[keep], minlength=len(self))
+        offsets = np.concatenate([[0], np.cumsum(counts)])
+        return DetectionTable(
+            self.image_paths,
+            offsets,
+            self.boxes[keep],
+            self.class_ids[keep],
+            self.confidences[keep],
+            self.class_names,
+        )
+
+
+def gather_rows(offsets: np.ndarray, images: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+    """Return the rows of ``images`` (``-1`` = none) and the count per image."""
+    images = np.asarray(images, dtype=np.int64)
+    if len(offsets) == 1:  # empty table: no image has rows
+        return np.zeros(0, dtype=np.int64), np.zeros(len(images), dtype=np.int64)
+    valid = images >= 0
+    starts = np.where(valid, offsets[np.maximum(images, 0)], 0)
+    counts = np.where(valid, offsets[np.maximum(images, 0) + 1] - starts, 0)
+    total = int(counts.sum())
+    first = np.cumsum(counts) - counts
+    rows = np.arange(total) - np.repeat(first - starts, counts)
+    return rows, counts
+
+
+class TableBuilder:
+    """Accumulates boxes image by image and produces a :class:`DetectionTable`."""
+
+    def __init__(self, class_names: Sequence[str] | None = None) -> None:
+        self.class_names: List[str] = list(class_names) if class_names is not None else []
+        self._class_idx: Dict[str, int] = {n: i for i, n in enumerate(self.class_names)}
+        self._paths: List[str] = []
+        self._counts: List[int] = []
+        self._boxes: List[np.ndarray] = []
+        self._cls: List[np.ndarray] = []
+        self._conf: List[np.ndarray] = []
+        self._remap_src: DetectionTable | None = None
+        self._remap = np.zeros(0, dtype=np.int32)
+
+    def _class_id(self, label: str) -> int:
+        idx = self._class_idx.get(label)
+        if idx is None:
+            idx = self._class_idx[label] = len(self.class_names)
+            self.class_names.append(label)
+        return idx
+
+    def add_arrays(
+        self,
+        image_path: str,
+        boxes: np.ndarray,
+        class_ids: np.ndarray,
+        confidences: np.ndarray,
+    ) -> None:
+        """Append one image given ``(N, 4)`` xyxy boxes and per-box arrays.
+
+        ``class_ids`` index into the builder's ``class_names``. Coordinates
+        are truncated to integers like :class:`Box` values.
+        """
+        self._paths.append(image_path)
+        self._counts.append(len(class_ids))
+        self._boxes.append(np.asarray(boxes).reshape(-1, 4).astype(np.int32))
+        self._cls.append(np.asarray(class_ids, dtype=np.int32))
+        self._conf.append(np.asarray(confidences, dtype=np.float32))
+
+    def add_boxes(self, image_path: str, boxes: Iterable[Box]) -> None:
+        """Append one image given :class:`Box` objects."""
+        boxes = list(boxes)
+        self.add_arrays(
+            image_path,
+            np.array([(b.xmin, b.ymin, b.xmax, b.ymax) for b in boxes], dtype=np.int64),
+            np.array([self._class_id(b.label) for b in boxes], dtype=np.int32),
+            np.array(
+                [1.0 if b.confidence is None else b.confidence for b in boxes],
+                dtype=np.float32,
+            ),
+        )
+
+    def add_from(self, table: DetectionTable, image_path: str) -> None:
+        """Append the boxes of ``image_path`` copied from another table."""
+        if table is not self._remap_src:
+            self._remap = np.array(
+                [self._class_id(n) for n in table.class_names] + [-1], dtype=np.int32
+            )
+            self._remap_src = table
+        boxes, class_ids, confidences = table.arrays(image_path)
+        self.add_arrays(image_path, boxes, self._remap[class_ids], confidences)
+
+    def build(self) -> DetectionTable:
+        offsets = np.concatenate([[0], np.cumsum(self._counts, dtype=np.int64)])
+        return DetectionTable(
+            self._paths,
+            offsets,
+            np.concatenate(self._boxes) if self._boxes else np.zeros((0, 4), dtype=np.int32),
+            np.concatenate(self._cls) if self._cls else np.zeros(0, dtype=np.int32),
+            np.concatenate(self._conf) if self._conf else np.zeros(0, dtype=np.float32),
+            self.class_names,
+        )
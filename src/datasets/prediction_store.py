@@ -0,0 +1,193 @@
+"""Append-only binary store of predictions with a memory-mapped reader."""
+
+from __future__ import annotations
+
+import json
+import os
+from pathlib import Path
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from .detections import DetectionTable
+
+# directory holding the store inside a run directory
+PREDICTIONS_DIR = "predictions"
+BOXES_NAME = "boxes.bin"
+IMAGES_NAME = "images.tsv"
+CLASSES_NAME = "classes.json"
+
+# one fixed-size little-endian record per box, grouped by image; every
+# line of ``images.tsv`` is ``<end record>\t<image path>``
+RECORD_DTYPE = np.dtype(
+    [
+        ("box", "<i4", (4,)),
+        ("class_id", "<i4"),
+        ("confidence", "<f4"),
+    ]
+)
+
+
+class PredictionWriter:
+    """Streams detections to ``out_dir`` as batches complete.
+
+    Boxes are appended to ``boxes.bin`` and flushed before their images
+    are listed in ``images.tsv`` together with the end of their record
+    range, so after a crash :func:`load_predictions` returns exactly the
+    images whose boxes were completely written. With
+    ``text_path`` the legacy ``predictions.txt`` lines are streamed too,
+    keeping only boxes with ``confidence >= text_min_conf``.
+
+    With ``resume`` an existing store in ``out_dir`` is kept: its complete
+    images are loaded into :attr:`completed`, any torn tail is cut off and
+    new batches are appended after them.
+    """
+
+    def __init__(
+        self,
+        out_dir: str | Path,
+        class_names: Sequence[str],
+        text_path: str | Path | None = None,
+        text_min_conf: float = 0.0,
+        resume: bool = False,
+    ) -> None:
+        self.out_dir = Path(out_dir)
+        self.out_dir.mkdir(parents=True, exist_ok=True)
+        self.text_min_conf = text_min_conf
+        self.num_images = 0
+        self.num_boxes = 0
+        self.completed: DetectionTable | None = None
+        if resume and (self.out_dir / IMAGES_NAME).exists():
+            mapped = load_predictions(self.out_dir)
+            # copy out of the map before the file underneath is truncated
+            self.completed = DetectionTable(
+                mapped.image_paths,
+                mapped.offsets,
+                np.array(mapped.boxes),
+                np.array(mapped.class_ids),
+                np.array(mapped.confidences),
+                mapped.class_names,
+            )
+            del mapped
+        stored = self.completed.class_names if self.completed is not None else []
+        self.class_names: List[str] = stored + [n for n in class_names if n not in stored]
+        self._class_idx: Dict[str, int] = {n: i for i, n in enumerate(self.class_names)}
+        self._write_classes()
+        self._text = open(text_path, "w", encoding="utf-8") if text_path else None
+        images_path = self.out_dir / IMAGES_NAME
+        if self.completed is None:
+            self._boxes = open(self.out_dir / BOXES_NAME, "wb")
+            self._images = open(images_path, "w", encoding="utf-8")
+        else:
+            self._boxes = open(self.out_dir / BOXES_NAME, "r+b")
+            self._boxes.truncate(self.completed.num_boxes * RECORD_DTYPE.itemsize)
+            self._boxes.seek(0, os.SEEK_END)
+            # rewrite the index without its torn tail, never leaving it empty
+            tmp = images_path.with_name(IMAGES_NAME + ".tmp")
+            self._images = open(tmp, "w", encoding="utf-8")
+            self._write_index(self.completed)
+            self._images.close()
+            os.replace(tmp, images_path)
+            self._images = open(images_path, "a", encoding="utf-8")
+            self._write_text(self.completed)
+
+    def _write_classes(self) -> None:
+        tmp = self.out_dir / (CLASSES_NAME + ".tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            json.dump(self.class_names, fh)
+        os.replace(tmp, self.out_dir / CLASSES_NAME)
+
+    def _remap(self, names: Sequence[str]) -> np.ndarray:
+        added = False
+        for n in names:
+            if n not in self._class_idx:
+                self._class_idx[n] = len(self.class_names)
+                self.class_names.append(n)
+                added = True
+        if added:
+            self._write_classes()
+        return np.array([self._class_idx[n] for n in names] + [-1], dtype=np.int32)
+
+    def write(self, table: DetectionTable) -> None:
+        """Append every image of ``table``."""
+        if not len(table):
+            return
+        records = np.empty(table.num_boxes, dtype=RECORD_DTYPE)
+        records["box"] = table.boxes
+        records["class_id"] = self._remap(table.class_names)[table.class_ids]
+        records["confidence"] = table.confidences
+        self._boxes.write(records.tobytes())
+        self._boxes.flush()
+        self._write_index(table)
+        self._write_text(table)
+
+    def _write_index(self, table: DetectionTable) -> None:
+        ends = self.num_boxes + table.offsets[1:]
+        self._images.write(
+            "".join(f"{end}\t{p}\n" for end, p in zip(ends.tolist(), table.image_paths))
+        )
+        self._images.flush()
+        self.num_images += len(table)
+        self.num_boxes += table.num_boxes
+
+    def _write_text(self, table: DetectionTable) -> None:
+        if self._text is not None:
+            lines = []
+            for img, boxes in table.items():
+                b_str = " ".join(
+                    f"{b.label},{b.xmin},{b.ymin},{b.xmax},{b.ymax}"
+                    for b in boxes
+                    if b.confidence >= self.text_min_conf
+                )
+                lines.append(f"{img} {b_str}\n")
+            self._text.write("".join(lines))
+            self._text.flush()
+
+    def close(self) -> None:
+        for fh in (self._boxes, self._images, self._text):
+            if fh is not None:
+                fh.close()
+
+    def __enter__(self) -> "PredictionWriter":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
+
+
+def load_predictions(path: str | Path) -> DetectionTable:
+    """Load a store written by :class:`PredictionWriter` as a table.
+
+    ``path`` is the store directory or a run directory containing it. The
+    box, class and confidence columns are views of a read-only memory map,
+    so loading costs little more than reading the image list. Images whose
+    entry or boxes were not completely written are dropped.
+    """
+    store = Path(path)
+    if not (store / BOXES_NAME).exists() and (store / PREDICTIONS_DIR).is_dir():
+        store = store / PREDICTIONS_DIR
+
+    with (store / CLASSES_NAME).open("r", encoding="utf-8") as fh:
+        class_names = json.load(fh)
+    with (store / IMAGES_NAME).open("r", encoding="utf-8") as fh:
+        lines = fh.read().split("\n")[:-1]  # a trailing partial line is incomplete
+    entries = [line.split("\t", 1) for line in lines]
+    ends = np.array([int(e[0]) for e in entries], dtype=np.int64)
+    n_records = os.path.getsize(store / BOXES_NAME) // RECORD_DTYPE.itemsize
+    n_images = int(np.searchsorted(ends, n_records, side="right"))
+    image_paths = [e[1] for e in entries[:n_images]]
+    offsets = np.concatenate([[0], ends[:n_images]])
+
+    if n_records:
+        records = np.memmap(store / BOXES_NAME, dtype=RECORD_DTYPE, mode="r", shape=(n_records,))
+    else:
+        records = np.zeros(0, dtype=RECORD_DTYPE)
+    records = records[: offsets[-1]]
+    return DetectionTable(
+        image_paths,
+        offsets,
+        records["box"],
+        records["class_id"],
+        records["confidence"],
+        class_names,
+    )
@@ -2,14 +2,18 @@
 
 from __future__ import annotations
 
+import logging
 import os
+from concurrent.futures import ProcessPoolExecutor
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Iterator, List, Tuple
 import xml.etree.ElementTree as ET
 
+from .annotation_index import AnnotationIndex, Record
 
-@dataclass
+
+@dataclass(slots=True)
 class Box:
     label: str
     xmin: int
@@ -32,16 +36,12 @@ class DatasetConsistencyError(Exception):
         self.errors = errors
         self.annotations = annotations
 
-def parse_annotation(xml_file: str) -> Annotation:
-    """Parse a single Pascal VOC style XML file."""
+def _parse_xml(xml_file: str) -> Record:
+    """Return the ``filename`` text and ``[label, xmin, ymin, xmax, ymax]`` rows."""
     tree = ET.parse(xml_file)
     root = tree.getroot()
 
-    filename = root.findtext("filename")
-    folder = Path(xml_file).parent
-    image_path = folder / filename if filename else Path()
-
-    boxes: List[Box] = []
+    rows: List[list] = []
     for obj in root.findall("object"):
         name = obj.findtext("name") or "unknown"
         bnd = obj.find("bndbox")
@@ -54,55 +54,172 @@ def parse_annotation(xml_file: str) -> Annotation:
             ymax = int(float(bnd.findtext("ymax", "0")))
         except ValueError:
             continue
-        boxes.append(Box(name, xmin, ymin, xmax, ymax, 1.0))
+        rows.append([name, xmin, ymin, xmax, ymax])
 
+    return root.findtext("filename"), rows
+
+
+def _annotation_from_record(xml_file: str, record: Record) -> Annotation:
+    filename, rows = record
+    folder = Path(xml_file).parent
+    image_path = folder / filename if filename else Path()
+    boxes = [Box(name, xmin, ymin, xmax, ymax, 1.0) for name, xmin, ymin, xmax, ymax in rows]
     return Annotation(str(image_path), boxes)
 
 
-def load_dataset(root_dir: str) -> List[Annotation]:
+def parse_annotation(xml_file: str) -> Annotation:
+    """Parse a single Pascal VOC style XML file."""
+    return _annotation_from_record(xml_file, _parse_xml(xml_file))
+
+
+# XML files handed to a worker process at a time
+_CHUNK_SIZE = 256
+
+_IMAGE_EXTS = (".jpg", ".jpeg", ".png")
+
+
+def _parse_chunk(xml_paths: List[str]) -> List[Tuple[Record | None, str | None]]:
+    """Parse ``xml_paths`` returning ``(record, error)`` for each file."""
+    results: List[Tuple[Record | None, str | None]] = []
+    for xml_path in xml_paths:
+        try:
+            results.append((_parse_xml(xml_path), None))
+        except Exception as exc:  # pragma: no cover - malformed XML
+            results.append((None, f"Failed to parse {xml_path}: {exc}"))
+    return results
+
+
+def _key(path: str) -> str:
+    return os.path.normcase(os.path.abspath(path))
+
+
+def _walk(top: str) -> Iterator[Tuple[str, List[os.DirEntry]]]:
+    """Like :func:`os.walk` but yields the file ``DirEntry`` objects, whose
+    cached ``stat`` results save a system call per file on some platforms."""
+    try:
+        with os.scandir(top) as it:
+            entries = list(it)
+    except OSError:
+        return
+    dirs: List[str] = []
+    files: List[os.DirEntry] = []
+    for entry in entries:
+        try:
+            is_dir = entry.is_dir()
+        except OSError:
+            is_dir = False
+        if is_dir:
+            if not entry.is_symlink():
+                dirs.append(entry.path)
+        else:
+            files.append(entry)
+    yield top, files
+    for d in dirs:
+        yield from _walk(d)
+
+
+def load_dataset(
+    root_dir: str,
+    workers: int | None = None,
+    use_index: bool = True,
+) -> List[Annotation]:
     """Load all XML annotations under ``root_dir``.
 
+    The tree is walked once; XML files are parsed in chunks by a pool of
+    ``workers`` processes (default: one per CPU, serial for small datasets)
+    and images are cross-checked against annotations using the file sets
+    collected during the walk. With ``use_index`` parsed annotations are
+    cached in an :class:`~.annotation_index.AnnotationIndex` in the dataset
+    root and only new or modified XML files (by mtime and size) are parsed.
+
     Any missing image/annotation pairs are collected and reported via
     :class:`DatasetConsistencyError` but do not halt execution."""
 
     annotations: List[Annotation] = []
     errors: List[str] = []
-    xml_files: set[str] = set()
-    seen_images: set[str] = set()
-
-    for dirpath, _, filenames in os.walk(root_dir):
-        for name in filenames:
-            if not name.lower().endswith(".xml"):
-                continue
-            xml_path = os.path.join(dirpath, name)
-            xml_files.add(os.path.abspath(xml_path))
+    xml_entries: List[os.DirEntry] = []
+    image_paths: List[str] = []
+    all_files: set[str] = set()
+
+    for _, entries in _walk(root_dir):
+        for entry in entries:
+            all_files.add(_key(entry.path))
+            lower = entry.name.lower()
+            if lower.endswith(".xml"):
+                xml_entries.append(entry)
+            elif lower.endswith(_IMAGE_EXTS):
+                image_paths.append(entry.path)
+    xml_paths = [e.path for e in xml_entries]
+
+    index = AnnotationIndex(root_dir) if use_index else None
+    records: List[Tuple[Record | None, str | None] | None] = [None] * len(xml_paths)
+    stats: List[os.stat_result | None] = [None] * len(xml_paths)
+    if index is not None:
+        for i, entry in enumerate(xml_entries):
             try:
-                ann = parse_annotation(xml_path)
-            except Exception as exc:  # pragma: no cover - malformed XML
-                errors.append(f"Failed to parse {xml_path}: {exc}")
+                stats[i] = entry.stat()
+            except OSError:
                 continue
+            cached = index.get(entry.path, stats[i])
+            if cached is not None:
+                records[i] = (cached, None)
+    todo = [i for i, r in enumerate(records) if r is None]
+
+    chunks = [todo[i : i + _CHUNK_SIZE] for i in range(0, len(todo), _CHUNK_SIZE)]
+    path_chunks = [[xml_paths[i] for i in chunk] for chunk in chunks]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    workers = min(workers, len(chunks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = [r for chunk in pool.map(_parse_chunk, path_chunks) for r in chunk]
+    else:
+        parsed = [r for chunk in path_chunks for r in _parse_chunk(chunk)]
+    for i, result in zip(todo, parsed):
+        records[i] = result
+
+    if index is not None:
+        fresh = [
+            (xml_paths[i], stats[i], records[i][0])
+            for i in todo
+            if records[i][0] is not None and stats[i] is not None
+        ]
+        index.update(fresh, xml_paths)
+        index.close()
+        if xml_paths:
+            logging.info(
+                "Annotation index: %d cached, %d parsed", len(xml_paths) - len(todo), len(todo)
+            )
 
-            img_path = ann.image_path
-            if not os.path.isabs(img_path):
-                img_path = os.path.join(dirpath, os.path.basename(img_path))
-                ann.image_path = img_path
-            if not os.path.exists(img_path):
-                errors.append(f"Missing image for {xml_path}")
-                continue
-            annotations.append(ann)
-            seen_images.add(os.path.abspath(img_path))
+    seen_images: set[str] = set()
+    for xml_path, (record, error) in zip(xml_paths, records):
+        if record is None:
+            errors.append(error or f"Failed to parse {xml_path}")
+            continue
+        ann = _annotation_from_record(xml_path, record)
+        img_path = ann.image_path
+        if not os.path.isabs(img_path):
+            img_path = os.path.join(os.path.dirname(xml_path), os.path.basename(img_path))
+            ann.image_path = img_path
+        img_key = _key(img_path)
+        # files inside the tree were all seen by the walk; anything else
+        # (outside the tree, or the folder itself when the XML names no
+        # file) needs a filesystem lookup
+        exists = img_key in all_files or os.path.exists(img_path)
+        if not exists:
+            errors.append(f"Missing image for {xml_path}")
+            continue
+        annotations.append(ann)
+        seen_images.add(img_key)
 
     # Then check for images that are missing annotations
-    for dirpath, _, filenames in os.walk(root_dir):
-        for name in filenames:
-            if name.lower().endswith((".jpg", ".jpeg", ".png")):
-                img_path = os.path.join(dirpath, name)
-                if os.path.abspath(img_path) not in seen_images:
-                    xml_path = os.path.splitext(img_path)[0] + ".xml"
-                    if os.path.abspath(xml_path) not in xml_files and not os.path.exists(xml_path):
-                        errors.append(f"Missing annotation for {img_path}")
+    for img_path in image_paths:
+        if _key(img_path) not in seen_images:
+            xml_path = os.path.splitext(img_path)[0] + ".xml"
+            if _key(xml_path) not in all_files:
+                errors.append(f"Missing annotation for {img_path}")
 
     if errors:
         raise DatasetConsistencyError(errors, annotations)
 
-    return annotations
\ No newline at end of file
+    return annotations
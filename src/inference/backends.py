@@ -0,0 +1,396 @@
+"""Inference backends producing per-image ``(xyxy, class_ids, conf)`` arrays."""
+
+from __future__ import annotations
+
+import abc
+import ast
+import io
+import logging
+import time
+from typing import Any, List, Sequence, Tuple
+
+import numpy as np
+
+from src.config import BACKENDS
+from src.inference.prefetch import load_image
+from src.metrics.evaluator import box_iou
+from src.utils import profiling
+from src.utils.lazy import available, optional_import
+
+# one result per image: (N, 4) float32 xyxy, (N,) class ids, (N,) confidences
+Detections = Tuple[np.ndarray, np.ndarray, np.ndarray]
+# letterbox scale, (left, top) padding and original (h, w) of one image
+LetterboxMeta = Tuple[float, Tuple[int, int], Tuple[int, int]]
+
+
+class Backend(abc.ABC):
+    """Interface shared by every inference backend.
+
+    ``names`` lists the class names by class id and :meth:`infer` runs one
+    batch of image paths or BGR ``uint8`` arrays. ``stride`` is set by
+    backends that pad batches of one image shape only to a multiple of it
+    (see :func:`trim_padding`).
+    """
+
+    names: List[str]
+    stride: int | None = None
+
+    @abc.abstractmethod
+    def infer(self, sources: Sequence[Any]) -> List[Detections]:
+        """Return the detections of every image in ``sources``."""
+
+    def infer_letterboxed(self, batch: np.ndarray, meta: Sequence[LetterboxMeta]) -> List[Detections]:
+        """Run ``(N, H, W, 3)`` BGR images already letterboxed to the input size.
+
+        ``meta`` holds every image's letterbox scale, ``(left, top)``
+        padding and original ``(h, w)``; boxes are returned in original
+        image coordinates. Backends that letterbox themselves see an image
+        of the input size, trimmed to ``stride`` like their own letterbox
+        would be, and leave it as is.
+        """
+        if self.stride:
+            batch, meta = trim_padding(batch, meta, self.stride)
+        out: List[Detections] = []
+        for (xyxy, cls, conf), (scale, pad, shape) in zip(self.infer(list(batch)), meta):
+            xyxy = (xyxy - np.array([pad[0], pad[1], pad[0], pad[1]], dtype=xyxy.dtype)) / scale
+            xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, shape[1])
+            xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, shape[0])
+            out.append((xyxy, cls, conf))
+        return out
+
+    def close(self) -> None:
+        """Release resources held by the backend."""
+
+
+class UltralyticsBackend(Backend):
+    """Runs ``.pt`` (or any other supported) weights through ``ultralytics.YOLO``.
+
+    ``threads`` sets torch's intra-op thread count, which applies to the
+    whole process.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        confidence: float,
+        image_size: Sequence[int],
+        batch_size: int = 1,
+        threads: int | None = None,
+    ) -> None:
+        try:
+            from ultralytics import YOLO  # type: ignore
+        except Exception as exc:  # pragma: no cover - ultralytics may not be installed
+            logging.exception("Failed to import ultralytics YOLO: %s", exc)
+            raise RuntimeError("YOLO library not available") from exc
+        if threads:
+            import torch  # type: ignore
+
+            torch.set_num_threads(threads)
+
+        try:
+            self.model = YOLO(model_path)
+            self.model.conf = confidence
+            self.model.overrides["conf"] = confidence
+            self.model.overrides["imgsz"] = list(image_size)
+        except Exception as exc:  # pragma: no cover - model loading may fail
+            logging.exception("Failed to load YOLO model: %s", exc)
+            raise
+        self.confidence = confidence
+        self.image_size = list(image_size)
+        self.batch_size = batch_size
+        # ultralytics trims the padding of same-shape batches for PyTorch models
+        net = getattr(self.model, "model", None)
+        if hasattr(net, "stride"):
+            self.stride = int(max(net.stride))
+        names = self.model.names
+        self.names = [names[i] for i in sorted(names)] if isinstance(names, dict) else list(names)
+
+    def infer(self, sources: Sequence[Any]) -> List[Detections]:
+        results = self.model.predict(
+            list(sources),
+            imgsz=self.image_size,
+            batch=self.batch_size,
+            conf=self.confidence,
+            verbose=False,
+        )
+        profiler = profiling.active()
+        if profiler is not None and results:
+            # ultralytics times its own stages; lay them out back to back
+            end = time.perf_counter()
+            stages = [("preprocess", "preprocess"), ("forward", "inference"), ("nms", "postprocess")]
+            ms = [sum(r.speed.get(key) or 0.0 for r in results) for _, key in stages]
+            start = end - sum(ms) / 1000
+            for (name, _), t in zip(stages, ms):
+                profiler.record(name, start, t / 1000, len(results))
+                start += t / 1000
+        out: List[Detections] = []
+        for r in results:
+            b = r.boxes
+            out.append((b.xyxy.cpu().numpy(), b.cls.cpu().numpy(), b.conf.cpu().numpy()))
+        return out
+
+
+def read_image(source: Any) -> np.ndarray:
+    """Return ``source`` as a BGR ``uint8`` array, decoding it if it is a path."""
+    if not isinstance(source, str):
+        return source
+    # cv2 decodes straight to BGR, as ultralytics does for paths
+    cv2 = optional_import("cv2")
+    image = cv2.imread(source) if cv2 is not None else None
+    return image if image is not None else load_image(source)
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """Decode an encoded image (JPEG, PNG, ...) held in memory to BGR ``uint8``."""
+    cv2 = optional_import("cv2")
+    if cv2 is not None:
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            return image
+    return load_image(io.BytesIO(data))
+
+
+def letterbox(
+    image: np.ndarray,
+    new_shape: Sequence[int],
+    color: int = 114,
+) -> Tuple[np.ndarray, float, Tuple[int, int]]:
+    """Resize ``image`` keeping its aspect ratio and pad it to ``new_shape``.
+
+    Returns the padded ``(H, W, 3)`` image, the scale factor and the
+    ``(left, top)`` padding, using the same rounding as ultralytics so that
+    boxes map back to identical coordinates.
+    """
+    h, w = image.shape[:2]
+    new_h, new_w = int(new_shape[0]), int(new_shape[1])
+    r = min(new_h / h, new_w / w)
+    unpad_w, unpad_h = int(round(w * r)), int(round(h * r))
+    dw, dh = (new_w - unpad_w) / 2, (new_h - unpad_h) / 2
+    if (w, h) != (unpad_w, unpad_h):
+        cv2 = optional_import("cv2")
+        if cv2 is not None:
+            image = cv2.resize(image, (unpad_w, unpad_h), interpolation=cv2.INTER_LINEAR)
+        else:
+            from PIL import Image
+
+            image = np.asarray(Image.fromarray(image).resize((unpad_w, unpad_h), Image.BILINEAR))
+    top, left = int(round(dh - 0.1)), int(round(dw - 0.1))
+    out = np.full((new_h, new_w, 3), color, dtype=np.uint8)
+    out[top : top + unpad_h, left : left + unpad_w] = image
+    return out, r, (left, top)
+
+
+def trim_padding(
+    images: Sequence[np.ndarray] | np.ndarray,
+    meta: Sequence[LetterboxMeta],
+    stride: int,
+) -> Tuple[Sequence[np.ndarray] | np.ndarray, List[LetterboxMeta]]:
+    """Crop a letterboxed batch to the padding ultralytics gives it.
+
+    When every image of a batch has the same shape, ultralytics pads
+    ``.pt`` and dynamic-shape models only up to a multiple of ``stride``
+    rather than to the full input size. That input is the centre of the
+    full letterbox, so it is cut out of it here and the padding in
+    ``meta`` adjusted. Batches of mixed shapes are returned unchanged.
+    """
+    if not len(meta) or len({(pad, shape) for _, pad, shape in meta}) != 1:
+        return images, list(meta)
+    left, top = meta[0][1]
+    # what is left of the padding once whole strides are removed, split as letterbox does
+    x0, y0 = left - (2 * left % stride) // 2, top - (2 * top % stride) // 2
+    if not x0 and not y0:
+        return images, list(meta)
+    h, w = images[0].shape[:2]
+    if isinstance(images, np.ndarray):
+        images = images[:, y0 : h - y0, x0 : w - x0]
+    else:
+        images = [img[y0 : h - y0, x0 : w - x0] for img in images]
+    return images, [(scale, (left - x0, top - y0), shape) for scale, _, shape in meta]
+
+
+def nms(boxes: np.ndarray, scores: np.ndarray, iou_threshold: float) -> np.ndarray:
+    """Greedy non-maximum suppression; returns kept indices by falling score."""
+    order = np.argsort(-scores, kind="stable")
+    keep: List[int] = []
+    while order.size:
+        i = int(order[0])
+        keep.append(i)
+        if order.size == 1:
+            break
+        ious = box_iou(boxes[i][None], boxes[order[1:]])
+        order = order[1:][ious <= iou_threshold]
+    return np.array(keep, dtype=np.intp)
+
+
+def to_blob(images: Sequence[np.ndarray] | np.ndarray, dtype: Any = np.float32) -> np.ndarray:
+    """Stack letterboxed BGR ``uint8`` images into an RGB NCHW tensor in ``[0, 1]``.
+
+    ``images`` may already be one ``(N, H, W, 3)`` array, which is used
+    without stacking.
+    """
+    batch = (images if isinstance(images, np.ndarray) else np.stack(images))[..., ::-1].transpose(0, 3, 1, 2)
+    return np.ascontiguousarray(batch, dtype=dtype) / dtype(255)
+
+
+# class offset that keeps boxes of different classes apart in batched NMS
+_MAX_WH = 7680
+
+
+def postprocess(
+    output: np.ndarray,
+    confidence: float,
+    iou_threshold: float,
+    max_det: int,
+    scale: float,
+    pad: Tuple[int, int],
+    orig_shape: Tuple[int, int],
+) -> Detections:
+    """Decode one image of raw YOLOv8 output into boxes in original pixels.
+
+    ``output`` is ``(4 + classes, anchors)`` with ``cx, cy, w, h`` rows, or
+    ``(max_det, 6)`` rows of ``x1, y1, x2, y2, conf, cls`` for models
+    exported with NMS included.
+    """
+    if output.ndim == 2 and output.shape[1] == 6 and output.shape[0] != 6:
+        xyxy = output[:, :4].astype(np.float32)
+        conf = output[:, 4].astype(np.float32)
+        cls = output[:, 5].astype(np.float32)
+        keep = conf > confidence
+        xyxy, conf, cls = xyxy[keep], conf[keep], cls[keep]
+    else:
+        pred = output.T
+        scores = pred[:, 4:]
+        cls_idx = scores.argmax(axis=1)
+        conf = scores[np.arange(len(scores)), cls_idx]
+        keep = conf > confidence
+        pred, conf, cls = pred[keep], conf[keep].astype(np.float32), cls_idx[keep].astype(np.float32)
+        xyxy = np.empty((len(pred), 4), dtype=np.float32)
+        xyxy[:, 0] = pred[:, 0] - pred[:, 2] / 2
+        xyxy[:, 1] = pred[:, 1] - pred[:, 3] / 2
+        xyxy[:, 2] = pred[:, 0] + pred[:, 2] / 2
+        xyxy[:, 3] = pred[:, 1] + pred[:, 3] / 2
+        kept = nms(xyxy + cls[:, None] * _MAX_WH, conf, iou_threshold)[:max_det]
+        xyxy, conf, cls = xyxy[kept], conf[kept], cls[kept]
+
+    xyxy[:, [0, 2]] -= pad[0]
+    xyxy[:, [1, 3]] -= pad[1]
+    xyxy /= scale
+    xyxy[:, [0, 2]] = xyxy[:, [0, 2]].clip(0, orig_shape[1])
+    xyxy[:, [1, 3]] = xyxy[:, [1, 3]].clip(0, orig_shape[0])
+    return xyxy, cls, conf
+
+
+class OnnxRuntimeBackend(Backend):
+    """Runs an exported YOLOv8 ``.onnx`` model with ONNX Runtime on the CPU.
+
+    Pre- and postprocessing (letterbox, box decoding, NMS) are done in
+    NumPy, so neither torch nor ultralytics is imported. Models exported
+    with a dynamic batch axis run each batch in one session call; static
+    models are called once per image. Models with a dynamic input size
+    get the same padding as under ultralytics (see :func:`trim_padding`).
+    Class names and the stride are read from the metadata ultralytics
+    embeds at export time.
+    """
+
+    def __init__(
+        self,
+        model_path: str,
+        confidence: float,
+        image_size: Sequence[int],
+        iou_threshold: float = 0.7,
+        max_det: int = 300,
+        threads: int | None = None,
+    ) -> None:
+        ort = optional_import("onnxruntime")
+        if ort is None:
+            raise RuntimeError("onnxruntime is required for .onnx models")
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads:
+            options.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(
+            model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.input_dtype = np.float16 if "float16" in inp.type else np.float32
+        self.dynamic_batch = not isinstance(inp.shape[0], int)
+        h, w = inp.shape[2], inp.shape[3]
+        self.image_size = (
+            (h, w) if isinstance(h, int) and isinstance(w, int) else tuple(int(v) for v in image_size)
+        )
+        self.confidence = confidence
+        self.iou_threshold = iou_threshold
+        self.max_det = max_det
+        meta = self.session.get_modelmeta().custom_metadata_map
+        names = ast.literal_eval(meta["names"]) if "names" in meta else {}
+        self.names = [names[i] for i in sorted(names)] if isinstance(names, dict) else list(names)
+        # a fixed input size is always padded in full
+        self.stride = None if isinstance(h, int) and isinstance(w, int) else int(meta.get("stride", 32))
+
+    def infer(self, sources: Sequence[Any]) -> List[Detections]:
+        with profiling.span("preprocess", len(sources)):
+            images = [read_image(s) for s in sources]
+            boxed = [letterbox(img, self.image_size) for img in images]
+        return self._run(
+            [b[0] for b in boxed],
+            [(scale, pad, img.shape[:2]) for (_, scale, pad), img in zip(boxed, images)],
+        )
+
+    def infer_letterboxed(self, batch: np.ndarray, meta: Sequence[LetterboxMeta]) -> List[Detections]:
+        if tuple(batch.shape[1:3]) != tuple(self.image_size):  # static model of another size
+            return super().infer_letterboxed(batch, meta)
+        return self._run(batch, meta)
+
+    def _run(self, images: Sequence[np.ndarray] | np.ndarray, meta: Sequence[LetterboxMeta]) -> List[Detections]:
+        if self.stride:
+            images, meta = trim_padding(images, meta, self.stride)
+        n = len(images)
+        groups = [images] if self.dynamic_batch else [images[i : i + 1] for i in range(n)]
+        outputs: List[np.ndarray] = []
+        with profiling.span("forward", n):
+            for group in groups:
+                blob = to_blob(group, self.input_dtype)
+                outputs.extend(self.session.run(None, {self.input_name: blob})[0])
+        with profiling.span("nms", n):
+            return [
+                postprocess(
+                    out.astype(np.float32),
+                    self.confidence,
+                    self.iou_threshold,
+                    self.max_det,
+                    scale,
+                    pad,
+                    shape,
+                )
+                for out, (scale, pad, shape) in zip(outputs, meta)
+            ]
+
+
+def resolve_backend(model_path: str, backend: str = "auto") -> str:
+    """Name of the backend that runs ``model_path``.
+
+    ``auto`` picks ONNX Runtime for ``.onnx`` files when it is installed
+    and ultralytics otherwise.
+    """
+    if backend not in BACKENDS:
+        raise ValueError(f"Unknown backend {backend!r}; expected one of {', '.join(BACKENDS)}")
+    if backend == "auto":
+        is_onnx = model_path.lower().endswith(".onnx")
+        backend = "onnxruntime" if is_onnx and available("onnxruntime") else "ultralytics"
+    return backend
+
+
+def create_backend(
+    model_path: str,
+    backend: str = "auto",
+    confidence: float = 0.25,
+    image_size: Sequence[int] = (192, 320),
+    batch_size: int = 1,
+    threads: int | None = None,
+) -> Backend:
+    """Create the backend for ``model_path`` (see :func:`resolve_backend`)."""
+    backend = resolve_backend(model_path, backend)
+    if backend == "onnxruntime":
+        return OnnxRuntimeBackend(model_path, confidence, image_size, threads=threads)
+    return UltralyticsBackend(model_path, confidence, image_size, batch_size, threads)
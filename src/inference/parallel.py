@@ -0,0 +1,106 @@
+"""Data-parallel inference over several worker processes."""
+
+from __future__ import annotations
+
+import os
+import sys
+from typing import Any, Dict, Iterator, List, Sequence, Tuple
+
+from src.utils.processes import spawn_pool
+
+# environment variables read by the BLAS/OpenMP runtimes when torch loads
+_THREAD_VARS = ("OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS")
+
+# the model of this worker process, created by ``_init_worker``
+_PREDICTOR: Any = None
+
+
+def _init_worker(predictor_kwargs: Dict[str, Any], threads: int) -> None:
+    # pin the thread count before torch is imported by the predictor
+    for var in _THREAD_VARS:
+        os.environ[var] = str(threads)
+    from src.inference.predictor import Predictor
+
+    global _PREDICTOR
+    _PREDICTOR = Predictor(**predictor_kwargs, threads=threads)
+    if "torch" in sys.modules:  # only the ultralytics backend loads torch
+        import torch  # type: ignore
+
+        torch.set_num_threads(threads)
+        try:
+            torch.set_num_interop_threads(1)
+        except RuntimeError:  # pragma: no cover - inter-op pool already started
+            pass
+
+
+def _predict_shard(image_paths: List[str]) -> List[tuple]:
+    """Return ``(xyxy, class_ids, conf)`` arrays for every image of a shard."""
+    from src.inference.prefetch import ImagePrefetcher, np
+
+    p = _PREDICTOR
+    if p.prefetch_depth > 0 and np is not None:
+        batches = ImagePrefetcher(image_paths, p.batch_size, p.decode_workers, p.prefetch_depth, p.decode)
+    elif p.reduced_decode:
+        size = max(1, int(p.batch_size))
+        batches = (
+            (None, [p.decode(path) for path in image_paths[i : i + size]])
+            for i in range(0, len(image_paths), size)
+        )
+    else:
+        size = max(1, int(p.batch_size))
+        batches = ((image_paths[i : i + size],) * 2 for i in range(0, len(image_paths), size))
+    infer = p.batch_arrays_reduced if p.reduced_decode else p.batch_arrays
+    arrays: List[tuple] = []
+    for _, sources in batches:
+        arrays.extend(infer(sources))
+    return arrays
+
+
+def default_threads(workers: int) -> int:
+    """Split the CPU cores evenly between ``workers`` processes."""
+    return max(1, (os.cpu_count() or 1) // max(1, workers))
+
+
+class WorkerPool:
+    """Pool of processes that each load the model once.
+
+    Every worker builds its own :class:`~src.inference.predictor.Predictor`
+    from ``predictor_kwargs`` with ``threads`` intra-op threads (default: an
+    even share of the cores). Processes are spawned rather than forked (see
+    :func:`~src.utils.processes.spawn_pool`).
+    """
+
+    def __init__(
+        self,
+        predictor_kwargs: Dict[str, Any],
+        workers: int,
+        threads: int | None = None,
+    ) -> None:
+        self.workers = max(1, int(workers))
+        self.threads = threads or default_threads(self.workers)
+        self._pool = spawn_pool(
+            self.workers,
+            initializer=_init_worker,
+            initargs=(predictor_kwargs, self.threads),
+        )
+
+    def run(
+        self, image_paths: Sequence[str], shard_size: int
+    ) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """Yield ``(paths, arrays)`` per shard of ``image_paths`` in input order.
+
+        Shards are handed out as workers become free, so a slow shard does
+        not hold the others back; results are still yielded in order.
+        """
+        size = max(1, int(shard_size))
+        shards = [list(image_paths[i : i + size]) for i in range(0, len(image_paths), size)]
+        yield from zip(shards, self._pool.map(_predict_shard, shards))
+
+    def close(self) -> None:
+        self._pool.shutdown(wait=True, cancel_futures=True)
+
+    def __enter__(self) -> "WorkerPool":
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self.close()
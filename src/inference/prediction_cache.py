@@ -0,0 +1,171 @@
+"""Content-addressed on-disk cache of raw model predictions."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Sequence
+
+from src.datasets.xml_loader import Box
+from src.utils.file_utils import file_digest
+
+# file name of the cache database inside ``cache_dir``
+CACHE_NAME = "predictions.sqlite"
+
+
+class PredictionCache:
+    """SQLite store of per-image detections keyed by everything that affects them.
+
+    A key combines the model weights digest, the backend running them,
+    the image identity, the inference size and the confidence floor, so any change to one of them
+    misses. Images are identified by a digest of their contents when
+    ``hash_images`` is set, otherwise by absolute path, mtime and size,
+    which avoids reading every image just to look it up.
+
+    Entries are evicted least-recently-used first once the stored
+    detections exceed ``max_bytes``; their total size is updated on every
+    write, so the table is only scanned when eviction is due. Like the
+    annotation index, the cache disables itself with a warning if the
+    database cannot be used. One instance may be used from several
+    threads; calls are serialized.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        model_path: str,
+        image_size: Sequence[int],
+        confidence: float,
+        max_bytes: int = 1 << 30,
+        hash_images: bool = False,
+        backend: str = "",
+    ) -> None:
+        self.path = os.path.join(cache_dir, CACHE_NAME)
+        self.max_bytes = max_bytes
+        self.hash_images = hash_images
+        size = "x".join(str(int(v)) for v in image_size)
+        self._prefix = f"{file_digest(model_path)}|{backend}|{size}|{float(confidence)!r}|"
+        self._conn: sqlite3.Connection | None = None
+        self._lock = threading.Lock()
+        try:
+            os.makedirs(cache_dir, exist_ok=True)
+            # built by the caller's thread but used by the one running inference
+            self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False)
+            with self._conn:
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS predictions ("
+                    "key TEXT PRIMARY KEY, boxes TEXT, size INTEGER, last_used REAL)"
+                )
+                # running total of ``size``, kept in the database so that
+                # every connection to the file sees the same value
+                self._conn.execute(
+                    "CREATE TABLE IF NOT EXISTS stored (id INTEGER PRIMARY KEY CHECK (id = 0), total INTEGER)"
+                )
+                self._conn.execute(
+                    "INSERT OR IGNORE INTO stored SELECT 0, COALESCE(SUM(size), 0) FROM predictions"
+                )
+        except (OSError, sqlite3.Error) as exc:
+            logging.warning("Prediction cache %s unavailable: %s", self.path, exc)
+            self.close()
+
+    def key(self, image_path: str) -> str:
+        if self.hash_images:
+            image_id = file_digest(image_path)
+        else:
+            st = os.stat(image_path)
+            image_id = f"{os.path.abspath(image_path)}|{st.st_mtime_ns}|{st.st_size}"
+        return hashlib.sha256((self._prefix + image_id).encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Sequence[str]) -> Dict[str, List[Box]]:
+        """Return cached boxes for the ``keys`` that are present."""
+        if self._conn is None or not keys:
+            return {}
+        found: Dict[str, List[Box]] = {}
+        try:
+            with self._lock:
+                for i in range(0, len(keys), 500):
+                    chunk = list(keys[i : i + 500])
+                    marks = ",".join("?" * len(chunk))
+                    for key, boxes in self._conn.execute(
+                        f"SELECT key, boxes FROM predictions WHERE key IN ({marks})", chunk
+                    ):
+                        found[key] = [Box(*row) for row in json.loads(boxes)]
+                with self._conn:
+                    self._conn.executemany(
+                        "UPDATE predictions SET last_used = ? WHERE key = ?",
+                        [(time.time(), k) for k in found],
+                    )
+        except sqlite3.Error as exc:
+            logging.warning("Prediction cache lookup failed: %s", exc)
+        return found
+
+    def put_many(self, items: Dict[str, List[Box]]) -> None:
+        """Store ``key -> boxes`` entries and evict old ones if over budget."""
+        if self._conn is None or not items:
+            return
+        now = time.time()
+        rows = []
+        for key, boxes in items.items():
+            text = json.dumps(
+                [[b.label, b.xmin, b.ymin, b.xmax, b.ymax, b.confidence] for b in boxes]
+            )
+            rows.append((key, text, len(text), now))
+        try:
+            with self._lock:
+                with self._conn:
+                    replaced = self._sizes([key for key, *_ in rows])
+                    self._conn.executemany(
+                        "INSERT OR REPLACE INTO predictions VALUES (?, ?, ?, ?)", rows
+                    )
+                    self._conn.execute(
+                        "UPDATE stored SET total = total + ?",
+                        (sum(r[2] for r in rows) - replaced,),
+                    )
+                self._evict()
+        except sqlite3.Error as exc:
+            logging.warning("Prediction cache update failed: %s", exc)
+
+    def _sizes(self, keys: Sequence[str]) -> int:
+        """Total ``size`` of the stored entries among ``keys``."""
+        assert self._conn is not None
+        total = 0
+        for i in range(0, len(keys), 500):
+            chunk = list(keys[i : i + 500])
+            marks = ",".join("?" * len(chunk))
+            (size,) = self._conn.execute(
+                f"SELECT COALESCE(SUM(size), 0) FROM predictions WHERE key IN ({marks})", chunk
+            ).fetchone()
+            total += size
+        return total
+
+    def _evict(self) -> None:
+        """Drop least recently used entries while the running total is over budget."""
+        assert self._conn is not None
+        (total,) = self._conn.execute("SELECT total FROM stored").fetchone()
+        if total <= self.max_bytes:
+            return
+        excess = total - self.max_bytes
+        victims = []
+        freed = 0
+        for key, size in self._conn.execute(
+            "SELECT key, size FROM predictions ORDER BY last_used"
+        ):
+            victims.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        with self._conn:
+            self._conn.executemany("DELETE FROM predictions WHERE key = ?", victims)
+            self._conn.execute("UPDATE stored SET total = total - ?", (freed,))
+        logging.info("Prediction cache: evicted %d entries", len(victims))
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -1,91 +1,328 @@
 from __future__ import annotations
 import os
+import time
 
 
 from dataclasses import dataclass
 from pathlib import Path
-from typing import List
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Sequence, Tuple
 import logging
+from src.datasets.detections import DetectionTable, TableBuilder
 from src.datasets.xml_loader import Box
+from src.inference.backends import Backend, create_backend
+from src.inference.prediction_cache import PredictionCache
+from src.inference.parallel import WorkerPool
+from src.inference.prefetch import ImagePrefetcher, load_image, load_image_reduced
+from src.inference.tensor_cache import Letterboxed, TensorCache, stack_letterboxed
+from src.utils.lazy import available
+from src.utils.profiling import span
 
 try:
-    from ultralytics import YOLO  # type: ignore
-except Exception as exc:  # pragma: no cover - ultralytics may not be installed
-    logging.exception("Failed to import ultralytics YOLO: %s", exc)
-    YOLO = None  # type: ignore
+    import numpy as np  # type: ignore
+except Exception:  # pragma: no cover - optional deps
+    np = None  # type: ignore
+
+
+def _select(
+    batches: Iterable[Tuple[List[str], List[Any]]], wanted: set
+) -> Iterator[Tuple[List[str], List[Any]]]:
+    """Yield ``batches`` restricted to the paths in ``wanted``, skipping empty ones."""
+    for chunk, sources in batches:
+        keep = [i for i, p in enumerate(chunk) if p in wanted]
+        if keep:
+            yield [chunk[i] for i in keep], [sources[i] for i in keep]
 
 
 @dataclass
 class Predictor:
-    """Simple wrapper around YOLOv8 inference."""
+    """Simple wrapper around YOLOv8 inference.
+
+    The model runs on the backend chosen by ``backend`` (see
+    :func:`~src.inference.backends.create_backend`): ``auto`` uses ONNX
+    Runtime for ``.onnx`` files and ultralytics for everything else.
+    ``engine`` may instead be given a ready backend instance, e.g. a stub
+    model for benchmarks, in which case ``model_path`` only identifies it.
+    ``model`` is the ``ultralytics.YOLO`` object, or ``None`` on other
+    backends.
+
+    With ``reduced_decode`` :meth:`predict_all` decodes JPEGs at the
+    smallest 1/2, 1/4 or 1/8 scale that still covers ``image_size`` (see
+    :func:`~src.inference.prefetch.load_image_reduced`) and scales the
+    boxes back to original image coordinates.
+
+    With a ``tensor_cache_dir`` the letterboxed inputs of the images are
+    kept in a memory-mapped :class:`~src.inference.tensor_cache.TensorCache`
+    and later runs at the same ``image_size`` feed batches straight from
+    it without decoding or resizing anything.
+    """
 
     model_path: str
     confidence: float = 0.25
     image_size: tuple[int, int] | list[int] = (192, 320)
     batch_size: int = 1
+    prefetch_depth: int = 2
+    decode_workers: int = 2
+    cache_dir: str | None = None
+    cache_size_mb: int = 1024
+    cache_hash_images: bool = False
+    workers: int = 1
+    threads_per_worker: int | None = None
+    backend: str = "auto"
+    threads: int | None = None
+    reduced_decode: bool = False
+    tensor_cache_dir: str | None = None
+    engine: Backend | None = None
 
     def __post_init__(self) -> None:
-        """Load the YOLO model or abort if unavailable."""
-        if YOLO is None:
-            # Log the missing dependency and stop execution
-            logging.exception("ultralytics YOLO is not installed")
-            raise RuntimeError("YOLO library not available")
+        """Load the model or abort if unavailable."""
+        if self.engine is None:
+            self.engine = create_backend(
+                self.model_path,
+                self.backend,
+                self.confidence,
+                self.image_size,
+                self.batch_size,
+                self.threads,
+            )
+        self.model = getattr(self.engine, "model", None)
+        self.names: List[str] = list(self.engine.names)
+        # images run through the backend by this process and the time it took
+        self.infer_images = 0
+        self.infer_seconds = 0.0
 
-        try:
-            self.model = YOLO(self.model_path)
-            self.model.conf = self.confidence
-            self.model.overrides["imgsz"] = list(self.image_size)
-        except Exception as exc:  # pragma: no cover - model loading may fail
-            logging.exception("Failed to load YOLO model: %s", exc)
-            raise
+        self.cache: PredictionCache | None = None
+        if self.cache_dir:
+            self.cache = PredictionCache(
+                self.cache_dir,
+                self.model_path,
+                self.image_size,
+                self.confidence,
+                max_bytes=self.cache_size_mb << 20,
+                hash_images=self.cache_hash_images,
+                # reduced decoding and cached inputs change what the model sees
+                backend=type(self.engine).__name__
+                + ("/reduced" if self.reduced_decode else "")
+                + ("/tensors" if self.tensor_cache_dir else ""),
+            )
 
     def predict(self, image_path: str) -> List[Box]:
         """Run inference on a single image."""
-        if self.model is None:
-            raise RuntimeError("YOLO model is not initialized")
-
-        results = self.model(image_path)
-        boxes: List[Box] = []
-        for r in results:
-            for b in r.boxes:
-                label = self.model.names[int(b.cls)]
-                xyxy = b.xyxy[0].tolist()
-                conf = float(b.conf[0]) if hasattr(b, "conf") else 0.0
-                boxes.append(
-                    Box(
-                        label,
-                        int(xyxy[0]),
-                        int(xyxy[1]),
-                        int(xyxy[2]),
-                        int(xyxy[3]),
-                        conf,
-                    )
-                )
-        return boxes
-
-    def batch_predict(self, image_paths: List[str]) -> List[List[Box]]:
-        if self.model is None:
-            raise RuntimeError("YOLO model is not initialized")
-
-        results = self.model.predict(
-            image_paths, imgsz=list(self.image_size), batch=self.batch_size
-        )
-        all_boxes: List[List[Box]] = []
-        for r in results:
-            boxes: List[Box] = []
-            for b in r.boxes:
-                label = self.model.names[int(b.cls)]
-                xyxy = b.xyxy[0].tolist()
-                conf = float(b.conf[0]) if hasattr(b, "conf") else 0.0
-                boxes.append(
-                    Box(
-                        label,
-                        int(xyxy[0]),
-                        int(xyxy[1]),
-                        int(xyxy[2]),
-                        int(xyxy[3]),
-                        conf,
-                    )
-                )
-            all_boxes.append(boxes)
-        return all_boxes
\ No newline at end of file
+        return self.batch_predict([image_path])[0]
+
+    def batch_predict(self, sources: Sequence[Any]) -> List[List[Box]]:
+        """Run inference on a batch of image paths or decoded BGR arrays."""
+        return [self.to_boxes(arrays) for arrays in self.batch_arrays(sources)]
+
+    def to_boxes(self, arrays: tuple) -> List[Box]:
+        """Convert one ``(xyxy, class_ids, conf)`` result to :class:`Box` objects.
+
+        Each column is converted to Python values in one call rather than
+        indexing the arrays box by box.
+        """
+        xyxy, cls, conf = arrays
+        names = self.names
+        return [
+            Box(names[c], x1, y1, x2, y2, score)
+            for (x1, y1, x2, y2), c, score in zip(
+                np.asarray(xyxy).reshape(-1, 4).astype(np.int64).tolist(),
+                np.asarray(cls).astype(np.int64).tolist(),
+                np.asarray(conf, dtype=np.float64).tolist(),
+            )
+        ]
+
+    def batch_arrays(self, sources: Sequence[Any]) -> List[tuple]:
+        """Run inference on a batch returning ``(xyxy, class_ids, conf)`` arrays.
+
+        ``sources`` are image paths, decoded BGR arrays or
+        :class:`~src.inference.tensor_cache.Letterboxed` rows of a tensor
+        cache, which go to the model without further preprocessing. Each
+        result is pulled off the device in one transfer per column instead
+        of one per box.
+        """
+        start = time.perf_counter()
+        try:
+            with span("inference", len(sources)):
+                if sources and isinstance(sources[0], Letterboxed):
+                    return self.engine.infer_letterboxed(*stack_letterboxed(sources))
+                return self.engine.infer(sources)
+        finally:
+            self.infer_images += len(sources)
+            self.infer_seconds += time.perf_counter() - start
+
+    def batch_arrays_reduced(self, decoded: Sequence[Tuple[Any, float]]) -> List[tuple]:
+        """:meth:`batch_arrays` for ``(image, scale)`` pairs of :func:`load_image_reduced`.
+
+        Boxes are multiplied by each image's scale, so they are in the
+        coordinates of the original image.
+        """
+        outputs = self.batch_arrays([image for image, _ in decoded])
+        return [
+            (xyxy * scale if scale != 1 else xyxy, cls, conf)
+            for (xyxy, cls, conf), (_, scale) in zip(outputs, decoded)
+        ]
+
+    def decode(self, path: str) -> Any:
+        """Decode ``path`` for inference: a BGR array, or an ``(image, scale)``
+        pair with ``reduced_decode``."""
+        if self.reduced_decode:
+            return load_image_reduced(path, self.image_size)
+        return load_image(path)
+
+    def predict_all(
+        self,
+        image_paths: List[str],
+        progress_cb: Callable[[int, int], None] | None = None,
+        batch_cb: Callable[[DetectionTable], None] | None = None,
+        completed: DetectionTable | None = None,
+        batches: Iterable[Tuple[List[str], List[Any]]] | None = None,
+    ) -> DetectionTable:
+        """Run batched inference over ``image_paths``.
+
+        Images are fed to the model in chunks of ``batch_size`` so that each
+        forward pass processes a full batch. When ``prefetch_depth`` is
+        positive, upcoming chunks are decoded by ``decode_workers`` background
+        threads while the current chunk runs. With ``workers`` above one,
+        shards of images are spread over that many processes, each holding
+        its own model with ``threads_per_worker`` threads (see
+        :class:`~src.inference.parallel.WorkerPool`). With a ``cache_dir``, images
+        whose predictions are already cached skip inference entirely and new
+        results are added to the cache. ``progress_cb`` is called with
+        ``(done, total)`` after every chunk and ``batch_cb`` with a table of
+        the images completed by it (cache hits first), so results can be
+        streamed to disk as they arrive. Images already in ``completed``
+        (for example loaded from the journal of an interrupted run) are
+        neither predicted nor passed to ``batch_cb``. ``batches`` supplies
+        already decoded ``(paths, images)`` batches covering ``image_paths``
+        in order, for example from a
+        :class:`~src.inference.prefetch.BatchFanout` consumer shared with
+        other models, in place of decoding here. Each image is what
+        :meth:`decode` returns: a BGR array, or an ``(image, scale)`` pair
+        when ``reduced_decode`` is set. Cached and completed images are
+        dropped from them. Returns a
+        :class:`~src.datasets.detections.DetectionTable` (a mapping of image
+        path to predicted boxes) in the same order as ``image_paths``.
+        """
+        batch_size = max(1, int(self.batch_size))
+        total = len(image_paths)
+        pending = [p for p in image_paths if completed is None or p not in completed]
+        cached: Dict[str, List[Box]] = {}
+        keys: Dict[str, str] = {}
+        if self.cache is not None:
+            keys = {p: self.cache.key(p) for p in pending}
+            hits = self.cache.get_many(list(keys.values()))
+            cached = {p: hits[k] for p, k in keys.items() if k in hits}
+            logging.info("Prediction cache: %d of %d images cached", len(cached), len(pending))
+        todo = [p for p in pending if p not in cached]
+
+        class_names = self.names
+        fresh: Dict[str, tuple] = {}
+        pool: WorkerPool | None = None
+        tensors: TensorCache | None = None
+        if self.tensor_cache_dir and batches is None and todo:
+            if self.workers > 1:
+                logging.warning("The tensor cache is not used with several inference workers")
+            else:
+                tensors = TensorCache(self.tensor_cache_dir, image_paths, self.image_size, self.reduced_decode)
+                logging.info("Tensor cache: %d of %d images cached", tensors.hits, total)
+        # cached inputs already map back to the original image
+        reduced = self.reduced_decode and not self.tensor_cache_dir
+        infer = self.batch_arrays_reduced if reduced else self.batch_arrays
+        decode = tensors.load if tensors is not None else self.decode
+        if batches is not None:
+            chunks = (
+                (chunk, infer(sources))
+                for chunk, sources in _select(batches, set(todo))
+            )
+        elif self.workers > 1 and todo:
+            # the workers run without a cache; hits were resolved above
+            pool = WorkerPool(
+                {
+                    "model_path": self.model_path,
+                    "confidence": self.confidence,
+                    "image_size": tuple(self.image_size),
+                    "batch_size": batch_size,
+                    "prefetch_depth": self.prefetch_depth,
+                    "decode_workers": self.decode_workers,
+                    "backend": self.backend,
+                    "reduced_decode": self.reduced_decode,
+                },
+                self.workers,
+                self.threads_per_worker,
+            )
+            # several batches per shard keeps every worker's prefetcher busy
+            chunks = pool.run(todo, batch_size * 4)
+        elif self.prefetch_depth > 0 and np is not None and available("PIL"):
+            batches = ImagePrefetcher(
+                todo,
+                batch_size,
+                workers=self.decode_workers,
+                depth=self.prefetch_depth,
+                loader=decode,
+            )
+            chunks = ((chunk, infer(sources)) for chunk, sources in batches)
+        elif reduced or tensors is not None:
+            chunks = (
+                (todo[i : i + batch_size], infer([decode(p) for p in todo[i : i + batch_size]]))
+                for i in range(0, len(todo), batch_size)
+            )
+        else:
+            chunks = (
+                (todo[i : i + batch_size], self.batch_arrays(todo[i : i + batch_size]))
+                for i in range(0, len(todo), batch_size)
+            )
+        done = total - len(todo)
+        if batch_cb and cached:
+            builder = TableBuilder(class_names)
+            for p in image_paths:
+                if p in cached:
+                    builder.add_boxes(p, cached[p])
+            batch_cb(builder.build())
+        if progress_cb and done:
+            progress_cb(done, total)
+        start = time.perf_counter()
+        try:
+            for chunk, outputs in chunks:
+                results = dict(zip(chunk, outputs))
+                fresh.update(results)
+                if self.cache is not None:
+                    with span("cache_put", len(chunk)):
+                        self.cache.put_many({keys[p]: self.to_boxes(arrays) for p, arrays in results.items()})
+                if batch_cb:
+                    with span("postprocess", len(chunk)):
+                        builder = TableBuilder(class_names)
+                        for p, (xyxy, cls, conf) in results.items():
+                            builder.add_arrays(p, xyxy, cls, conf)
+                        table = builder.build()
+                    batch_cb(table)
+                done += len(chunk)
+                if progress_cb:
+                    progress_cb(done, total)
+        finally:
+            if pool is not None:
+                pool.close()
+            if tensors is not None:
+                tensors.save()
+        elapsed = time.perf_counter() - start
+        if todo:
+            parallel = (
+                f", {pool.workers} workers x {pool.threads} threads" if pool is not None else ""
+            )
+            logging.info(
+                "Inference: %d images in %.2fs (%.1f img/s, batch size %d%s)",
+                len(todo),
+                elapsed,
+                len(todo) / elapsed if elapsed else float("inf"),
+                batch_size,
+                parallel,
+            )
+        with span("collect", total):
+            builder = TableBuilder(class_names)
+            for p in image_paths:
+                if p in cached:
+                    builder.add_boxes(p, cached[p])
+                elif p not in fresh:
+                    builder.add_from(completed, p)
+                else:
+                    xyxy, cls, conf = fresh[p]
+                    builder.add_arrays(p, xyxy, cls, conf)
+            return builder.build()
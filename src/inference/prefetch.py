@@ -0,0 +1,264 @@
+"""Background image decoding ahead of inference."""
+
+from __future__ import annotations
+
+import math
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Iterable, Iterator, List, Sequence, Tuple
+
+from src.utils.profiling import span
+
+try:
+    import numpy as np  # type: ignore
+    from PIL import Image, ImageOps  # type: ignore
+except Exception:  # pragma: no cover - optional deps
+    np = None  # type: ignore
+    Image = None  # type: ignore
+    ImageOps = None  # type: ignore
+
+_DONE = object()
+# EXIF tag holding the orientation the camera was held in
+_ORIENTATION = 0x0112
+
+
+def _upright(img: "Image.Image") -> "Image.Image":
+    """Return ``img`` rotated per its EXIF orientation, as ``cv2.imread`` does."""
+    if img.getexif().get(_ORIENTATION, 1) == 1:
+        return img
+    return ImageOps.exif_transpose(img)
+
+
+def load_image(path: str) -> "np.ndarray":
+    """Read ``path`` and return a contiguous BGR ``uint8`` array.
+
+    BGR is the channel order ultralytics expects for array inputs, so the
+    model can consume the result without another copy. The EXIF
+    orientation is applied, like ultralytics does when reading a path.
+    """
+    if np is None or Image is None:
+        raise RuntimeError("numpy and Pillow are required for image decoding")
+    with Image.open(path) as img:
+        rgb = np.asarray(_upright(img).convert("RGB"))
+    return np.ascontiguousarray(rgb[:, :, ::-1])
+
+
+def image_shape(path: str) -> Tuple[int, int]:
+    """Upright ``(height, width)`` of the image at ``path``, read from its header."""
+    if Image is None:
+        raise RuntimeError("Pillow is required for image decoding")
+    with Image.open(path) as img:
+        w, h = img.size
+        # orientations 5-8 turn the image by 90 degrees
+        if img.getexif().get(_ORIENTATION, 1) in (5, 6, 7, 8):
+            w, h = h, w
+    return h, w
+
+
+def load_image_reduced(path: str, image_size: Sequence[int]) -> Tuple["np.ndarray", float]:
+    """Decode ``path`` no larger than needed for a model input of ``image_size``.
+
+    JPEGs are decoded at 1/2, 1/4 or 1/8 scale directly in the DCT domain
+    (PIL ``draft``), picking the smallest scale at which the image still
+    covers ``image_size`` (height, width) after letterboxing; other formats
+    are decoded in full. The EXIF orientation is applied as in
+    :func:`load_image`. Returns the BGR array and the factor that maps its
+    pixel coordinates back to the original image.
+    """
+    if np is None or Image is None:
+        raise RuntimeError("numpy and Pillow are required for image decoding")
+    with Image.open(path) as img:
+        w, h = img.size
+        r = min(image_size[0] / h, image_size[1] / w)
+        scale = 1.0
+        if r < 0.5:
+            drafted = img.draft("RGB", (math.ceil(w * r), math.ceil(h * r)))
+            if drafted is not None:
+                scale = w / drafted[1][2]
+        rgb = np.asarray(_upright(img).convert("RGB"))
+    return np.ascontiguousarray(rgb[:, :, ::-1]), scale
+
+
+class ImagePrefetcher:
+    """Decode upcoming batches on worker threads while the current one runs.
+
+    Iterating yields ``(paths, images)`` tuples of at most ``batch_size``
+    items in input order. At most ``depth`` batches are decoded or queued
+    ahead of the consumer; once that limit is reached the producer blocks
+    until a batch is taken, so memory use stays bounded on large datasets.
+    Decode errors are raised from the iterator for the batch they belong to.
+    """
+
+    def __init__(
+        self,
+        image_paths: Sequence[str],
+        batch_size: int = 1,
+        workers: int = 2,
+        depth: int = 2,
+        loader: Callable[[str], object] = load_image,
+    ) -> None:
+        self.image_paths = list(image_paths)
+        self.batch_size = max(1, int(batch_size))
+        self.workers = max(1, int(workers))
+        self.depth = max(1, int(depth))
+        self.loader = loader
+        self._queue: "queue.Queue[object]" = queue.Queue(maxsize=self.depth)
+        self._slots = threading.Semaphore(self.depth)
+        self._stop = threading.Event()
+        self._pool: ThreadPoolExecutor | None = None
+        self._thread: threading.Thread | None = None
+
+    def _acquire(self) -> bool:
+        while not self._stop.is_set():
+            if self._slots.acquire(timeout=0.1):
+                return True
+        return False
+
+    def _put(self, item: object) -> bool:
+        while not self._stop.is_set():
+            try:
+                self._queue.put(item, timeout=0.1)
+                return True
+            except queue.Full:
+                continue
+        return False
+
+    def _load(self, path: str) -> object:
+        with span("decode", 1):
+            return self.loader(path)
+
+    def _produce(self) -> None:
+        assert self._pool is not None
+        try:
+            for i in range(0, len(self.image_paths), self.batch_size):
+                chunk = self.image_paths[i : i + self.batch_size]
+                # take a slot before decoding, so no more than ``depth``
+                # batches exist ahead of the consumer
+                if not self._acquire():
+                    return
+                futures = [self._pool.submit(self._load, p) for p in chunk]
+                if not self._put((chunk, futures)):
+                    for fut in futures:
+                        fut.cancel()
+                    return
+        finally:
+            self._put(_DONE)
+
+    def __iter__(self) -> Iterator[Tuple[List[str], List[object]]]:
+        self._queue = queue.Queue(maxsize=self.depth)
+        self._slots = threading.Semaphore(self.depth)
+        self._stop.clear()
+        self._pool = ThreadPoolExecutor(
+            max_workers=self.workers, thread_name_prefix="decode"
+        )
+        self._thread = threading.Thread(target=self._produce, daemon=True)
+        self._thread.start()
+        try:
+            while True:
+                item = self._queue.get()
+                if item is _DONE:
+                    break
+                chunk, futures = item  # type: ignore[misc]
+                with span("decode_wait", len(chunk)):
+                    images = [fut.result() for fut in futures]
+                self._slots.release()
+                yield chunk, images
+        finally:
+            self.close()
+
+    def close(self) -> None:
+        """Stop the producer and release worker threads."""
+        self._stop.set()
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is not _DONE:
+                for fut in item[1]:  # type: ignore[index]
+                    fut.cancel()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
+
+
+class _Failure:
+    def __init__(self, exc: BaseException) -> None:
+        self.exc = exc
+
+
+class BatchFanout:
+    """Share one stream of decoded batches between several consumers.
+
+    ``batches`` (typically an :class:`ImagePrefetcher`) is iterated once on
+    a background thread and every item is handed to each iterator returned
+    by :meth:`consumer`, so several models can run on the same decoded
+    images. A consumer can be at most ``depth`` batches ahead of the
+    slowest one. Consumers that stop early no longer receive batches, and
+    once all of them have stopped the source is closed. Errors raised by
+    the source are re-raised in every consumer.
+    """
+
+    def __init__(self, batches: Iterable[Tuple[List[str], List[object]]], consumers: int, depth: int = 2) -> None:
+        self.batches = batches
+        n = max(1, int(consumers))
+        self._queues: List["queue.Queue[object]"] = [queue.Queue(maxsize=max(1, int(depth))) for _ in range(n)]
+        self._closed = [threading.Event() for _ in range(n)]
+        self._lock = threading.Lock()
+        self._thread: threading.Thread | None = None
+
+    def _put(self, index: int, item: object) -> None:
+        while not self._closed[index].is_set():
+            try:
+                self._queues[index].put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _produce(self) -> None:
+        source = iter(self.batches)
+        end: object = _DONE
+        try:
+            for item in source:
+                if all(c.is_set() for c in self._closed):
+                    break
+                for i in range(len(self._queues)):
+                    self._put(i, item)
+        except BaseException as exc:
+            end = _Failure(exc)
+        finally:
+            close = getattr(source, "close", None)
+            if close is not None:
+                close()
+        for i in range(len(self._queues)):
+            self._put(i, end)
+
+    def consumer(self, index: int) -> Iterator[Tuple[List[str], List[object]]]:
+        """Iterate over the shared batches as consumer ``index``."""
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._produce, daemon=True)
+                self._thread.start()
+        try:
+            while True:
+                item = self._queues[index].get()
+                if item is _DONE:
+                    return
+                if isinstance(item, _Failure):
+                    raise item.exc
+                yield item  # type: ignore[misc]
+        finally:
+            self.close(index)
+
+    def close(self, index: int | None = None) -> None:
+        """Stop feeding consumer ``index`` (all consumers if ``None``).
+
+        Call it for every consumer that may not have been iterated to the
+        end, or the others stall once its queue is full.
+        """
+        for i in range(len(self._closed)) if index is None else (index,):
+            self._closed[i].set()
@@ -0,0 +1,146 @@
+"""Int8 quantization of YOLOv8 models with ONNX Runtime."""
+
+from __future__ import annotations
+
+import logging
+import random
+from pathlib import Path
+from typing import Iterator, List, Sequence
+
+from src.inference.backends import letterbox, read_image, to_blob
+
+try:
+    import onnx  # type: ignore
+    from onnxruntime import quantization as ortq  # type: ignore
+except Exception:  # pragma: no cover - onnx/onnxruntime are optional
+    onnx = None  # type: ignore
+    ortq = None  # type: ignore
+
+QUANT_MODES = ("static", "dynamic")
+
+
+def export_onnx(model_path: str, image_size: Sequence[int]) -> str:
+    """Return an ``.onnx`` version of ``model_path``, exporting it if needed.
+
+    ``.pt`` weights are exported by ultralytics with a dynamic batch axis
+    next to the weights file; ``.onnx`` paths are returned unchanged.
+    """
+    if model_path.lower().endswith(".onnx"):
+        return model_path
+    try:
+        from ultralytics import YOLO  # type: ignore
+    except Exception as exc:  # pragma: no cover - ultralytics may not be installed
+        raise RuntimeError("ultralytics is required to export .pt models to ONNX") from exc
+    logging.info("Exporting %s to ONNX", model_path)
+    return str(YOLO(model_path).export(format="onnx", imgsz=list(image_size), dynamic=True))
+
+
+def sample_images(image_paths: Sequence[str], count: int, seed: int = 0) -> List[str]:
+    """Pick ``count`` calibration images spread over the whole dataset."""
+    paths = list(image_paths)
+    if count >= len(paths):
+        return paths
+    return sorted(random.Random(seed).sample(paths, count))
+
+
+def _decode_nodes(model: "onnx.ModelProto") -> List[str]:
+    # The last module of the graph is the detect head. Its conv branches
+    # quantize well, but the DFL and box decoding after them turn small
+    # errors into pixel offsets, so everything else there stays fp32.
+    last = model.graph.node[-1].name
+    scope = last[: last.rfind("/") + 1]
+    if not scope:
+        return []
+    return [
+        n.name
+        for n in model.graph.node
+        if n.name.startswith(scope) and not n.name.startswith(scope + "cv")
+    ]
+
+
+if ortq is not None:
+
+    class _CalibrationReader(ortq.CalibrationDataReader):
+        """Feeds letterboxed calibration images to the calibrator one at a time."""
+
+        def __init__(self, input_name: str, image_paths: Sequence[str], image_size: Sequence[int]) -> None:
+            self.input_name = input_name
+            self.image_paths = list(image_paths)
+            self.image_size = image_size
+            self._iter: Iterator[dict] | None = None
+
+        def _feeds(self) -> Iterator[dict]:
+            for path in self.image_paths:
+                img, _, _ = letterbox(read_image(path), self.image_size)
+                yield {self.input_name: to_blob([img])}
+
+        def get_next(self) -> dict | None:
+            if self._iter is None:
+                self._iter = self._feeds()
+            return next(self._iter, None)
+
+
+def quantize_model(
+    model_path: str,
+    out_path: str | None = None,
+    mode: str = "static",
+    calibration_images: Sequence[str] = (),
+    image_size: Sequence[int] = (192, 320),
+) -> str:
+    """Write an int8 copy of the ONNX model ``model_path`` and return its path.
+
+    ``static`` quantizes weights and activations to QDQ int8 with ranges
+    calibrated on ``calibration_images``; ``dynamic`` only quantizes the
+    weights ahead of time and computes activation ranges per call. The
+    box decoding at the end of the detect head is kept in fp32 either way.
+    """
+    if ortq is None or onnx is None:
+        raise RuntimeError("onnx and onnxruntime are required for quantization")
+    if mode not in QUANT_MODES:
+        raise ValueError(f"Unknown quantization mode {mode!r}; expected one of {', '.join(QUANT_MODES)}")
+    src = Path(model_path)
+    out = Path(out_path) if out_path else src.with_name(f"{src.stem}_int8_{mode}.onnx")
+    out.parent.mkdir(parents=True, exist_ok=True)
+
+    model = onnx.load(str(src))
+    exclude = _decode_nodes(model)
+    if mode == "dynamic":
+        ortq.quantize_dynamic(
+            str(src),
+            str(out),
+            weight_type=ortq.QuantType.QInt8,
+            nodes_to_exclude=exclude,
+        )
+        return str(out)
+
+    if not calibration_images:
+        raise ValueError("static quantization needs calibration images")
+    # shape inference and graph cleanup make more nodes quantizable
+    prepared = out.with_name(out.stem + "_prep.onnx")
+    try:
+        ortq.quant_pre_process(str(src), str(prepared))
+        source = prepared
+    except Exception as exc:  # pragma: no cover - pre-processing is best effort
+        logging.warning("Quantization pre-processing failed, using the raw model: %s", exc)
+        source = src
+    input_name = model.graph.input[0].name
+    try:
+        ortq.quantize_static(
+            str(source),
+            str(out),
+            _CalibrationReader(input_name, calibration_images, image_size),
+            quant_format=ortq.QuantFormat.QDQ,
+            activation_type=ortq.QuantType.QUInt8,
+            weight_type=ortq.QuantType.QInt8,
+            per_channel=True,
+            nodes_to_exclude=exclude,
+            calibrate_method=ortq.CalibrationMethod.MinMax,
+        )
+    finally:
+        prepared.unlink(missing_ok=True)
+    # the metadata (class names, stride) is not always carried over
+    quantized = onnx.load(str(out))
+    if not quantized.metadata_props and model.metadata_props:
+        quantized.metadata_props.extend(model.metadata_props)
+        onnx.save(quantized, str(out))
+    return str(out)
@@ -0,0 +1,150 @@
+"""Memory-mapped cache of letterboxed model inputs for a fixed image set."""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import logging
+import os
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Sequence, Tuple
+
+import numpy as np
+
+from src.inference.backends import LetterboxMeta, letterbox
+from src.inference.prefetch import image_shape, load_image, load_image_reduced
+
+# bumped whenever the file layout, the decoding or the letterboxing changes
+CACHE_VERSION = 2
+
+
+@dataclass
+class Letterboxed:
+    """One cached model input: a view of row ``row`` of ``tensors``."""
+
+    tensors: np.ndarray
+    row: int
+    meta: LetterboxMeta
+
+    @property
+    def image(self) -> np.ndarray:
+        return self.tensors[self.row]
+
+
+def stack_letterboxed(items: Sequence[Letterboxed]) -> Tuple[np.ndarray, List[LetterboxMeta]]:
+    """Return the ``(N, H, W, 3)`` batch of ``items`` and their letterbox metadata.
+
+    Consecutive rows of one cache are returned as a slice of the memory
+    map, so the batch is not copied; anything else is stacked.
+    """
+    first = items[0]
+    rows = [it.row for it in items]
+    contiguous = all(it.tensors is first.tensors for it in items) and rows == list(
+        range(first.row, first.row + len(items))
+    )
+    if contiguous:
+        batch = first.tensors[first.row : first.row + len(items)]
+    else:
+        batch = np.stack([it.image for it in items])
+    return batch, [it.meta for it in items]
+
+
+class TensorCache:
+    """Letterboxed ``uint8`` BGR inputs of ``image_paths`` in one memory-mapped file.
+
+    Row ``i`` of ``<cache_dir>/<key>.npy`` holds image ``i`` letterboxed to
+    ``image_size``; ``<key>.json`` records every row's scale, padding,
+    original size and the image's mtime and size. The key covers the image
+    list, the size and ``reduced_decode``, so each dataset and input size
+    gets its own file. :meth:`load` returns cached rows without touching
+    the image and decodes, letterboxes and stores rows that are missing or
+    whose image changed; :meth:`save` records them. The file takes
+    ``N * H * W * 3`` bytes of disk space.
+    """
+
+    def __init__(
+        self,
+        cache_dir: str,
+        image_paths: Sequence[str],
+        image_size: Sequence[int],
+        reduced_decode: bool = False,
+    ) -> None:
+        self.image_size = (int(image_size[0]), int(image_size[1]))
+        self.reduced_decode = reduced_decode
+        paths = [os.path.abspath(p) for p in image_paths]
+        digest = hashlib.sha256(
+            json.dumps([CACHE_VERSION, self.image_size, reduced_decode, paths]).encode("utf-8")
+        ).hexdigest()[:24]
+        os.makedirs(cache_dir, exist_ok=True)
+        self.tensor_path = Path(cache_dir) / f"{digest}.npy"
+        self.meta_path = Path(cache_dir) / f"{digest}.json"
+        self._rows = {p: i for i, p in enumerate(image_paths)}
+        n = len(image_paths)
+        shape = (n, *self.image_size, 3)
+
+        meta = None
+        if self.meta_path.exists() and self.tensor_path.exists():
+            try:
+                with self.meta_path.open("r", encoding="utf-8") as fh:
+                    meta = json.load(fh)
+                self.tensors = np.lib.format.open_memmap(self.tensor_path, mode="r+")
+                if self.tensors.shape != shape or self.tensors.dtype != np.uint8:
+                    meta = None
+            except (OSError, ValueError) as exc:
+                logging.warning("Tensor cache %s unreadable, rebuilding: %s", self.tensor_path, exc)
+                meta = None
+        if meta is None:
+            self.tensors = np.lib.format.open_memmap(self.tensor_path, mode="w+", dtype=np.uint8, shape=shape)
+            meta = {"stat": [None] * n, "meta": [None] * n}
+        self._stat: List[list | None] = meta["stat"]
+        self._meta: List[list | None] = meta["meta"]
+
+        # rows whose image is unchanged since it was cached
+        self.valid = [False] * n
+        for p, i in self._rows.items():
+            if self._stat[i] is not None:
+                try:
+                    st = os.stat(p)
+                except OSError:
+                    continue
+                self.valid[i] = self._stat[i] == [st.st_mtime_ns, st.st_size]
+        self.hits = sum(self.valid)
+        self.filled = 0
+        self._lock = threading.Lock()
+
+    def load(self, image_path: str) -> Letterboxed:
+        """Return the cached input of ``image_path``, filling its row if needed."""
+        i = self._rows[image_path]
+        if not self.valid[i]:
+            st = os.stat(image_path)
+            # the same decoders as without the cache, so both feed equal inputs
+            if self.reduced_decode:
+                image, decoded_scale = load_image_reduced(image_path, self.image_size)
+                h, w = image_shape(image_path)
+            else:
+                image, decoded_scale = load_image(image_path), 1.0
+                h, w = image.shape[:2]
+            boxed, scale, pad = letterbox(image, self.image_size)
+            self.tensors[i] = boxed
+            # boxes map back to the file's pixels, not those of a reduced decode
+            self._meta[i] = [scale / decoded_scale, list(pad), [h, w]]
+            self._stat[i] = [st.st_mtime_ns, st.st_size]
+            self.valid[i] = True
+            with self._lock:
+                self.filled += 1
+        scale, pad, shape = self._meta[i]
+        return Letterboxed(self.tensors, i, (scale, tuple(pad), tuple(shape)))
+
+    def save(self) -> None:
+        """Flush new rows and record their metadata."""
+        if not self.filled:
+            return
+        self.tensors.flush()
+        tmp = self.meta_path.with_suffix(".tmp")
+        with tmp.open("w", encoding="utf-8") as fh:
+            json.dump({"version": CACHE_VERSION, "stat": self._stat, "meta": self._meta}, fh)
+        os.replace(tmp, self.meta_path)
+        logging.info("Tensor cache: %d images added to %s", self.filled, self.tensor_path)
+        self.filled = 0
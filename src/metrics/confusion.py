@@ -2,27 +2,51 @@
 
 from __future__ import annotations
 
-from typing import Iterable, List, Sequence
+import hashlib
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+from typing import Dict, Iterable, List, NamedTuple, Sequence
 
 try:
-    import matplotlib
-    matplotlib.use("Agg")  # use a non-GUI backend to avoid warnings
-    import matplotlib.pyplot as plt  # type: ignore
     import numpy as np  # type: ignore
 except Exception:  # pragma: no cover - optional deps
-    plt = None  # type: ignore
     np = None  # type: ignore
 
+from src.utils.lazy import available, pyplot
+from src.utils.processes import spawn_pool
+
+
+# resolution of the figures; higher ones take much longer to render
+DEFAULT_DPI = 200
+# resolution used by the fast rendering mode
+FAST_DPI = 150
+# in fast mode cell values are only written for matrices up to this size
+FAST_MAX_ANNOTATED = 40
+
 
 def plot_confusion_matrix(
     matrix: Sequence[Sequence[float]],
     labels: Iterable[str],
     normalize: bool = False,
     save_path: str | None = None,
+    dpi: int = DEFAULT_DPI,
+    fast: bool = False,
 ) -> None:
-    """Plot a confusion matrix using matplotlib if available."""
+    """Plot a confusion matrix using matplotlib if available.
+
+    ``fast`` skips the text of empty cells, scales the text to the cell
+    size and draws all values as one artist (see :func:`_annotate_cells`)
+    instead of one text artist per cell. It leaves values out entirely for
+    matrices with more than ``FAST_MAX_ANNOTATED`` labels, where they
+    would not be legible.
+    """
+    plt = pyplot()
     if plt is None or np is None:
         raise RuntimeError("matplotlib and numpy are required for plotting")
+    labels = list(labels)
 
     arr = np.array(matrix, dtype=float)
     if normalize:
@@ -40,13 +64,162 @@ def plot_confusion_matrix(
     ax.set_xlabel("Predicted")
     ax.set_ylabel("True")
 
-    for i in range(arr.shape[0]):
-        for j in range(arr.shape[1]):
-            ax.text(j, i, f"{arr[i, j]:.2f}", va="center", ha="center")
+    if not fast:
+        for i in range(arr.shape[0]):
+            for j in range(arr.shape[1]):
+                ax.text(j, i, f"{arr[i, j]:.2f}", va="center", ha="center")
+    elif len(labels) <= FAST_MAX_ANNOTATED:
+        fontsize = min(10.0, 240.0 / max(len(labels), 1))
+        rows, cols = np.nonzero(arr)
+        _annotate_cells(ax, rows, cols, np.char.mod("%.2f", arr[rows, cols]).tolist(), fontsize)
 
     fig.tight_layout()
     if save_path:
-        fig.savefig(save_path, dpi=800)
+        fig.savefig(save_path, dpi=dpi)
     else:
         plt.show()
-    plt.close(fig)
\ No newline at end of file
+    plt.close(fig)
+
+
+def _annotate_cells(ax, rows: np.ndarray, cols: np.ndarray, texts: List[str], fontsize: float) -> None:
+    """Write ``texts`` centred on cells ``(rows, cols)`` as a single collection.
+
+    Every distinct string is laid out once as a glyph outline and the
+    outlines are drawn in one call, which is far cheaper than a text
+    artist per cell once there are hundreds of them.
+    """
+    if not texts:
+        return
+    from matplotlib.collections import PathCollection
+    from matplotlib.path import Path as MplPath
+    from matplotlib.textpath import TextPath
+    from matplotlib.transforms import IdentityTransform
+
+    outlines: Dict[str, MplPath] = {}
+    for text in set(texts):
+        path = TextPath((0, 0), text, size=1)
+        (x0, y0), (x1, y1) = path.get_extents().get_points()
+        outlines[text] = MplPath(path.vertices - [(x0 + x1) / 2, (y0 + y1) / 2], path.codes)
+    # sizes are in points squared, so an outline of height 1 becomes ``fontsize`` points
+    ax.add_collection(
+        PathCollection(
+            [outlines[t] for t in texts],
+            sizes=[fontsize**2],
+            offsets=np.column_stack([cols, rows]),
+            offset_transform=ax.transData,
+            facecolors="black",
+            edgecolors="none",
+            # outlines are scaled by ``sizes`` only, like scatter markers
+            transform=IdentityTransform(),
+        ),
+        autolim=False,
+    )
+
+
+class MatrixPlot(NamedTuple):
+    """One confusion-matrix figure to render."""
+
+    matrix: Sequence[Sequence[float]]
+    labels: Sequence[str]
+    normalize: bool
+    save_path: str
+
+
+# file in the output root recording the digest behind every saved figure
+FIGURE_MANIFEST = "figures.json"
+
+
+def figure_digest(plot: MatrixPlot, dpi: int, fast: bool) -> str:
+    """Digest of everything that determines how ``plot`` is rendered."""
+    arr = np.ascontiguousarray(plot.matrix, dtype=float)
+    h = hashlib.sha256(arr.tobytes())
+    h.update(json.dumps([arr.shape, list(plot.labels), plot.normalize, dpi, fast]).encode("utf-8"))
+    return h.hexdigest()
+
+
+def _render(args: tuple) -> str | None:
+    plot, dpi, fast = args
+    try:
+        plot_confusion_matrix(plot.matrix, plot.labels, plot.normalize, plot.save_path, dpi, fast)
+    except Exception as exc:  # pragma: no cover - matplotlib optional
+        return f"Failed to plot confusion matrix {plot.save_path}: {exc}"
+    return None
+
+
+def render_confusion_matrices(
+    plots: Sequence[MatrixPlot],
+    out_root: str | Path,
+    workers: int = 2,
+    dpi: int = DEFAULT_DPI,
+    fast: bool = False,
+    cache_dir: str | Path | None = None,
+) -> int:
+    """Render ``plots`` in a pool of ``workers`` processes.
+
+    A figure is rendered only once per distinct matrix: identical matrices
+    (such as a folder and its only subfolder) are copied, files recorded in
+    ``out_root/figures.json`` with the same digest are left alone (so a
+    resumed run re-renders nothing) and, with ``cache_dir``, figures
+    rendered by earlier runs are copied from there. Returns the number of
+    figures actually rendered; failures are logged, not raised.
+    """
+    # pyplot itself is only imported by whichever process draws a figure
+    if not available("matplotlib") or np is None:
+        raise RuntimeError("matplotlib and numpy are required for plotting")
+    out_root = Path(out_root)
+    manifest_path = out_root / FIGURE_MANIFEST
+    manifest: Dict[str, str] = {}
+    if manifest_path.exists():
+        try:
+            with manifest_path.open("r", encoding="utf-8") as fh:
+                manifest = json.load(fh)
+        except (OSError, ValueError):
+            manifest = {}
+    cache = Path(cache_dir) if cache_dir else None
+    if cache is not None:
+        cache.mkdir(parents=True, exist_ok=True)
+
+    groups: Dict[str, List[MatrixPlot]] = {}
+    for plot in plots:
+        digest = figure_digest(plot, dpi, fast)
+        rel = os.path.relpath(plot.save_path, out_root)
+        if manifest.get(rel) == digest and os.path.exists(plot.save_path):
+            continue
+        groups.setdefault(digest, []).append(plot)
+
+    todo = []
+    for digest, group in groups.items():
+        cached = cache / f"{digest}.png" if cache is not None else None
+        if cached is not None and cached.exists():
+            for plot in group:
+                shutil.copyfile(cached, plot.save_path)
+        else:
+            todo.append(digest)
+
+    jobs = [(groups[d][0], dpi, fast) for d in todo]
+    if workers > 1 and len(jobs) > 1:
+        with spawn_pool(min(workers, len(jobs))) as pool:
+            errors = list(pool.map(_render, jobs))
+    else:
+        errors = [_render(job) for job in jobs]
+
+    for digest, error in zip(todo, errors):
+        if error:
+            logging.error(error)
+            groups.pop(digest)
+            continue
+        first, *rest = groups[digest]
+        for plot in rest:
+            shutil.copyfile(first.save_path, plot.save_path)
+        if cache is not None:
+            shutil.copyfile(first.save_path, cache / f"{digest}.png")
+
+    for digest, group in groups.items():
+        for plot in group:
+            manifest[os.path.relpath(plot.save_path, out_root)] = digest
+    try:
+        with manifest_path.open("w", encoding="utf-8") as fh:
+            json.dump(manifest, fh, indent=2, sort_keys=True)
+    except OSError as exc:
+        logging.warning("Could not write %s: %s", manifest_path, exc)
+    return len(jobs)
@@ -0,0 +1,91 @@
+"""Confidence-sweep outputs: PR/F1 curves and a JSON summary."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Dict, List
+
+from src.datasets.detections import DetectionTable
+from src.utils.lazy import pyplot
+
+from .evaluator import SweepResult
+
+
+def filter_predictions(predictions: Dict[str, List], min_conf: float) -> Dict[str, List]:
+    """Return ``predictions`` keeping only boxes with ``confidence >= min_conf``."""
+    if isinstance(predictions, DetectionTable):
+        return predictions.filter(min_conf)
+    return {
+        img: [b for b in boxes if b.confidence is None or b.confidence >= min_conf]
+        for img, boxes in predictions.items()
+    }
+
+
+def save_sweep(sweep: SweepResult, save_dir: str | Path) -> Path:
+    """Write ``sweep.json`` with every curve and the F1-optimal thresholds."""
+    out = Path(save_dir)
+    out.mkdir(parents=True, exist_ok=True)
+    path = out / "sweep.json"
+    data = {
+        "thresholds": sweep.thresholds,
+        "precision": sweep.precision,
+        "recall": sweep.recall,
+        "f1": sweep.f1,
+        "best_threshold": sweep.best_threshold,
+        "classes": {
+            name: {
+                "precision": sweep.class_precision[name],
+                "recall": sweep.class_recall[name],
+                "f1": sweep.class_f1[name],
+            }
+            for name in sweep.class_f1
+        },
+    }
+    with path.open("w", encoding="utf-8") as fh:
+        json.dump(data, fh, indent=2)
+    return path
+
+
+def plot_sweep_curves(sweep: SweepResult, save_dir: str | Path) -> None:
+    """Save ``pr_curve.png`` and ``f1_curve.png`` for all classes."""
+    plt = pyplot()
+    if plt is None:
+        raise RuntimeError("matplotlib is required for plotting")
+    out = Path(save_dir)
+    out.mkdir(parents=True, exist_ok=True)
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for name in sweep.class_f1:
+        ax.plot(sweep.class_recall[name], sweep.class_precision[name], linewidth=1, label=name)
+    ax.plot(sweep.recall, sweep.precision, color="black", linewidth=2, label="all")
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1.01)
+    ax.set_xlabel("Recall")
+    ax.set_ylabel("Precision")
+    ax.set_title("Precision-Recall")
+    ax.legend(loc="lower left", fontsize="small", ncol=2)
+    fig.tight_layout()
+    fig.savefig(out / "pr_curve.png", dpi=150)
+    plt.close(fig)
+
+    fig, ax = plt.subplots(figsize=(8, 6))
+    for name in sweep.class_f1:
+        ax.plot(sweep.thresholds, sweep.class_f1[name], linewidth=1, label=name)
+    best = sweep.best_threshold.get("all", 0.0)
+    ax.plot(
+        sweep.thresholds,
+        sweep.f1,
+        color="black",
+        linewidth=2,
+        label=f"all (best {best:.2f})",
+    )
+    ax.set_xlim(0, 1)
+    ax.set_ylim(0, 1.01)
+    ax.set_xlabel("Confidence")
+    ax.set_ylabel("F1")
+    ax.set_title("F1-Confidence")
+    ax.legend(loc="lower left", fontsize="small", ncol=2)
+    fig.tight_layout()
+    fig.savefig(out / "f1_curve.png", dpi=150)
+    plt.close(fig)
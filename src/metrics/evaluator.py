@@ -1,8 +1,12 @@
 from __future__ import annotations
 
-from dataclasses import dataclass
-from typing import Dict, List
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Hashable, Iterator, List, NamedTuple, Sequence
 
+import numpy as np
+
+from src.datasets.detections import DetectionTable, gather_rows
 from src.datasets.xml_loader import Annotation, Box
 
 
@@ -24,6 +28,162 @@ def iou(box1: Box, box2: Box) -> float:
     return inter / union if union else 0.0
 
 
+def boxes_to_array(boxes: Sequence[Box]) -> np.ndarray:
+    """Return ``boxes`` as an ``(N, 4)`` float array of ``xmin, ymin, xmax, ymax``."""
+    if not boxes:
+        return np.zeros((0, 4), dtype=np.float64)
+    return np.array([(b.xmin, b.ymin, b.xmax, b.ymax) for b in boxes], dtype=np.float64)
+
+
+def box_iou(boxes1: np.ndarray, boxes2: np.ndarray) -> np.ndarray:
+    """IoU between two broadcastable ``(..., 4)`` xyxy arrays.
+
+    Pass aligned ``(N, 4)`` arrays for element-wise IoU, or
+    ``boxes1[:, None]`` and ``boxes2[None]`` for the full ``(N, M)`` matrix.
+    Mirrors :func:`iou` for every element, including returning ``0.0`` for
+    disjoint boxes and for a zero union, so results are bit-identical.
+    """
+    inter_w = np.maximum(0.0, np.minimum(boxes1[..., 2], boxes2[..., 2]) - np.maximum(boxes1[..., 0], boxes2[..., 0]))
+    inter_h = np.maximum(0.0, np.minimum(boxes1[..., 3], boxes2[..., 3]) - np.maximum(boxes1[..., 1], boxes2[..., 1]))
+    inter = inter_w * inter_h
+    area1 = (boxes1[..., 2] - boxes1[..., 0]) * (boxes1[..., 3] - boxes1[..., 1])
+    area2 = (boxes2[..., 2] - boxes2[..., 0]) * (boxes2[..., 3] - boxes2[..., 1])
+    union = area1 + area2 - inter
+    out = np.zeros_like(inter)
+    np.divide(inter, union, out=out, where=(inter != 0) & (union != 0))
+    return out
+
+
+def image_pairs(
+    pred_counts: np.ndarray,
+    gt_counts: np.ndarray,
+    mask: np.ndarray | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Enumerate every (prediction, ground truth) pair that shares an image.
+
+    ``pred_counts``/``gt_counts`` hold the number of boxes per image; boxes
+    are assumed to be stored image after image. Only images selected by
+    ``mask`` are enumerated. Returns flat global indices ``(pred_idx,
+    gt_idx)``: each image's IoU matrix in row-major order, concatenated.
+    """
+    pred_counts = np.asarray(pred_counts, dtype=np.int64)
+    gt_counts = np.asarray(gt_counts, dtype=np.int64)
+    n_pairs = pred_counts * gt_counts
+    if mask is not None:
+        n_pairs = np.where(mask, n_pairs, 0)
+    img = np.repeat(np.arange(len(n_pairs)), n_pairs)
+    k = np.arange(int(n_pairs.sum())) - (np.cumsum(n_pairs) - n_pairs)[img]
+    cols = gt_counts[img]
+    pred_idx = (np.cumsum(pred_counts) - pred_counts)[img] + k // cols
+    gt_idx = (np.cumsum(gt_counts) - gt_counts)[img] + k % cols
+    return pred_idx, gt_idx
+
+
+# images with at least this many pairs get their own IoU matrix
+_DENSE_PAIRS = 4096
+
+
+def candidate_pairs(
+    pred_boxes: np.ndarray,
+    gt_boxes: np.ndarray,
+    pred_counts: np.ndarray,
+    gt_counts: np.ndarray,
+    threshold: float,
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return ``(pred_idx, gt_idx, iou)`` for same-image pairs that can match.
+
+    A pair can match when its IoU is at least ``threshold`` and non-zero.
+    Sparse images are batched into one flat IoU computation; crowded images
+    each get a broadcast IoU matrix, which avoids gathering coordinates for
+    every pair.
+    """
+    pred_counts = np.asarray(pred_counts, dtype=np.int64)
+    gt_counts = np.asarray(gt_counts, dtype=np.int64)
+    dense = pred_counts * gt_counts >= _DENSE_PAIRS
+
+    pair_p, pair_g = image_pairs(pred_counts, gt_counts, ~dense)
+    ious = box_iou(pred_boxes[pair_p], gt_boxes[pair_g])
+    keep = (ious >= threshold) & (ious > 0)
+    out_p = [pair_p[keep]]
+    out_g = [pair_g[keep]]
+    out_v = [ious[keep]]
+
+    pred_off = np.cumsum(pred_counts) - pred_counts
+    gt_off = np.cumsum(gt_counts) - gt_counts
+    for i in np.flatnonzero(dense):
+        p0, g0 = int(pred_off[i]), int(gt_off[i])
+        mat = box_iou(
+            pred_boxes[p0 : p0 + pred_counts[i], None],
+            gt_boxes[None, g0 : g0 + gt_counts[i]],
+        )
+        rows, cols = np.nonzero((mat >= threshold) & (mat > 0))
+        out_p.append(rows + p0)
+        out_g.append(cols + g0)
+        out_v.append(mat[rows, cols])
+    return np.concatenate(out_p), np.concatenate(out_g), np.concatenate(out_v)
+
+
+def greedy_match(
+    pred_idx: np.ndarray,
+    gt_idx: np.ndarray,
+    ious: np.ndarray,
+    n_pred: int,
+) -> np.ndarray:
+    """Greedily match predictions to ground truths given candidate pairs.
+
+    Predictions are visited in index order and each takes the unmatched
+    ground truth with the highest IoU among its candidates (ties go to the
+    lowest ground-truth index). Only candidate pairs are visited, so the
+    work is proportional to the number of overlaps rather than to every
+    prediction/ground-truth combination. Returns the matched ground-truth
+    index for every prediction, ``-1`` if none.
+    """
+    order = np.lexsort((gt_idx, -ious, pred_idx))
+    matches = [-1] * n_pred
+    taken: set[int] = set()
+    for pi, gi in zip(pred_idx[order].tolist(), gt_idx[order].tolist()):
+        if matches[pi] >= 0 or gi in taken:
+            continue
+        matches[pi] = gi
+        taken.add(gi)
+    return np.array(matches, dtype=np.intp)
+
+
+# upper bound on IoU pairs held in memory at once during evaluation
+_PAIR_BUDGET = 1 << 22
+
+# COCO-style IoU thresholds 0.50:0.05:0.95 used for mAP
+IOU_THRESHOLDS = np.linspace(0.5, 0.95, 10)
+
+
+def average_precision(tp: np.ndarray, confidence: np.ndarray, n_gt: int) -> np.ndarray:
+    """COCO 101-point interpolated AP for one class at several IoU thresholds.
+
+    ``tp`` is a ``(D, T)`` boolean array telling whether each detection is a
+    true positive at each of ``T`` IoU thresholds, and ``confidence`` holds
+    the ``D`` detection scores. Detections are ranked by confidence once and
+    precision/recall for every threshold come from cumulative sums over that
+    ranking. Returns ``T`` AP values.
+    """
+    n_thr = tp.shape[1]
+    if n_gt == 0 or len(tp) == 0:
+        return np.zeros(n_thr)
+    order = np.argsort(-confidence, kind="stable")
+    tpc = np.cumsum(tp[order], axis=0)
+    fpc = np.arange(1, len(tp) + 1)[:, None] - tpc
+    recall = tpc / n_gt
+    precision = tpc / (tpc + fpc)
+    # precision envelope: best precision at any recall to the right
+    envelope = np.maximum.accumulate(precision[::-1], axis=0)[::-1]
+    points = np.linspace(0.0, 1.0, 101)
+    ap = np.empty(n_thr)
+    for k in range(n_thr):
+        pos = np.searchsorted(recall[:, k], points, side="left")
+        valid = pos < len(tp)
+        ap[k] = envelope[pos[valid], k].sum() / len(points)
+    return ap
+
+
 @dataclass
 class EvalResult:
     precision: float
@@ -36,6 +196,118 @@ class EvalResult:
     tp: int
     fp: int
     fn: int
+    map50_95: float = 0.0
+    ap50: Dict[str, float] = field(default_factory=dict)
+    ap50_95: Dict[str, float] = field(default_factory=dict)
+    ap_per_threshold: Dict[str, List[float]] = field(default_factory=dict)
+    iou_thresholds: List[float] = field(default_factory=lambda: IOU_THRESHOLDS.tolist())
+
+
+@dataclass
+class SweepResult:
+    """Detection metrics at every confidence threshold of a sweep.
+
+    ``precision``/``recall``/``f1`` are the class-agnostic figures reported
+    by :meth:`Evaluator.evaluate`; the ``class_*`` curves count a detection
+    as correct only when its label matches the ground truth it overlaps.
+    ``confusion_matrices`` has shape ``(T, L, L)``.
+    """
+
+    thresholds: List[float]
+    labels: List[str]
+    precision: List[float]
+    recall: List[float]
+    f1: List[float]
+    confusion_matrices: np.ndarray
+    class_precision: Dict[str, List[float]]
+    class_recall: Dict[str, List[float]]
+    class_f1: Dict[str, List[float]]
+    best_threshold: Dict[str, float]
+
+
+def _prf(tp: np.ndarray, fp: np.ndarray, fn: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Vectorized precision, recall and F1 with the 0/0 -> 0 convention."""
+    tp = tp.astype(np.float64)
+    precision = np.divide(tp, tp + fp, out=np.zeros_like(tp), where=(tp + fp) > 0)
+    recall = np.divide(tp, tp + fn, out=np.zeros_like(tp), where=(tp + fn) > 0)
+    denom = precision + recall
+    f1 = np.divide(2 * precision * recall, denom, out=np.zeros_like(tp), where=denom > 0)
+    return precision, recall, f1
+
+
+@dataclass
+class EvalStats:
+    """Sufficient statistics for scoring a set of images.
+
+    Statistics of disjoint image sets combine with :meth:`merge`, so metrics
+    for any grouping of images can be derived without matching again.
+    """
+
+    labels: List[str]
+    tp: int
+    fp: int
+    fn: int
+    confusion: np.ndarray  # (L, L) counts, rows are GT and columns predictions
+    n_gt: np.ndarray  # (L,) ground-truth boxes per label
+    det_cls: np.ndarray  # (D,) label index of every detection
+    det_conf: np.ndarray  # (D,) detection confidences
+    det_tp: np.ndarray  # (D, T) TP flag per IoU threshold
+
+    @classmethod
+    def empty(cls, labels: List[str]) -> "EvalStats":
+        n = len(labels)
+        return cls(
+            labels=labels,
+            tp=0,
+            fp=0,
+            fn=0,
+            confusion=np.zeros((n, n), dtype=np.int64),
+            n_gt=np.zeros(n, dtype=np.int64),
+            det_cls=np.zeros(0, dtype=np.intp),
+            det_conf=np.zeros(0, dtype=np.float64),
+            det_tp=np.zeros((0, len(IOU_THRESHOLDS)), dtype=bool),
+        )
+
+    def merge(self, *others: "EvalStats") -> "EvalStats":
+        """Return the statistics of this image set combined with ``others``."""
+        parts = (self,) + others
+        return EvalStats(
+            labels=self.labels,
+            tp=sum(p.tp for p in parts),
+            fp=sum(p.fp for p in parts),
+            fn=sum(p.fn for p in parts),
+            confusion=sum((p.confusion for p in others), self.confusion.copy()),
+            n_gt=sum((p.n_gt for p in others), self.n_gt.copy()),
+            det_cls=np.concatenate([p.det_cls for p in parts]),
+            det_conf=np.concatenate([p.det_conf for p in parts]),
+            det_tp=np.concatenate([p.det_tp for p in parts]),
+        )
+
+
+def _split(values: np.ndarray, keys: np.ndarray, n_keys: int) -> List[np.ndarray]:
+    """Split ``values`` into ``n_keys`` groups by integer ``keys``."""
+    order = np.argsort(keys, kind="stable")
+    bounds = np.cumsum(np.bincount(keys, minlength=n_keys))[:-1]
+    return np.split(values[order], bounds)
+
+
+class _Chunk(NamedTuple):
+    """Flattened boxes of consecutive images ``start:end`` and their overlaps."""
+
+    start: int
+    end: int
+    n_pred: int
+    n_gt: int
+    p_idx: np.ndarray  # label index of every prediction
+    g_idx: np.ndarray  # label index of every ground truth
+    pred_counts: np.ndarray  # predictions per image
+    gt_counts: np.ndarray  # ground truths per image
+    conf: np.ndarray  # prediction confidences
+    order: np.ndarray  # predictions by image, then descending confidence
+    rank: np.ndarray  # position of every prediction in ``order``
+    cand_p: np.ndarray  # candidate pairs, see :func:`candidate_pairs`
+    cand_g: np.ndarray
+    cand_iou: np.ndarray
 
 
 class Evaluator:
@@ -43,91 +315,244 @@ class Evaluator:
         self.iou_threshold = iou_threshold
         self.class_names = class_names
 
-    def evaluate(self, annotations: List[Annotation], predictions: Dict[str, List[Box]]) -> EvalResult:
-        tp = fp = fn = 0
-        pred_matches: List[int] = []
-        total_gt = 0
-
+    def labels_for(self, annotations: List[Annotation], predictions: Dict[str, List[Box]]) -> List[str]:
+        """Return the confusion-matrix labels, ending with ``background``."""
         if self.class_names is not None:
             labels = list(self.class_names)
         else:
             label_set = {b.label for ann in annotations for b in ann.boxes}
-            for boxes in predictions.values():
-                for b in boxes:
-                    label_set.add(b.label)
+            if isinstance(predictions, DetectionTable):
+                names = predictions.class_names
+                label_set.update(names[i] for i in np.unique(predictions.class_ids))
+            else:
+                for boxes in predictions.values():
+                    for b in boxes:
+                        label_set.add(b.label)
             labels = sorted(label_set)
-
         labels.append("background")
+        return labels
+
+    def accumulate(
+        self,
+        annotations: List[Annotation],
+        predictions: Dict[str, List[Box]],
+        keys: Sequence[Hashable] | None = None,
+    ) -> Dict[Hashable, EvalStats]:
+        """Match every image once and collect :class:`EvalStats` per key.
+
+        ``keys`` assigns each annotation to a group; by default all images
+        share the key ``None``. Every group uses the same label list.
+        """
+        labels = self.labels_for(annotations, predictions)
         bg_idx = len(labels) - 1
         idx = {l: i for i, l in enumerate(labels)}
+        n_labels = len(labels)
+        n_thr = len(IOU_THRESHOLDS)
 
-        confusion = [[0 for _ in labels] for _ in labels]
+        if keys is None:
+            keys = [None] * len(annotations)
+        key_list = list(dict.fromkeys(keys))
+        key_pos = {k: i for i, k in enumerate(key_list)}
+        n_keys = len(key_list)
+        img_key = np.array([key_pos[k] for k in keys], dtype=np.intp)
 
-        for ann in annotations:
-            if self.class_names is not None:
-                gts = [b for b in ann.boxes if b.label in self.class_names]
-            else:
-                gts = ann.boxes
-
-            total_gt += len(gts)
-            preds = predictions.get(ann.image_path, [])
-
-            if self.class_names is not None:
-                preds = [b for b in preds if b.label in self.class_names]
-            matched_gt: set[int] = set()
-            # pred_used: set[int] = set()
-
-            for i, pred in enumerate(preds):
-                best_i = 0.0
-                best_j = -1
-                for j, gt in enumerate(gts):
-                    if j in matched_gt:
-                        continue
-                    iv = iou(pred, gt)
-                    if iv >= self.iou_threshold and iv > best_i:
-                        best_i = iv
-                        best_j = j
-                if best_j >= 0:
-                    matched_gt.add(best_j)
-                    tp += 1
-                    pred_matches.append(1)
-                    p_idx = idx.get(pred.label, bg_idx)
-                    g_idx = idx.get(gts[best_j].label, bg_idx)
-                    confusion[g_idx][p_idx] += 1
-                else:
-                    fp += 1
-                    pred_matches.append(0)
-                    p_idx = idx.get(pred.label, bg_idx)
-                    confusion[bg_idx][p_idx] += 1
-
-            for j, gt in enumerate(gts):
-                if j not in matched_gt:
-                    fn += 1
-                    g_idx = idx.get(gt.label, bg_idx)
-                    confusion[g_idx][bg_idx] += 1
+        tp = np.zeros(n_keys, dtype=np.int64)
+        fp = np.zeros(n_keys, dtype=np.int64)
+        fn = np.zeros(n_keys, dtype=np.int64)
+        # flat ``(key * n_labels + gt) * n_labels + pred`` cell indices,
+        # counted once at the end
+        cells: List[np.ndarray] = []
+        gt_cells: List[np.ndarray] = []
+        # per-detection key, class, confidence and TP flags at every IoU threshold
+        det_key: List[np.ndarray] = []
+        det_cls: List[np.ndarray] = []
+        det_conf: List[np.ndarray] = []
+        det_tp: List[np.ndarray] = []
+        # candidates are gathered once at the loosest threshold in use
+        min_iou = min(self.iou_threshold, float(IOU_THRESHOLDS[0]))
+
+        for ch in self._chunks(annotations, predictions, idx, min_iou):
+            start, end = ch.start, ch.end
+            n_pred, n_gt, p_idx, g_idx = ch.n_pred, ch.n_gt, ch.p_idx, ch.g_idx
+            pred_counts = ch.pred_counts
+            cand_p, cand_g, cand_iou = ch.cand_p, ch.cand_g, ch.cand_iou
+            p_key = np.repeat(img_key[start:end], pred_counts)
+            g_key = np.repeat(img_key[start:end], ch.gt_counts)
+
+            # class-agnostic matching in arrival order for TP/FP/FN and the
+            # confusion matrix
+            sel = cand_iou >= self.iou_threshold
+            matches = greedy_match(cand_p[sel], cand_g[sel], cand_iou[sel], n_pred)
+
+            matched = matches >= 0
+            gt_matched = np.zeros(n_gt, dtype=bool)
+            gt_matched[matches[matched]] = True
+            tp += np.bincount(p_key[matched], minlength=n_keys)
+            fp += np.bincount(p_key[~matched], minlength=n_keys)
+            fn += np.bincount(g_key[~gt_matched], minlength=n_keys)
+
+            cells.append((p_key[matched] * n_labels + g_idx[matches[matched]]) * n_labels + p_idx[matched])
+            cells.append((p_key[~matched] * n_labels + bg_idx) * n_labels + p_idx[~matched])
+            cells.append((g_key[~gt_matched] * n_labels + g_idx[~gt_matched]) * n_labels + bg_idx)
+            gt_cells.append(g_key * n_labels + g_idx)
+
+            # class-aware matching in confidence order for AP, reusing the
+            # same IoU values for every threshold
+            conf, order, rank = ch.conf, ch.order, ch.rank
+            same = p_idx[cand_p] == g_idx[cand_g]
+            tp_flags = np.zeros((n_pred, n_thr), dtype=bool)
+            for k, thr in enumerate(IOU_THRESHOLDS):
+                sel = same & (cand_iou >= thr)
+                ranked = greedy_match(rank[cand_p[sel]], cand_g[sel], cand_iou[sel], n_pred)
+                tp_flags[order, k] = ranked >= 0
+            det_key.append(p_key)
+            det_cls.append(p_idx)
+            det_conf.append(conf)
+            det_tp.append(tp_flags)
+
+        def _cat(parts: List[np.ndarray], empty: np.ndarray) -> np.ndarray:
+            return np.concatenate(parts) if parts else empty
+
+        no_idx = np.zeros(0, dtype=np.intp)
+        confusion = np.bincount(
+            _cat(cells, no_idx), minlength=n_keys * n_labels * n_labels
+        ).reshape(n_keys, n_labels, n_labels)
+        n_gt = np.bincount(_cat(gt_cells, no_idx), minlength=n_keys * n_labels).reshape(n_keys, n_labels)
+        keys_arr = _cat(det_key, no_idx)
+        cls_split = _split(_cat(det_cls, no_idx), keys_arr, n_keys)
+        conf_split = _split(_cat(det_conf, np.zeros(0)), keys_arr, n_keys)
+        tp_split = _split(_cat(det_tp, np.zeros((0, n_thr), dtype=bool)), keys_arr, n_keys)
+
+        return {
+            key: EvalStats(
+                labels=labels,
+                tp=int(tp[i]),
+                fp=int(fp[i]),
+                fn=int(fn[i]),
+                confusion=confusion[i],
+                n_gt=n_gt[i],
+                det_cls=cls_split[i],
+                det_conf=conf_split[i],
+                det_tp=tp_split[i],
+            )
+            for i, key in enumerate(key_list)
+        }
+
+    def _chunks(
+        self,
+        annotations: List[Annotation],
+        predictions: Dict[str, List[Box]],
+        idx: Dict[str, int],
+        min_iou: float,
+    ) -> Iterator[_Chunk]:
+        """Yield images in chunks whose flattened IoU pairs stay bounded.
+
+        Ground truth and predictions are laid out as :class:`DetectionTable`
+        columns in annotation order, so each chunk is a pair of array slices
+        and no per-box Python work happens here when ``predictions`` already
+        is a table.
+        """
+        bg_idx = len(idx) - 1
+        n_images = len(annotations)
+        allowed = set(self.class_names) if self.class_names is not None else None
+
+        def _remap(names: List[str]) -> np.ndarray:
+            # label index per class id, -1 for classes outside ``class_names``
+            return np.array(
+                [idx.get(n, bg_idx) if allowed is None or n in allowed else -1 for n in names] + [-1],
+                dtype=np.intp,
+            )
+
+        gt_table = DetectionTable.from_annotations(annotations)
+        g_lab = _remap(gt_table.class_names)[gt_table.class_ids]
+        g_keep = g_lab >= 0
+        g_image = np.repeat(np.arange(n_images), gt_table.counts())
+        gt_counts = np.bincount(g_image[g_keep], minlength=n_images)
+        gt_boxes = gt_table.boxes[g_keep].astype(np.float64)
+        g_lab = g_lab[g_keep]
+
+        pred_table = DetectionTable.from_mapping(predictions)
+        rows, counts = gather_rows(
+            pred_table.offsets,
+            np.array([pred_table.index_of(a.image_path) for a in annotations], dtype=np.int64),
+        )
+        p_lab = _remap(pred_table.class_names)[pred_table.class_ids[rows]]
+        p_keep = p_lab >= 0
+        p_image = np.repeat(np.arange(n_images), counts)
+        pred_counts = np.bincount(p_image[p_keep], minlength=n_images)
+        rows = rows[p_keep]
+        pred_boxes = pred_table.boxes[rows].astype(np.float64)
+        pred_conf = pred_table.confidences[rows].astype(np.float64)
+        p_lab = p_lab[p_keep]
 
+        pred_off = np.concatenate([[0], np.cumsum(pred_counts)])
+        gt_off = np.concatenate([[0], np.cumsum(gt_counts)])
+        pair_counts = pred_counts * gt_counts
+
+        start = 0
+        while start < n_images:
+            end = start + 1
+            n_pairs = int(pair_counts[start])
+            while end < n_images and n_pairs + pair_counts[end] <= _PAIR_BUDGET:
+                n_pairs += int(pair_counts[end])
+                end += 1
+
+            p0, p1 = int(pred_off[start]), int(pred_off[end])
+            g0, g1 = int(gt_off[start]), int(gt_off[end])
+            cand_p, cand_g, cand_iou = candidate_pairs(
+                pred_boxes[p0:p1],
+                gt_boxes[g0:g1],
+                pred_counts[start:end],
+                gt_counts[start:end],
+                min_iou,
+            )
+            conf = pred_conf[p0:p1]
+            image_of = np.repeat(np.arange(end - start), pred_counts[start:end])
+            order = np.lexsort((-conf, image_of))
+            rank = np.empty(p1 - p0, dtype=np.intp)
+            rank[order] = np.arange(p1 - p0)
+            yield _Chunk(
+                start=start,
+                end=end,
+                n_pred=p1 - p0,
+                n_gt=g1 - g0,
+                p_idx=p_lab[p0:p1],
+                g_idx=g_lab[g0:g1],
+                pred_counts=pred_counts[start:end],
+                gt_counts=gt_counts[start:end],
+                conf=conf,
+                order=order,
+                rank=rank,
+                cand_p=cand_p,
+                cand_g=cand_g,
+                cand_iou=cand_iou,
+            )
+            start = end
+
+    def summarize(self, stats: EvalStats) -> EvalResult:
+        """Turn accumulated statistics into an :class:`EvalResult`."""
+        labels = list(stats.labels)
+        tp, fp, fn = stats.tp, stats.fp, stats.fn
         precision = tp / (tp + fp) if tp + fp else 0.0
         recall = tp / (tp + fn) if tp + fn else 0.0
         f1 = 2 * precision * recall / (precision + recall) if precision + recall else 0.0
 
-        # compute simple mAP@0.5 from accumulated detections
-        ap = 0.0
-        if total_gt:
-            tp_cum = fp_cum = 0
-            recall_prev = 0.0
-            for m in pred_matches:
-                if m:
-                    tp_cum += 1
-                else:
-                    fp_cum += 1
-                recall_cur = tp_cum / total_gt
-                prec_cur = tp_cum / (tp_cum + fp_cum)
-                ap += (recall_cur - recall_prev) * prec_cur
-                recall_prev = recall_cur
-        map50 = ap
+        ap_per_threshold: Dict[str, List[float]] = {}
+        for c in range(len(labels) - 1):
+            if stats.n_gt[c] == 0:
+                continue  # AP is undefined for classes absent from the GT
+            sel = stats.det_cls == c
+            ap_per_threshold[labels[c]] = average_precision(
+                stats.det_tp[sel], stats.det_conf[sel], int(stats.n_gt[c])
+            ).tolist()
+        ap50 = {name: aps[0] for name, aps in ap_per_threshold.items()}
+        ap50_95 = {name: float(np.mean(aps)) for name, aps in ap_per_threshold.items()}
+        map50 = float(np.mean(list(ap50.values()))) if ap50 else 0.0
+        map50_95 = float(np.mean(list(ap50_95.values()))) if ap50_95 else 0.0
 
+        confusion_list: List[List[int]] = stats.confusion.tolist()
         conf_prob: List[List[float]] = []
-        for row in confusion:
+        for row in confusion_list:
             s = sum(row)
             conf_prob.append([c / s if s else 0.0 for c in row])
 
@@ -136,10 +561,150 @@ class Evaluator:
             recall=recall,
             f1=f1,
             map50=map50,
-            confusion_matrix=confusion,
+            confusion_matrix=confusion_list,
             confusion_prob=conf_prob,
             labels=labels,
             tp=tp,
             fp=fp,
             fn=fn,
-        )
\ No newline at end of file
+            map50_95=map50_95,
+            ap50=ap50,
+            ap50_95=ap50_95,
+            ap_per_threshold=ap_per_threshold,
+        )
+
+    def evaluate(self, annotations: List[Annotation], predictions: Dict[str, List[Box]]) -> EvalResult:
+        stats = self.accumulate(annotations, predictions)
+        if not stats:
+            return self.summarize(EvalStats.empty(self.labels_for(annotations, predictions)))
+        return self.summarize(stats[None])
+
+    def evaluate_folders(
+        self,
+        annotations: List[Annotation],
+        predictions: Dict[str, List[Box]],
+        root_dir: str,
+    ) -> Dict[str, EvalResult]:
+        """Evaluate the whole dataset and every folder below ``root_dir``.
+
+        Each image is matched once; the statistics of the folder holding it
+        are then rolled up into all of its ancestors. Returns results keyed by
+        ``"overall"`` followed by every folder's POSIX path relative to
+        ``root_dir``, in order of first appearance.
+        """
+        root = Path(root_dir)
+        folders = [Path(ann.image_path).relative_to(root).parent.as_posix() for ann in annotations]
+        leaf_stats = self.accumulate(annotations, predictions, folders)
+
+        members: Dict[str, List[str]] = {}
+        for leaf in leaf_stats:
+            parts = Path(leaf).parts if leaf != "." else ()
+            for i in range(1, len(parts) + 1):
+                members.setdefault(Path(*parts[:i]).as_posix(), []).append(leaf)
+
+        empty = EvalStats.empty(self.labels_for(annotations, predictions))
+        results = {"overall": self.summarize(empty.merge(*leaf_stats.values()))}
+        for name, leaves in members.items():
+            results[name] = self.summarize(empty.merge(*(leaf_stats[l] for l in leaves)))
+        return results
+
+    def sweep(
+        self,
+        annotations: List[Annotation],
+        predictions: Dict[str, List[Box]],
+        thresholds: Sequence[float] | None = None,
+    ) -> SweepResult:
+        """Score every confidence threshold in ``thresholds`` in one pass.
+
+        Predictions should come from a run with a confidence floor at or
+        below the smallest threshold. Each image is matched once with its
+        predictions in descending confidence order; raising the threshold
+        then only drops a suffix of that order, so the result at ``t`` equals
+        :meth:`evaluate` on the predictions with ``confidence >= t`` (YOLO
+        already returns detections sorted this way). Counts for all
+        thresholds come from histograms over the sorted thresholds and
+        cumulative sums.
+        """
+        if thresholds is None:
+            thresholds = np.round(np.arange(0.0, 1.0, 0.01), 2)
+        # float64 on both sides: the float32 confidences widen exactly, so a
+        # confidence tying a threshold is kept just like ``>=`` on Python floats
+        thr = np.sort(np.asarray(thresholds, dtype=np.float64))
+        n_thr = len(thr)
+        labels = self.labels_for(annotations, predictions)
+        bg_idx = len(labels) - 1
+        idx = {l: i for i, l in enumerate(labels)}
+        n_labels = len(labels)
+        n_cells = n_labels * n_labels
+
+        # histograms over ``searchsorted`` bins: detections count at every
+        # threshold below their bin, missed GTs at every threshold from theirs
+        det_hist = np.zeros((n_thr + 1, n_cells), dtype=np.int64)
+        miss_hist = np.zeros((n_thr + 1, n_cells), dtype=np.int64)
+        tp_conf: List[np.ndarray] = []
+        fp_conf: List[np.ndarray] = []
+        n_gt = 0
+
+        for ch in self._chunks(annotations, predictions, idx, self.iou_threshold):
+            n_gt += ch.n_gt
+            ranked = greedy_match(ch.rank[ch.cand_p], ch.cand_g, ch.cand_iou, ch.n_pred)
+            matches = np.empty_like(ranked)
+            matches[ch.order] = ranked
+            matched = matches >= 0
+            tp_conf.append(ch.conf[matched])
+            fp_conf.append(ch.conf[~matched])
+
+            rows = np.full(ch.n_pred, bg_idx, dtype=np.intp)
+            rows[matched] = ch.g_idx[matches[matched]]
+            bins = np.searchsorted(thr, ch.conf, side="right")
+            np.add.at(det_hist, (bins, rows * n_labels + ch.p_idx), 1)
+
+            # a GT is missed at thresholds above the confidence of its match
+            match_conf = np.full(ch.n_gt, -np.inf)
+            match_conf[matches[matched]] = ch.conf[matched]
+            bins = np.searchsorted(thr, match_conf, side="right")
+            np.add.at(miss_hist, (bins, ch.g_idx * n_labels + bg_idx), 1)
+
+        det_counts = np.cumsum(det_hist[::-1], axis=0)[::-1][1:]
+        miss_counts = np.cumsum(miss_hist, axis=0)[:-1]
+        confusion = (det_counts + miss_counts).reshape(n_thr, n_labels, n_labels)
+
+        def _at_or_above(values: List[np.ndarray]) -> np.ndarray:
+            v = np.sort(np.concatenate(values)) if values else np.zeros(0)
+            return len(v) - np.searchsorted(v, thr, side="left")
+
+        tp = _at_or_above(tp_conf)
+        fp = _at_or_above(fp_conf)
+        precision, recall, f1 = _prf(tp, fp, n_gt - tp)
+
+        diag = confusion[:, np.arange(n_labels), np.arange(n_labels)]
+        c_tp = diag
+        c_fp = confusion.sum(axis=1) - diag
+        c_fn = confusion.sum(axis=2) - diag
+        c_p, c_r, c_f1 = _prf(c_tp, c_fp, c_fn)
+
+        class_precision: Dict[str, List[float]] = {}
+        class_recall: Dict[str, List[float]] = {}
+        class_f1: Dict[str, List[float]] = {}
+        best: Dict[str, float] = {"all": float(thr[int(np.argmax(f1))])} if n_thr else {}
+        for c in range(bg_idx):
+            if not confusion[:, c, :].any() and not confusion[:, :, c].any():
+                continue
+            name = labels[c]
+            class_precision[name] = c_p[:, c].tolist()
+            class_recall[name] = c_r[:, c].tolist()
+            class_f1[name] = c_f1[:, c].tolist()
+            best[name] = float(thr[int(np.argmax(c_f1[:, c]))])
+
+        return SweepResult(
+            thresholds=thr.tolist(),
+            labels=labels,
+            precision=precision.tolist(),
+            recall=recall.tolist(),
+            f1=f1.tolist(),
+            confusion_matrices=confusion,
+            class_precision=class_precision,
+            class_recall=class_recall,
+            class_f1=class_f1,
+            best_threshold=best,
+        )
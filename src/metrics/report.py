@@ -0,0 +1,117 @@
+"""Self-contained HTML report of evaluation results."""
+
+from __future__ import annotations
+
+import json
+from pathlib import Path
+from typing import Mapping
+
+from .evaluator import EvalResult
+
+# the matrices are drawn as SVG in the browser, so the report stays small
+# and opens instantly no matter how many folders or classes there are
+_TEMPLATE = """<!DOCTYPE html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>__TITLE__</title>
+<style>
+body { font-family: sans-serif; margin: 1em; }
+table.summary { border-collapse: collapse; }
+table.summary td, table.summary th { border: 1px solid #ccc; padding: 2px 8px; text-align: right; }
+table.summary td:first-child { text-align: left; cursor: pointer; color: #06c; }
+#controls { margin: 1em 0; }
+svg text { font-size: 10px; }
+</style>
+</head>
+<body>
+<h1>__TITLE__</h1>
+<table class="summary" id="summary">
+<tr><th>Group</th><th>Precision</th><th>Recall</th><th>F1</th><th>mAP50</th><th>mAP50-95</th></tr>
+</table>
+<div id="controls">
+<select id="group"></select>
+<label><input type="checkbox" id="normalize"> Normalize rows</label>
+</div>
+<div id="matrix"></div>
+<script>
+const DATA = __DATA__;
+const NS = "http://www.w3.org/2000/svg";
+function el(name, attrs, text) {
+  const e = document.createElementNS(NS, name);
+  for (const k in attrs) e.setAttribute(k, attrs[k]);
+  if (text !== undefined) e.textContent = text;
+  return e;
+}
+function draw() {
+  const g = DATA.groups[document.getElementById("group").value];
+  const norm = document.getElementById("normalize").checked;
+  const n = g.labels.length, cell = Math.max(8, Math.min(40, Math.floor(800 / n)));
+  const pad = 120, size = pad + n * cell;
+  let m = g.matrix;
+  if (norm) m = m.map(r => { const s = r.reduce((a, b) => a + b, 0) || 1; return r.map(v => v / s); });
+  let max = 0; m.forEach(r => r.forEach(v => { if (v > max) max = v; }));
+  const svg = el("svg", {width: size, height: size});
+  g.labels.forEach((l, i) => {
+    svg.appendChild(el("text", {x: pad - 4, y: pad + i * cell + cell / 2, "text-anchor": "end", "dominant-baseline": "middle"}, l));
+    svg.appendChild(el("text", {x: 0, y: 0, transform: `translate(${pad + i * cell + cell / 2},${pad - 4}) rotate(-60)`}, l));
+  });
+  m.forEach((r, i) => r.forEach((v, j) => {
+    const a = max ? v / max : 0;
+    const rect = el("rect", {x: pad + j * cell, y: pad + i * cell, width: cell, height: cell, fill: `rgba(8,48,107,${a})`, stroke: "#eee"});
+    rect.appendChild(el("title", {}, `true ${g.labels[i]} / pred ${g.labels[j]}: ${norm ? v.toFixed(3) : v}`));
+    svg.appendChild(rect);
+    if (v && cell >= 24) {
+      svg.appendChild(el("text", {x: pad + j * cell + cell / 2, y: pad + i * cell + cell / 2, "text-anchor": "middle", "dominant-baseline": "middle", fill: a > 0.5 ? "white" : "black"}, norm ? v.toFixed(2) : v));
+    }
+  }));
+  const box = document.getElementById("matrix");
+  box.replaceChildren(svg);
+}
+const select = document.getElementById("group"), summary = document.getElementById("summary");
+DATA.names.forEach(name => {
+  const g = DATA.groups[name];
+  select.appendChild(new Option(name, name));
+  const tr = summary.insertRow();
+  [name, g.precision, g.recall, g.f1, g.map50, g.map50_95].forEach((v, i) => {
+    tr.insertCell().textContent = i ? v.toFixed(3) : v;
+  });
+  tr.cells[0].onclick = () => { select.value = name; draw(); };
+});
+select.onchange = draw;
+document.getElementById("normalize").onchange = draw;
+draw();
+</script>
+</body>
+</html>
+"""
+
+
+def write_html_report(
+    results: Mapping[str, EvalResult],
+    save_path: str | Path,
+    title: str = "Evaluation report",
+) -> Path:
+    """Write one HTML file with the metrics and confusion matrix of every group."""
+    data = {
+        "names": list(results),
+        "groups": {
+            name: {
+                "precision": res.precision,
+                "recall": res.recall,
+                "f1": res.f1,
+                "map50": res.map50,
+                "map50_95": res.map50_95,
+                "labels": res.labels,
+                "matrix": res.confusion_matrix,
+            }
+            for name, res in results.items()
+        },
+    }
+    # "</" would end the script element early
+    payload = json.dumps(data, separators=(",", ":")).replace("</", "<\\/")
+    html = _TEMPLATE.replace("__TITLE__", title).replace("__DATA__", payload)
+    path = Path(save_path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(html, encoding="utf-8")
+    return path
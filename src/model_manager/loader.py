@@ -5,10 +5,7 @@ from __future__ import annotations
 from dataclasses import dataclass
 from typing import Optional
 
-try:
-    from ultralytics import YOLO  # type: ignore
-except Exception:  # pragma: no cover - ultralytics optional
-    YOLO = None  # type: ignore
+from src.utils.lazy import optional_import
 
 
 @dataclass
@@ -19,8 +16,10 @@ class ModelManager:
     model: Optional[object] = None
 
     def load(self) -> None:
-        if YOLO is not None:
-            self.model = YOLO(self.model_path)
+        # ultralytics pulls in torch, so it is only imported when a model is loaded
+        ultralytics = optional_import("ultralytics")
+        if ultralytics is not None:
+            self.model = ultralytics.YOLO(self.model_path)
         else:  # pragma: no cover - fallback
             self.model = None
 
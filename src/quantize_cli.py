@@ -0,0 +1,131 @@
+import argparse
+import json
+import logging
+import time
+from pathlib import Path
+
+from config import Config
+from datasets.xml_loader import load_dataset, DatasetConsistencyError
+from inference.predictor import Predictor
+from inference.quantize import QUANT_MODES, export_onnx, quantize_model, sample_images
+from metrics.evaluator import EvalResult, Evaluator
+from log_setup import setup_logging
+
+METRICS = ("precision", "recall", "f1", "map50", "map50_95")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Quantize a model to int8 and compare it with fp32")
+    parser.add_argument("--config", help="Path to config YAML", default=None)
+    parser.add_argument("--model", help="Model weights (.pt or .onnx)", default=None)
+    parser.add_argument("--data", help="Dataset directory", default=None)
+    parser.add_argument("--output", help="Output directory", default=None)
+    parser.add_argument("--img-size", type=int, nargs=2, metavar=("H", "W"), help="Inference image size", default=None)
+    parser.add_argument("--batch-size", type=int, help="Batch size", default=None)
+    parser.add_argument("--mode", choices=QUANT_MODES, default="static", help="static: calibrated weights and activations; dynamic: weights only")
+    parser.add_argument("--calib-images", type=int, default=100, help="Dataset images sampled for calibration")
+    parser.add_argument("--int8-model", help="Compare with this already quantized model instead of quantizing", default=None)
+    parser.add_argument("--log-dir", help="Directory for logs", default="logs")
+    return parser.parse_args()
+
+
+def timed_run(predictor: Predictor, image_paths: list) -> tuple:
+    """Predict ``image_paths`` after one warm-up batch; return predictions and img/s."""
+    predictor.batch_arrays(image_paths[: predictor.batch_size])
+    start = time.perf_counter()
+    predictions = predictor.predict_all(image_paths)
+    elapsed = time.perf_counter() - start
+    return predictions, len(image_paths) / elapsed if elapsed else 0.0
+
+
+def summary(res: EvalResult, throughput: float) -> dict:
+    out = {name: getattr(res, name) for name in METRICS}
+    out["images_per_s"] = throughput
+    out["ap50"] = dict(res.ap50)
+    return out
+
+
+def main() -> None:
+    args = parse_args()
+    setup_logging(args.log_dir)
+    cfg = Config.from_file(args.config)
+    if args.model:
+        cfg.model_path = args.model
+    if args.data:
+        cfg.data_dir = args.data
+    if args.output:
+        cfg.output_dir = args.output
+    if args.img_size:
+        cfg.img_size = tuple(args.img_size)
+    if args.batch_size is not None:
+        cfg.batch_size = args.batch_size
+
+    logging.info("Model path: %s", cfg.model_path)
+    logging.info("Dataset dir: %s", cfg.data_dir)
+    logging.info("Quantization mode: %s", args.mode)
+    try:
+        annotations = load_dataset(cfg.data_dir)
+    except DatasetConsistencyError as exc:
+        logging.debug("Dataset issue: %s", exc)
+        annotations = exc.annotations
+    image_paths = [ann.image_path for ann in annotations]
+
+    # both variants run on ONNX Runtime so only the precision differs
+    fp32_path = export_onnx(cfg.model_path, cfg.img_size)
+    if args.int8_model:
+        int8_path = args.int8_model
+    else:
+        calib = sample_images(image_paths, args.calib_images)
+        logging.info("Calibrating on %d images", len(calib))
+        int8_path = quantize_model(
+            fp32_path,
+            str(Path(cfg.output_dir) / f"{Path(fp32_path).stem}_int8_{args.mode}.onnx"),
+            mode=args.mode,
+            calibration_images=calib,
+            image_size=cfg.img_size,
+        )
+    logging.info("Int8 model: %s", int8_path)
+
+    report = {
+        "model": cfg.model_path,
+        "fp32_model": fp32_path,
+        "int8_model": int8_path,
+        "mode": None if args.int8_model else args.mode,
+        "images": len(image_paths),
+    }
+    for name, path in (("fp32", fp32_path), ("int8", int8_path)):
+        predictor = Predictor(
+            path,
+            cfg.confidence_threshold,
+            cfg.img_size,
+            cfg.batch_size,
+            cfg.prefetch_depth,
+            cfg.decode_workers,
+            backend="onnxruntime",
+        )
+        predictions, throughput = timed_run(predictor, image_paths)
+        evaluator = Evaluator(cfg.iou_threshold, list(predictor.names) or None)
+        report[name] = summary(evaluator.evaluate(annotations, predictions), throughput)
+
+    fp32, int8 = report["fp32"], report["int8"]
+    report["speedup"] = int8["images_per_s"] / fp32["images_per_s"] if fp32["images_per_s"] else 0.0
+    report["delta"] = {name: int8[name] - fp32[name] for name in METRICS}
+    report["delta"]["ap50"] = {c: int8["ap50"].get(c, 0.0) - ap for c, ap in fp32["ap50"].items()}
+
+    logging.info("%-10s %10s %10s %10s", "", "fp32", "int8", "delta")
+    logging.info(
+        "%-10s %10.1f %10.1f %9.2fx", "img/s", fp32["images_per_s"], int8["images_per_s"], report["speedup"]
+    )
+    for name in METRICS:
+        logging.info("%-10s %10.3f %10.3f %+10.3f", name, fp32[name], int8[name], report["delta"][name])
+
+    out_dir = Path(cfg.output_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    report_path = out_dir / "quantization_report.json"
+    with report_path.open("w", encoding="utf-8") as fh:
+        json.dump(report, fh, indent=2)
+    logging.info("Report saved to %s", report_path)
+
+
+if __name__ == "__main__":
+    main()
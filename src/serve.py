@@ -0,0 +1,274 @@
+"""Local HTTP inference server that batches concurrent requests.
+
+The model is loaded once. Each ``POST /predict`` carries one encoded
+image (JPEG, PNG, ...) as the request body and is answered with its boxes
+as JSON::
+
+    curl --data-binary @image.jpg http://127.0.0.1:8000/predict
+    {"boxes": [{"label": "car", "xmin": 12, "ymin": 40, "xmax": 180,
+                "ymax": 122, "confidence": 0.91}], "latency_ms": 23.4}
+
+Images arriving at the same time are merged into batches of up to
+``batch_size`` by :class:`MicroBatcher`, waiting at most ``max_wait_ms``
+for a batch to fill. ``GET /health`` reports the model and
+``GET /metrics`` the queue depth, a histogram of batch sizes and request
+latencies.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import logging
+import queue
+import signal
+import threading
+import time
+from collections import Counter, deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Dict, List
+
+from src.config import Config
+from src.datasets.xml_loader import Box
+from src.inference.backends import decode_image
+from src.inference.predictor import Predictor
+
+# requests larger than this are refused
+MAX_BODY_BYTES = 64 << 20
+# latencies kept for the percentiles of ``/metrics``
+LATENCY_WINDOW = 1000
+
+
+class _Request:
+    __slots__ = ("image", "done", "boxes", "error")
+
+    def __init__(self, image: Any) -> None:
+        self.image = image
+        self.done = threading.Event()
+        self.boxes: List[Box] | None = None
+        self.error: BaseException | None = None
+
+
+class MicroBatcher:
+    """Run single-image requests through ``predictor`` in batches.
+
+    :meth:`predict` may be called from many threads at once. A background
+    thread takes the oldest queued image, then waits up to ``max_wait_ms``
+    for more until ``batch_size`` images are collected, and runs them as
+    one batch. A lone request is therefore delayed by at most
+    ``max_wait_ms``.
+    """
+
+    def __init__(self, predictor: Predictor, batch_size: int, max_wait_ms: float = 10.0) -> None:
+        self.predictor = predictor
+        self.batch_size = max(1, int(batch_size))
+        self.max_wait = max(0.0, max_wait_ms) / 1000
+        self._queue: "queue.Queue[_Request | None]" = queue.Queue()
+        self._lock = threading.Lock()
+        self.started = time.time()
+        self.requests = 0
+        self.errors = 0
+        self.batches: Counter = Counter()
+        self.infer_seconds = 0.0
+        self.latencies: deque = deque(maxlen=LATENCY_WINDOW)
+        self._thread = threading.Thread(target=self._run, name="batcher", daemon=True)
+        self._thread.start()
+
+    def predict(self, image: Any) -> List[Box]:
+        """Boxes of one BGR ``uint8`` image; blocks until its batch has run."""
+        start = time.perf_counter()
+        req = _Request(image)
+        self._queue.put(req)
+        req.done.wait()
+        with self._lock:
+            self.requests += 1
+            if req.error is not None:
+                self.errors += 1
+            self.latencies.append(time.perf_counter() - start)
+        if req.error is not None:
+            raise req.error
+        return req.boxes or []
+
+    def _collect(self, first: _Request) -> List[_Request]:
+        batch = [first]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.batch_size:
+            timeout = deadline - time.perf_counter()
+            try:
+                req = self._queue.get(timeout=timeout) if timeout > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if req is None:  # closing; finish what was collected first
+                self._queue.put(None)
+                break
+            batch.append(req)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            first = self._queue.get()
+            if first is None:
+                return
+            batch = self._collect(first)
+            start = time.perf_counter()
+            try:
+                results = self.predictor.batch_predict([r.image for r in batch])
+            except Exception as exc:
+                logging.exception("Batch of %d images failed", len(batch))
+                for r in batch:
+                    r.error = exc
+            else:
+                for r, boxes in zip(batch, results):
+                    r.boxes = boxes
+            with self._lock:
+                self.batches[len(batch)] += 1
+                self.infer_seconds += time.perf_counter() - start
+            for r in batch:
+                r.done.set()
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            batches = dict(sorted(self.batches.items()))
+            latencies = sorted(self.latencies)
+            out: Dict[str, Any] = {
+                "uptime_s": round(time.time() - self.started, 1),
+                "queue_depth": self._queue.qsize(),
+                "requests": self.requests,
+                "errors": self.errors,
+                "batches": sum(batches.values()),
+                "batch_size_histogram": {str(k): v for k, v in batches.items()},
+                "inference_seconds": round(self.infer_seconds, 3),
+            }
+        images = sum(k * v for k, v in batches.items())
+        out["mean_batch_size"] = round(images / out["batches"], 2) if out["batches"] else None
+        out["latency_ms"] = {
+            f"p{p}": round(latencies[min(len(latencies) - 1, int(p / 100 * len(latencies)))] * 1000, 2)
+            for p in (50, 95, 99)
+        } if latencies else {}
+        return out
+
+    def close(self) -> None:
+        """Stop the batching thread after the queued requests have run."""
+        self._queue.put(None)
+        self._thread.join()
+
+
+def make_handler(batcher: MicroBatcher, info: Dict[str, Any]) -> type:
+    """Request handler class serving ``batcher``; ``info`` is returned by ``/health``."""
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # seconds a client may stall, e.g. sending less than its Content-Length
+        timeout = 60
+
+        def _send(self, status: int, body: Dict[str, Any]) -> None:
+            data = json.dumps(body).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_GET(self) -> None:  # noqa: N802 - http.server naming
+            if self.path == "/health":
+                self._send(200, {"status": "ok", **info})
+            elif self.path == "/metrics":
+                self._send(200, batcher.metrics())
+            else:
+                self._send(404, {"error": f"unknown path {self.path}"})
+
+        def do_POST(self) -> None:  # noqa: N802 - http.server naming
+            if self.path != "/predict":
+                self._send(404, {"error": f"unknown path {self.path}"})
+                return
+            # the body is left unread on every refusal, so the connection
+            # cannot be reused after one
+            header = self.headers.get("Content-Length")
+            if header is None:
+                self.close_connection = True
+                self._send(411, {"error": "the image must be sent as the request body with a Content-Length"})
+                return
+            try:
+                length = int(header)
+            except ValueError:
+                length = -1
+            if length <= 0:
+                self.close_connection = True
+                self._send(400, {"error": f"invalid Content-Length {header!r}"})
+                return
+            if length > MAX_BODY_BYTES:
+                self._send(413, {"error": f"request body over {MAX_BODY_BYTES} bytes"})
+                self.close_connection = True
+                return
+            start = time.perf_counter()
+            try:
+                image = decode_image(self.rfile.read(length))
+            except Exception as exc:
+                self._send(400, {"error": f"cannot decode image: {exc}"})
+                return
+            try:
+                boxes = batcher.predict(image)
+            except Exception as exc:
+                self._send(500, {"error": str(exc)})
+                return
+            self._send(
+                200,
+                {
+                    "boxes": [dataclasses.asdict(b) for b in boxes],
+                    "latency_ms": round((time.perf_counter() - start) * 1000, 2),
+                },
+            )
+
+        def log_message(self, format: str, *args: Any) -> None:
+            logging.debug("%s - %s", self.address_string(), format % args)
+
+    return Handler
+
+
+def serve(cfg: Config, host: str = "127.0.0.1", port: int = 8000, max_wait_ms: float = 10.0) -> None:
+    """Load ``cfg.model_path`` and serve it on ``host:port`` until interrupted.
+
+    Ctrl+C and ``SIGTERM`` stop the server once running requests finish.
+
+    Batches hold up to ``cfg.batch_size`` images, so a batch size above
+    one is needed for requests to be merged.
+    """
+    predictor = Predictor(
+        cfg.model_path,
+        cfg.confidence_threshold,
+        cfg.img_size,
+        cfg.batch_size,
+        prefetch_depth=0,
+        backend=cfg.backend,
+    )
+    batcher = MicroBatcher(predictor, cfg.batch_size, max_wait_ms)
+    info = {
+        "model": cfg.model_path,
+        "backend": type(predictor.engine).__name__,
+        "classes": len(predictor.names),
+        "confidence": cfg.confidence_threshold,
+        "image_size": list(cfg.img_size),
+        "batch_size": batcher.batch_size,
+        "max_wait_ms": max_wait_ms,
+    }
+    server = ThreadingHTTPServer((host, port), make_handler(batcher, info))
+    server.daemon_threads = True
+    logging.info(
+        "Serving %s on http://%s:%d (batch size %d, max wait %.1f ms)",
+        cfg.model_path,
+        host,
+        server.server_address[1],
+        batcher.batch_size,
+        max_wait_ms,
+    )
+    if threading.current_thread() is threading.main_thread():
+        # shutdown() waits for serve_forever() to return, so not from its own thread
+        signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        logging.info("Shutting down")
+        server.server_close()
+        batcher.close()
@@ -3,18 +3,23 @@
 from __future__ import annotations
 
 
+import json
 import logging
 import threading
 from pathlib import Path
-import tkinter as tk
-from tkinter import filedialog, messagebox, ttk
 
 from src.config import Config
+from src.datasets.detections import DetectionTable
+from src.datasets.prediction_store import PREDICTIONS_DIR, PredictionWriter
 from src.datasets.xml_loader import load_dataset, Annotation, DatasetConsistencyError
 from src.inference.predictor import Predictor
-from src.metrics.evaluator import Evaluator
-from src.metrics.confusion import plot_confusion_matrix
+from src.metrics.evaluator import EvalResult, Evaluator
+from src.metrics.confusion import DEFAULT_DPI, FAST_DPI, MatrixPlot, render_confusion_matrices
+from src.metrics.curves import filter_predictions, plot_sweep_curves, save_sweep
+from src.metrics.report import write_html_report
 from src.log_setup import setup_logging
+from src.utils import profiling
+from src.utils.profiling import span
 
 
 try:  # progress bars are optional
@@ -22,6 +27,91 @@ try:  # progress bars are optional
 except Exception:  # pragma: no cover - tqdm may not be installed
     tqdm = None  # type: ignore
 
+# settings of a run, used to resume it
+RUN_STATE_NAME = "run.json"
+
+
+def evaluate_run(
+    cfg: Config,
+    run_dir: Path,
+    annotations: list[Annotation],
+    predictions: DetectionTable,
+    class_names: list[str] | None,
+    sweep: bool = False,
+) -> dict[str, EvalResult]:
+    """Evaluate ``predictions`` and write the outputs of a run to ``run_dir``.
+
+    Metrics are logged for the whole dataset and every folder level, and
+    confusion matrices, ``report.html`` and (with ``sweep``) the sweep
+    outputs are written according to ``cfg``. With ``sweep`` the
+    predictions are expected down to ``cfg.sweep_floor`` and are filtered
+    to ``cfg.confidence_threshold`` for the regular outputs. Returns the
+    results by group, ``overall`` first.
+    """
+    raw_predictions = predictions
+    if sweep:
+        predictions = filter_predictions(raw_predictions, cfg.confidence_threshold)
+
+    evaluator = Evaluator(cfg.iou_threshold, class_names)
+
+    plots: list[MatrixPlot] = []
+
+    def save_result(name: str, res: EvalResult) -> None:
+        logging.info(
+            "%s - Precision: %.3f Recall: %.3f F1: %.3f mAP50: %.3f mAP50-95: %.3f",
+            name,
+            res.precision,
+            res.recall,
+            res.f1,
+            res.map50,
+            res.map50_95,
+        )
+        labels = res.labels
+        sub_dir = run_dir / name if name != "overall" else run_dir
+        sub_dir.mkdir(parents=True, exist_ok=True)
+        cm_path = sub_dir / "confusion_matrix.png"
+        cmp_path = sub_dir / "confusion_probability.png"
+        plots.append(MatrixPlot(res.confusion_matrix, labels, False, str(cm_path)))
+        plots.append(MatrixPlot(res.confusion_prob, labels, True, str(cmp_path)))
+
+    # overall first, then every folder level; each image is matched once
+    with span("evaluate", len(annotations)):
+        results = evaluator.evaluate_folders(annotations, predictions, cfg.data_dir)
+    for name, res in results.items():
+        save_result(name, res)
+    if cfg.save_plots:
+        try:
+            with span("confusion_plots"):
+                n_rendered = render_confusion_matrices(
+                    plots,
+                    run_dir,
+                    workers=cfg.plot_workers,
+                    dpi=cfg.plot_dpi or (FAST_DPI if cfg.fast_plots else DEFAULT_DPI),
+                    fast=cfg.fast_plots,
+                    cache_dir=Path(cfg.cache_dir) / "figures" if cfg.cache_dir else None,
+                )
+            logging.info("Confusion matrices: %d of %d figures rendered", n_rendered, len(plots))
+        except Exception as exc:  # pragma: no cover - matplotlib optional
+            logging.error("Failed to plot confusion matrix: %s", exc)
+    if cfg.html_report:
+        with span("report"):
+            report = write_html_report(results, run_dir / "report.html", title=run_dir.name)
+        logging.info("Report saved to %s", report)
+
+    if sweep:
+        with span("sweep", len(annotations)):
+            sweep_res = evaluator.sweep(annotations, raw_predictions)
+            sweep_dir = run_dir / "sweep"
+            save_sweep(sweep_res, sweep_dir)
+            try:
+                plot_sweep_curves(sweep_res, sweep_dir)
+            except Exception as exc:  # pragma: no cover - matplotlib optional
+                logging.error("Failed to plot sweep curves: %s", exc)
+        for name, thr in sweep_res.best_threshold.items():
+            logging.info("F1-optimal confidence %s: %.2f", name, thr)
+    return results
+
+
 def run_evaluation(
     model_path: str,
     data_dir: str,
@@ -34,9 +124,64 @@ def run_evaluation(
     iou_threshold: float | None = None,
     img_size: tuple[int, int] | None = None,
     batch_size: int | None = None,
+    prefetch_depth: int | None = None,
+    decode_workers: int | None = None,
+    cache_dir: str | None = None,
+    cache_size_mb: int | None = None,
+    inference_workers: int | None = None,
+    threads_per_worker: int | None = None,
+    backend: str | None = None,
+    reduced_decode: bool | None = None,
+    tensor_cache_dir: str | None = None,
+    sweep: bool = False,
+    predictions_text: bool | None = None,
+    resume_dir: str | None = None,
+    render_workers: int | None = None,
+    image_quality: int | None = None,
+    image_max_size: int | None = None,
+    fast_plots: bool | None = None,
+    plot_dpi: int | None = None,
+    plot_workers: int | None = None,
+    html_report: bool | None = None,
+    save_plots: bool | None = None,
+    profile: bool | None = None,
+    profile_trace: bool | None = None,
 ) -> tuple[Path, Path | None]:
     """Run evaluation, reporting progress via ``progress_cb``.
 
+    With ``reduced_decode`` JPEGs are decoded at a reduced scale close to
+    ``img_size`` (see :class:`~src.inference.predictor.Predictor`).
+    ``tensor_cache_dir`` keeps the letterboxed model inputs so that later
+    runs on the same images at the same ``img_size`` skip decoding.
+
+    With ``save_images`` annotated copies of the images are rendered by
+    ``render_workers`` processes while inference is still running.
+
+    Confusion matrices are rendered by ``plot_workers`` processes at
+    ``plot_dpi`` (default: ``DEFAULT_DPI``, or ``FAST_DPI`` with
+    ``fast_plots``); ``html_report`` adds a single
+    ``report.html`` that draws every matrix in the browser, which is
+    usually enough to disable the PNGs with ``save_plots=False``.
+
+    With ``sweep`` the model runs once at ``sweep_floor`` confidence and
+    metrics plus PR/F1 curves are written for a grid of thresholds under
+    ``<run_dir>/sweep``; the regular outputs still use ``conf_threshold``.
+
+    Predictions are streamed to ``<run_dir>/predictions`` as batches
+    finish (see :func:`~src.datasets.prediction_store.load_predictions`),
+    plus ``predictions.txt`` unless ``predictions_text`` is false.
+
+    With ``profile`` the time spent in every stage (dataset loading,
+    decoding, inference, postprocessing, evaluation, plots, saving) is
+    logged and written to ``<run_dir>/profile.json`` with per-image latency
+    percentiles and peak memory; ``profile_trace`` also writes
+    ``trace.json`` for ``chrome://tracing`` (see :mod:`src.utils.profiling`).
+
+    Every run records its settings in ``<run_dir>/run.json``. Passing an
+    earlier run directory as ``resume_dir`` continues that run with its
+    recorded settings: images already in its prediction store are skipped
+    and the final outputs match those of an uninterrupted run.
+
     Returns the run directory and the directory where annotated images were
     stored (``None`` if images were not saved)."""
     """Run evaluation, reporting progress via ``progress_cb``."""
@@ -65,151 +210,243 @@ def run_evaluation(
         cfg.img_size = img_size
     if batch_size is not None:
         cfg.batch_size = batch_size
-
-    out_root = Path(cfg.output_dir)
-    data_name = Path(cfg.data_dir).name
-    idx = 1
-    while (out_root / f"{data_name}{idx}").exists():
-        idx += 1
-    run_dir = out_root / f"{data_name}{idx}"
-    run_dir.mkdir(parents=True, exist_ok=True)
+    if prefetch_depth is not None:
+        cfg.prefetch_depth = prefetch_depth
+    if decode_workers is not None:
+        cfg.decode_workers = decode_workers
+    if cache_dir:
+        cfg.cache_dir = cache_dir
+    if cache_size_mb is not None:
+        cfg.cache_size_mb = cache_size_mb
+    if inference_workers is not None:
+        cfg.inference_workers = inference_workers
+    if threads_per_worker is not None:
+        cfg.threads_per_worker = threads_per_worker
+    if backend:
+        cfg.backend = backend
+    if reduced_decode is not None:
+        cfg.reduced_decode = reduced_decode
+    if tensor_cache_dir:
+        cfg.tensor_cache_dir = tensor_cache_dir
+    if predictions_text is not None:
+        cfg.save_predictions_text = predictions_text
+    if render_workers is not None:
+        cfg.render_workers = render_workers
+    if image_quality is not None:
+        cfg.image_quality = image_quality
+    if image_max_size is not None:
+        cfg.image_max_size = image_max_size
+    if fast_plots is not None:
+        cfg.fast_plots = fast_plots
+    if plot_dpi is not None:
+        cfg.plot_dpi = plot_dpi
+    if plot_workers is not None:
+        cfg.plot_workers = plot_workers
+    if html_report is not None:
+        cfg.html_report = html_report
+    if save_plots is not None:
+        cfg.save_plots = save_plots
+    if profile is not None:
+        cfg.profile = profile
+    if profile_trace is not None:
+        cfg.profile_trace = profile_trace
+
+    if resume_dir:
+        run_dir = Path(resume_dir)
+        state_file = run_dir / RUN_STATE_NAME
+        if not state_file.exists():
+            raise FileNotFoundError(f"{run_dir} has no {RUN_STATE_NAME} to resume from")
+        with state_file.open("r", encoding="utf-8") as fh:
+            state = json.load(fh)
+        for key, value in state["config"].items():
+            setattr(cfg, key, value)
+        cfg.img_size = tuple(cfg.img_size)
+        sweep = state["sweep"]
+        image_output_dir = state["image_output_dir"]
+        # profiling does not change the results, so it is chosen per session
+        cfg.profile = bool(profile)
+        cfg.profile_trace = bool(profile_trace)
+    else:
+        out_root = Path(cfg.output_dir)
+        data_name = Path(cfg.data_dir).name
+        idx = 1
+        while (out_root / f"{data_name}{idx}").exists():
+            idx += 1
+        run_dir = out_root / f"{data_name}{idx}"
+        run_dir.mkdir(parents=True, exist_ok=True)
+        state = {"config": cfg.as_dict(), "sweep": sweep, "image_output_dir": image_output_dir}
+        with (run_dir / RUN_STATE_NAME).open("w", encoding="utf-8") as fh:
+            json.dump(state, fh, indent=2)
     img_dir_path: Path | None = None
+    root_dir = Path(cfg.data_dir)
 
     log_file = run_dir / "run.log"
     setup_logging(str(log_file))
+    if resume_dir:
+        logging.info("Resuming run in %s", run_dir)
+    profiler = profiling.enable(cfg.profile_trace) if cfg.profile or cfg.profile_trace else None
 
     # Record run configuration parameters for easier reproducibility
     logging.info("Model path: %s", cfg.model_path)
     logging.info("Dataset dir: %s", cfg.data_dir)
     logging.info("Output dir: %s", cfg.output_dir)
     logging.info("Confidence threshold: %.3f", cfg.confidence_threshold)
+    if sweep:
+        logging.info("Confidence sweep from floor %.3f", cfg.sweep_floor)
     logging.info("IoU threshold: %.3f", cfg.iou_threshold)
     logging.info("Image size: %s", cfg.img_size)
     logging.info("Batch size: %d", cfg.batch_size)
+    logging.info("Backend: %s", cfg.backend)
+    logging.info("Prefetch depth: %d (%d decode workers)", cfg.prefetch_depth, cfg.decode_workers)
+    if cfg.reduced_decode:
+        logging.info("Reduced-size JPEG decoding: enabled")
+    logging.info("Prediction cache: %s", cfg.cache_dir or "disabled")
+    if cfg.tensor_cache_dir:
+        logging.info("Tensor cache: %s", cfg.tensor_cache_dir)
+    if cfg.inference_workers > 1:
+        logging.info(
+            "Inference workers: %d (%s threads each)",
+            cfg.inference_workers,
+            cfg.threads_per_worker or "auto",
+        )
     logging.info("Save predictions: %s", cfg.save_predictions)
     logging.info("Save images: %s", cfg.save_images)
+    if cfg.save_images:
+        logging.info(
+            "Render workers: %d (JPEG quality %s, max size %s)",
+            cfg.render_workers,
+            cfg.image_quality or "default",
+            cfg.image_max_size or "original",
+        )
     if image_output_dir:
         logging.info("Image output dir: %s", image_output_dir)
     logging.info("Loading dataset from %s", cfg.data_dir)
-    try:
-        annotations = load_dataset(cfg.data_dir)
-    except DatasetConsistencyError as exc:
-        logging.debug("Dataset issue: %s", exc)
-        annotations = exc.annotations
-    predictor = Predictor(
-        cfg.model_path,
-        cfg.confidence_threshold,
-        cfg.img_size,
-        cfg.batch_size,
-    )
-
-    predictions: dict[str, list] = {}
-    total = len(annotations)
-    for i, ann in enumerate(annotations, 1):
-        boxes = predictor.predict(ann.image_path)
-        predictions[ann.image_path] = boxes
-        if progress_cb:
-            progress_cb(i, total)
-
-    names_attr = getattr(predictor.model, "names", None) if predictor.model is not None else None
-    if isinstance(names_attr, dict):
-        class_names = list(names_attr.values())
-    elif names_attr is not None:
-        class_names = list(names_attr)
-    else:
-        class_names = None
-    evaluator = Evaluator(cfg.iou_threshold, class_names)
-
-    def save_result(name: str, anns: list[Annotation]) -> None:
-        preds = {a.image_path: predictions[a.image_path] for a in anns}
-        res = evaluator.evaluate(anns, preds)
-        logging.info(
-            "%s - Precision: %.3f Recall: %.3f F1: %.3f mAP50: %.3f",
-            name,
-            res.precision,
-            res.recall,
-            res.f1,
-            res.map50,
-        )
-        labels = res.labels
-        sub_dir = run_dir / name if name != "overall" else run_dir
-        sub_dir.mkdir(parents=True, exist_ok=True)
-        cm_path = sub_dir / "confusion_matrix.png"
-        cmp_path = sub_dir / "confusion_probability.png"
+    with span("load_dataset"):
         try:
-            plot_confusion_matrix(res.confusion_matrix, labels, False, str(cm_path))
-            plot_confusion_matrix(res.confusion_prob, labels, True, str(cmp_path))
-        except Exception as exc:  # pragma: no cover - matplotlib optional
-            logging.error("Failed to plot confusion matrix: %s", exc)
-
-    save_result("overall", annotations)
-
-    groups: dict[str, list[Annotation]] = {}
-    root_dir = Path(cfg.data_dir)
-    for ann in annotations:
-        rel = Path(ann.image_path).relative_to(root_dir)
-        parts = rel.parts
-        for i in range(1, len(parts)):
-            key = Path(*parts[:i]).as_posix()
-            groups.setdefault(key, []).append(ann)
+            annotations = load_dataset(cfg.data_dir)
+        except DatasetConsistencyError as exc:
+            logging.debug("Dataset issue: %s", exc)
+            annotations = exc.annotations
+    with span("load_model"):
+        predictor = Predictor(
+            cfg.model_path,
+            min(cfg.confidence_threshold, cfg.sweep_floor) if sweep else cfg.confidence_threshold,
+            cfg.img_size,
+            cfg.batch_size,
+            cfg.prefetch_depth,
+            cfg.decode_workers,
+            cache_dir=cfg.cache_dir,
+            cache_size_mb=cfg.cache_size_mb,
+            workers=cfg.inference_workers,
+            threads_per_worker=cfg.threads_per_worker,
+            backend=cfg.backend,
+            reduced_decode=cfg.reduced_decode,
+            tensor_cache_dir=cfg.tensor_cache_dir,
+        )
 
-    for name, anns in groups.items():
-        save_result(name, anns)
+    class_names = list(predictor.names) or None
 
+    writer = None
     if cfg.save_predictions:
-        pred_file = run_dir / "predictions.txt"
-        with pred_file.open("w", encoding="utf-8") as fh:
-            for img, boxes in predictions.items():
-                b_str = " ".join(
-                    f"{b.label},{b.xmin},{b.ymin},{b.xmax},{b.ymax}" for b in boxes
-                )
-                fh.write(f"{img} {b_str}\n")
-        logging.info("Predictions saved to %s", pred_file)
+        writer = PredictionWriter(
+            run_dir / PREDICTIONS_DIR,
+            class_names or [],
+            text_path=run_dir / "predictions.txt" if cfg.save_predictions_text else None,
+            text_min_conf=cfg.confidence_threshold,
+            resume=bool(resume_dir),
+        )
+        if writer.completed is not None:
+            logging.info("Resume: %d images already predicted", len(writer.completed))
+    elif resume_dir:
+        logging.warning("Run was started without saving predictions; predicting all images again")
 
+    renderer = None
+    bar = None
     if cfg.save_images:
         try:
-            from PIL import Image, ImageDraw
+            from src.utils.visualization import RenderPool
         except Exception as exc:  # pragma: no cover - PIL optional
             logging.error("Saving images failed: %s", exc)
         else:
-            from src.utils.visualization import draw_boxes
             img_dir = Path(image_output_dir) if image_output_dir else run_dir / "images"
             if not img_dir.is_absolute():
                 img_dir = repo_root / img_dir
             img_dir.mkdir(parents=True, exist_ok=True)
+            img_dir_path = img_dir
 
-            items = list(predictions.items())
-            iterable = items
             if tqdm is not None:
-                iterable = tqdm(items, desc="Saving images", unit="img")
-            else:
-                total = len(items)
+                bar = tqdm(total=len(annotations), desc="Saving images", unit="img")
 
-                def _simple_progress(it):
-                    for idx, it_item in enumerate(it, 1):
-                        print(f"{idx}/{total}", end="\r")
-                        yield it_item
-                    print()
-
-                iterable = _simple_progress(items)
-
-            for img_path, boxes in iterable:
-                img = Image.open(img_path).convert("RGB")
-                draw_boxes(img, boxes)
-
-                rel = Path(img_path).relative_to(root_dir)
-                out_path = img_dir / rel
-                out_path.parent.mkdir(parents=True, exist_ok=True)
+                def render_progress(done: int, total: int) -> None:
+                    bar.update(done - bar.n)
+            else:
 
-                img.save(out_path)
+                def render_progress(done: int, total: int) -> None:
+                    print(f"{done}/{total}", end="\r")
+
+            # rendering overlaps inference; images are drawn as batches finish
+            renderer = RenderPool(
+                [ann.image_path for ann in annotations],
+                root_dir,
+                img_dir,
+                workers=cfg.render_workers,
+                min_conf=cfg.confidence_threshold,
+                quality=cfg.image_quality,
+                max_size=cfg.image_max_size,
+                progress_cb=render_progress,
+            )
+
+    def on_batch(table) -> None:
+        if writer is not None:
+            with span("write_predictions", len(table)):
+                writer.write(table)
+        if renderer is not None:
+            with span("queue_images", len(table)):
+                renderer.add(table)
 
-            logging.info("Images saved to %s", img_dir)
-            img_dir_path = img_dir
+    try:
+        predictions = predictor.predict_all(
+            [ann.image_path for ann in annotations],
+            progress_cb,
+            on_batch if writer is not None or renderer is not None else None,
+            completed=writer.completed if writer is not None else None,
+        )
+    except BaseException:
+        if renderer is not None:
+            renderer.close()
+        raise
+    finally:
+        if writer is not None:
+            writer.close()
+    evaluate_run(cfg, run_dir, annotations, predictions, class_names, sweep)
+
+    if writer is not None:
+        logging.info("Predictions saved to %s", run_dir / PREDICTIONS_DIR)
+
+    if renderer is not None:
+        try:
+            with span("save_images", len(predictions)):
+                n_saved = renderer.finish(predictions)
+        finally:
+            if bar is not None:
+                bar.close()
+            elif tqdm is None:
+                print()
+        logging.info("Images saved to %s (%d images)", img_dir_path, n_saved)
+
+    if profiler is not None:
+        profiling.disable()
+        profiler.log_summary()
+        logging.info("Profile saved to %s", profiler.write(run_dir))
 
     return run_dir, img_dir_path
 
 def launch() -> None:
     """Launch the parameter selection window."""
+    # imported here so headless runs never load Tk
+    import tkinter as tk
+    from tkinter import filedialog, messagebox, ttk
+
     cfg = Config.from_file(None)
     root = tk.Tk()
     root.title("YOLO Model Test")
@@ -2,6 +2,7 @@
 
 from __future__ import annotations
 
+import hashlib
 from pathlib import Path
 from typing import Iterable, List
 
@@ -24,4 +25,12 @@ def list_images(directory: str | Path, exts: Iterable[str] | None = None) -> Lis
     for entry in Path(directory).rglob("*"):
         if entry.suffix.lower() in exts:
             results.append(str(entry))
-    return results
\ No newline at end of file
+    return results
+
+def file_digest(path: str | Path, algorithm: str = "sha256", chunk_size: int = 1 << 20) -> str:
+    """Return the hex digest of the contents of ``path``."""
+    h = hashlib.new(algorithm)
+    with open(path, "rb") as fh:
+        for block in iter(lambda: fh.read(chunk_size), b""):
+            h.update(block)
+    return h.hexdigest()
@@ -0,0 +1,40 @@
+"""Deferred imports of heavy optional dependencies.
+
+Importing matplotlib, OpenCV or ONNX Runtime costs a noticeable fraction
+of a second each, so modules that only need them on some code paths
+import them through these helpers on first use instead of at import time.
+"""
+
+from __future__ import annotations
+
+import functools
+import importlib
+import importlib.util
+from types import ModuleType
+
+
+@functools.lru_cache(maxsize=None)
+def optional_import(name: str) -> ModuleType | None:
+    """Import module ``name`` on first use; ``None`` if it is not available."""
+    try:
+        return importlib.import_module(name)
+    except Exception:  # pragma: no cover - optional dependency may not be installed
+        return None
+
+
+def available(name: str) -> bool:
+    """Whether module ``name`` is installed, without importing it."""
+    try:
+        return importlib.util.find_spec(name) is not None
+    except (ImportError, ValueError):
+        return False
+
+
+@functools.lru_cache(maxsize=None)
+def pyplot() -> ModuleType | None:
+    """``matplotlib.pyplot`` on the non-GUI Agg backend, or ``None``."""
+    matplotlib = optional_import("matplotlib")
+    if matplotlib is None:
+        return None
+    matplotlib.use("Agg")  # use a non-GUI backend to avoid warnings
+    return optional_import("matplotlib.pyplot")
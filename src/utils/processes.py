@@ -0,0 +1,24 @@
+"""Process pools that are safe to start from a multi-threaded process."""
+
+from __future__ import annotations
+
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any
+
+
+def spawn_pool(max_workers: int, **kwargs: Any) -> ProcessPoolExecutor:
+    """Return a :class:`ProcessPoolExecutor` whose workers are spawned.
+
+    By the time a pool is started, torch or ONNX Runtime may be running
+    intra-op threads next to the prefetch and batching threads. A forked
+    child copies the locks those threads hold and can deadlock on them,
+    while a spawned one starts a fresh interpreter. Task functions must
+    therefore be importable and their arguments picklable. ``kwargs`` go
+    to the executor.
+    """
+    return ProcessPoolExecutor(
+        max_workers=max_workers,
+        mp_context=multiprocessing.get_context("spawn"),
+        **kwargs,
+    )
@@ -0,0 +1,216 @@
+"""Lightweight per-stage timing of evaluation runs.
+
+Code marks the stages of a run with :func:`span`::
+
+    with span("decode", items=1):
+        image = load_image(path)
+    with span("inference", items=len(batch)):
+        outputs = engine.infer(batch)
+
+Nothing is recorded until :func:`enable` installs a :class:`Profiler`;
+until then :func:`span` returns a shared no-op context manager, so the
+instrumentation costs one function call per span. Spans may nest and may
+be opened from any thread. Work done in other processes (inference
+workers, render workers) is not seen, only the time spent waiting for it.
+"""
+
+from __future__ import annotations
+
+import json
+import logging
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Dict, List, Sequence, Tuple
+
+PROFILE_NAME = "profile.json"
+TRACE_NAME = "trace.json"
+PERCENTILES = (50, 95, 99)
+
+
+class _NullSpan:
+    __slots__ = ()
+
+    def __enter__(self) -> "_NullSpan":
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        return None
+
+
+_NULL = _NullSpan()
+
+
+class _Span:
+    __slots__ = ("profiler", "name", "items", "start")
+
+    def __init__(self, profiler: "Profiler", name: str, items: int | None) -> None:
+        self.profiler = profiler
+        self.name = name
+        self.items = items
+
+    def __enter__(self) -> "_Span":
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *exc: object) -> None:
+        self.profiler.record(self.name, self.start, time.perf_counter() - self.start, self.items)
+
+
+def _weighted_percentiles(samples: Sequence[Tuple[float, int]], percentiles: Sequence[int]) -> Dict[str, float]:
+    """Percentiles of per-item values given as ``(value, item count)`` pairs."""
+    ordered = sorted(s for s in samples if s[1] > 0)
+    total = sum(n for _, n in ordered)
+    out: Dict[str, float] = {}
+    if not total:
+        return out
+    for p in percentiles:
+        rank = p / 100 * total
+        seen = 0
+        for value, n in ordered:
+            seen += n
+            if seen >= rank:
+                break
+        out[f"p{p}"] = value
+    return out
+
+
+def peak_rss_mb() -> Dict[str, float | None]:
+    """Peak resident set size of this process and of its finished children."""
+    try:
+        import resource
+    except ImportError:  # pragma: no cover - not available on Windows
+        return {"self": None, "children": None}
+    # kilobytes on Linux, bytes on macOS
+    unit = 1 << 20 if sys.platform == "darwin" else 1 << 10
+    return {
+        "self": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * unit / (1 << 20),
+        "children": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss * unit / (1 << 20),
+    }
+
+
+class Profiler:
+    """Collects the spans of one run.
+
+    Every span is kept as ``(name, start, duration, items, thread)``;
+    ``items`` is the number of images it covered (``None`` for stages that
+    are not per image), which turns span times into per-image latencies.
+    With ``trace`` :meth:`write` also exports the spans in the Chrome trace
+    event format.
+    """
+
+    def __init__(self, trace: bool = False) -> None:
+        self.trace = trace
+        self.origin = time.perf_counter()
+        self.events: List[Tuple[str, float, float, int | None, int]] = []
+        self._lock = threading.Lock()
+
+    def span(self, name: str, items: int | None = None) -> _Span:
+        return _Span(self, name, items)
+
+    def record(self, name: str, start: float, duration: float, items: int | None = None) -> None:
+        """Add a span measured elsewhere (``start`` on the ``perf_counter`` clock)."""
+        with self._lock:
+            self.events.append((name, start, duration, items, threading.get_ident()))
+
+    def summary(self) -> dict:
+        """Per-stage totals and per-image latency percentiles in milliseconds."""
+        with self._lock:
+            events = list(self.events)
+        stages: Dict[str, dict] = {}
+        samples: Dict[str, List[Tuple[float, int]]] = {}
+        for name, _, duration, items, _ in events:
+            stage = stages.setdefault(name, {"count": 0, "total_s": 0.0, "items": 0, "max_ms": 0.0})
+            stage["count"] += 1
+            stage["total_s"] += duration
+            stage["max_ms"] = max(stage["max_ms"], duration * 1000)
+            if items:
+                stage["items"] += items
+                samples.setdefault(name, []).append((duration * 1000 / items, items))
+        wall = time.perf_counter() - self.origin
+        for name, stage in stages.items():
+            stage["share"] = stage["total_s"] / wall if wall else 0.0
+            if name in samples:
+                stage["per_image_ms"] = _weighted_percentiles(samples[name], PERCENTILES)
+        order = sorted(stages, key=lambda n: -stages[n]["total_s"])
+        return {
+            "wall_s": wall,
+            "peak_rss_mb": peak_rss_mb(),
+            "pid": os.getpid(),
+            "stages": {name: stages[name] for name in order},
+        }
+
+    def chrome_trace(self) -> dict:
+        """The spans as complete (``"X"``) events for ``chrome://tracing``/Perfetto."""
+        with self._lock:
+            events = list(self.events)
+        pid = os.getpid()
+        return {
+            "traceEvents": [
+                {
+                    "name": name,
+                    "ph": "X",
+                    "ts": (start - self.origin) * 1e6,
+                    "dur": duration * 1e6,
+                    "pid": pid,
+                    "tid": tid,
+                    "args": {"items": items} if items else {},
+                }
+                for name, start, duration, items, tid in events
+            ],
+            "displayTimeUnit": "ms",
+        }
+
+    def write(self, run_dir: str | Path) -> Path:
+        """Write ``profile.json`` (and ``trace.json`` with ``trace``) to ``run_dir``."""
+        run_dir = Path(run_dir)
+        summary = self.summary()
+        path = run_dir / PROFILE_NAME
+        with path.open("w", encoding="utf-8") as fh:
+            json.dump(summary, fh, indent=2)
+        if self.trace:
+            with (run_dir / TRACE_NAME).open("w", encoding="utf-8") as fh:
+                json.dump(self.chrome_trace(), fh)
+        return path
+
+    def log_summary(self) -> None:
+        summary = self.summary()
+        logging.info("Profile (%.2fs wall):", summary["wall_s"])
+        for name, stage in summary["stages"].items():
+            line = f"  {name:<20} {stage['total_s']:8.3f}s {stage['share'] * 100:5.1f}%"
+            pct = stage.get("per_image_ms")
+            if pct:
+                line += "  per image " + " ".join(f"{k} {v:.2f}ms" for k, v in pct.items())
+            logging.info(line)
+        rss = summary["peak_rss_mb"]["self"]
+        if rss is not None:
+            logging.info("  peak RSS %.0f MB", rss)
+
+
+_active: Profiler | None = None
+
+
+def enable(trace: bool = False) -> Profiler:
+    """Start recording spans into a new :class:`Profiler` and return it."""
+    global _active
+    _active = Profiler(trace)
+    return _active
+
+
+def disable() -> None:
+    global _active
+    _active = None
+
+
+def active() -> Profiler | None:
+    return _active
+
+
+def span(name: str, items: int | None = None):
+    """Context manager timing stage ``name``, optionally over ``items`` images."""
+    profiler = _active
+    if profiler is None:
+        return _NULL
+    return _Span(profiler, name, items)
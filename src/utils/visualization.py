@@ -2,11 +2,17 @@
 
 from __future__ import annotations
 
-from typing import Dict, Iterable, List, Tuple
+import functools
+import logging
+from collections import deque
+from concurrent.futures import Future
+from pathlib import Path
+from typing import Callable, Deque, Dict, Iterable, List, Mapping, Sequence, Tuple
 
 from PIL import Image, ImageDraw, ImageFont
 
 from src.datasets.xml_loader import Box
+from src.utils.processes import spawn_pool
 
 # simple palette of distinct colors
 _PALETTE: List[Tuple[int, int, int]] = [
@@ -23,12 +29,15 @@ _PALETTE: List[Tuple[int, int, int]] = [
 
 _LABEL_COLORS: Dict[str, Tuple[int, int, int]] = {}
 
-try:
-    _FONT = ImageFont.truetype("DejaVuSans.ttf", 20)
-    print("truetype 字体加载成功！")
-except Exception as e:
-    print("truetype 字体加载失败，进入 except。错误：", e)
-    _FONT = ImageFont.load_default()
+
+@functools.lru_cache(maxsize=None)
+def _font() -> ImageFont.ImageFont:
+    """Label font, loaded the first time a box is drawn."""
+    try:
+        return ImageFont.truetype("DejaVuSans.ttf", 20)
+    except Exception as exc:
+        logging.debug("TrueType font unavailable, using the default font: %s", exc)
+        return ImageFont.load_default()
 
 
 def get_color(label: str) -> Tuple[int, int, int]:
@@ -38,13 +47,138 @@ def get_color(label: str) -> Tuple[int, int, int]:
     return _LABEL_COLORS[label]
 
 
-def draw_boxes(image: Image.Image, boxes: Iterable[Box]) -> None:
-    """Draw ``boxes`` on ``image`` in-place."""
+def draw_boxes(
+    image: Image.Image,
+    boxes: Iterable[Box],
+    colors: Mapping[str, Tuple[int, int, int]] | None = None,
+) -> None:
+    """Draw ``boxes`` on ``image`` in-place.
+
+    ``colors`` maps labels to colors; labels missing from it use
+    :func:`get_color`.
+    """
     draw = ImageDraw.Draw(image)
     for b in boxes:
-        color = get_color(b.label)
+        color = colors[b.label] if colors and b.label in colors else get_color(b.label)
         draw.rectangle([b.xmin, b.ymin, b.xmax, b.ymax], outline=color, width=2)
         label = b.label
         if b.confidence is not None:
             label += f" {b.confidence:.2f}"
-        draw.text((b.xmin, b.ymin), label, fill=color, font=_FONT)
+        draw.text((b.xmin, b.ymin), label, fill=color, font=_font())
+
+
+_JPEG_EXTS = (".jpg", ".jpeg")
+
+
+def render_image(
+    image_path: str,
+    out_path: str | Path,
+    boxes: Sequence[Box],
+    colors: Mapping[str, Tuple[int, int, int]] | None = None,
+    quality: int | None = None,
+    max_size: int | None = None,
+) -> None:
+    """Draw ``boxes`` on the image at ``image_path`` and save it to ``out_path``.
+
+    With ``max_size`` the annotated image is shrunk to fit a square of that
+    many pixels; ``quality`` sets the JPEG quality (PIL's default if unset).
+    """
+    img = Image.open(image_path).convert("RGB")
+    draw_boxes(img, boxes, colors)
+    if max_size:
+        img.thumbnail((max_size, max_size))
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    params = {}
+    if quality is not None and out_path.suffix.lower() in _JPEG_EXTS:
+        params["quality"] = quality
+    img.save(out_path, **params)
+
+
+class RenderPool:
+    """Renders annotated images in worker processes while inference runs.
+
+    Batches of predictions are handed over with :meth:`add` in whatever
+    order they finish and images are submitted in ``image_paths`` order,
+    assigning label colors in the parent exactly as a sequential loop
+    over the final predictions would. :meth:`finish` renders whatever was
+    not added (for example images restored from a resumed run) and waits
+    for all workers. With ``workers=0`` images are rendered inline.
+    """
+
+    def __init__(
+        self,
+        image_paths: Sequence[str],
+        root_dir: str | Path,
+        out_dir: str | Path,
+        workers: int = 2,
+        min_conf: float | None = None,
+        quality: int | None = None,
+        max_size: int | None = None,
+        progress_cb: Callable[[int, int], None] | None = None,
+    ) -> None:
+        self.image_paths = list(dict.fromkeys(image_paths))
+        self.root_dir = Path(root_dir)
+        self.out_dir = Path(out_dir)
+        self.min_conf = min_conf
+        self.quality = quality
+        self.max_size = max_size
+        self.progress_cb = progress_cb
+        self._pos = {p: i for i, p in enumerate(self.image_paths)}
+        self._ready: Dict[int, List[Box]] = {}
+        self._next = 0
+        self._done = 0
+        self._max_pending = max(1, workers) * 4
+        self._pending: Deque[Future] = deque()
+        self._pool = spawn_pool(workers) if workers > 0 else None
+
+    def add(self, predictions: Mapping[str, List[Box]]) -> None:
+        """Queue the images of ``predictions`` for rendering."""
+        for path, boxes in predictions.items():
+            i = self._pos.get(path)
+            if i is not None and i >= self._next:
+                if self.min_conf is not None:
+                    boxes = [b for b in boxes if b.confidence is None or b.confidence >= self.min_conf]
+                self._ready[i] = boxes
+        while self._next in self._ready:
+            self._submit(self.image_paths[self._next], self._ready.pop(self._next))
+            self._next += 1
+
+    def _submit(self, image_path: str, boxes: List[Box]) -> None:
+        out_path = self.out_dir / Path(image_path).relative_to(self.root_dir)
+        colors = {b.label: get_color(b.label) for b in boxes}
+        args = (image_path, out_path, boxes, colors, self.quality, self.max_size)
+        if self._pool is None:
+            render_image(*args)
+            self._advance()
+            return
+        self._pending.append(self._pool.submit(render_image, *args))
+        while len(self._pending) > self._max_pending:
+            self._pending.popleft().result()
+            self._advance()
+
+    def _advance(self) -> None:
+        self._done += 1
+        if self.progress_cb:
+            self.progress_cb(self._done, len(self.image_paths))
+
+    def finish(self, predictions: Mapping[str, List[Box]]) -> int:
+        """Render the images not added yet from ``predictions`` and wait."""
+        missing = {
+            p: predictions[p]
+            for p in self.image_paths[self._next :]
+            if self._pos[p] not in self._ready and p in predictions
+        }
+        if missing:
+            logging.info("Rendering %d images not streamed during inference", len(missing))
+            self.add(missing)
+        while self._pending:
+            self._pending.popleft().result()
+            self._advance()
+        self.close()
+        return self._done
+
+    def close(self) -> None:
+        if self._pool is not None:
+            self._pool.shutdown(wait=True, cancel_futures=True)
+            self._pool = None
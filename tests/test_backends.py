@@ -0,0 +1,39 @@
+import numpy as np
+import pytest
+
+from src.inference.backends import Backend, letterbox, resolve_backend, trim_padding
+
+
+def test_backend_without_infer_cannot_be_created():
+    class Incomplete(Backend):
+        names = ["car"]
+
+    with pytest.raises(TypeError):
+        Incomplete()
+
+
+@pytest.mark.parametrize("shape", [(480, 480), (333, 517), (1000, 250), (241, 377), (1080, 1920)])
+def test_trim_padding_matches_ultralytics_letterbox(shape):
+    augment = pytest.importorskip("ultralytics.data.augment")
+    image = np.random.default_rng(0).integers(0, 256, (*shape, 3), dtype=np.uint8)
+    boxed, scale, pad = letterbox(image, (192, 320))
+    trimmed, meta = trim_padding(boxed[None], [(scale, pad, shape)], 32)
+    expected = augment.LetterBox((192, 320), auto=True, stride=32)(image=image)
+    assert np.array_equal(trimmed[0], expected)
+    assert meta[0][0] == scale and meta[0][2] == shape
+
+
+def test_trim_padding_leaves_mixed_shapes():
+    images = [np.zeros((192, 320, 3), np.uint8)] * 2
+    meta = [(0.4, (64, 0), (480, 480)), (0.5, (0, 20), (300, 640))]
+    trimmed, out = trim_padding(images, meta, 32)
+    assert trimmed is images and out == meta
+
+
+def test_resolve_backend():
+    pytest.importorskip("onnxruntime")
+    assert resolve_backend("m.onnx") == "onnxruntime"
+    assert resolve_backend("m.pt") == "ultralytics"
+    assert resolve_backend("m.onnx", "ultralytics") == "ultralytics"
+    with pytest.raises(ValueError):
+        resolve_backend("m.pt", "tensorrt")
@@ -0,0 +1,17 @@
+from PIL import Image
+
+from src.metrics.confusion import DEFAULT_DPI, plot_confusion_matrix
+
+
+def test_plot_uses_default_resolution(tmp_path):
+    path = tmp_path / "cm.png"
+    plot_confusion_matrix([[3, 1], [0, 2]], ["car", "dog"], save_path=str(path))
+    with Image.open(path) as img:
+        assert img.size == (12 * DEFAULT_DPI, 10 * DEFAULT_DPI)
+
+
+def test_plot_resolution_can_be_raised(tmp_path):
+    path = tmp_path / "cm.png"
+    plot_confusion_matrix([[3, 1], [0, 2]], ["car", "dog"], save_path=str(path), dpi=300)
+    with Image.open(path) as img:
+        assert img.size == (12 * 300, 10 * 300)
@@ -0,0 +1,51 @@
+import numpy as np
+
+from src.datasets.detections import DetectionTable, gather_rows
+from src.datasets.xml_loader import Annotation, Box
+from src.metrics.evaluator import Evaluator
+
+
+def test_gather_rows_of_empty_table():
+    rows, counts = gather_rows(np.zeros(1, dtype=np.int64), np.array([-1, -1]))
+    assert rows.tolist() == []
+    assert counts.tolist() == [0, 0]
+
+
+def test_gather_rows_skips_missing_images():
+    table = DetectionTable.from_mapping(
+        {"a.jpg": [Box("car", 0, 0, 1, 1, 0.5)] * 2, "b.jpg": [Box("dog", 0, 0, 1, 1, 0.5)]}
+    )
+    rows, counts = gather_rows(table.offsets, np.array([1, -1, 0]))
+    assert rows.tolist() == [2, 0, 1]
+    assert counts.tolist() == [1, 0, 2]
+
+
+def test_evaluate_without_predictions():
+    anns = [
+        Annotation("a.jpg", [Box("car", 0, 0, 10, 10), Box("dog", 5, 5, 20, 20)]),
+        Annotation("b.jpg", []),
+    ]
+    result = Evaluator().evaluate(anns, {})
+    assert (result.tp, result.fp, result.fn) == (0, 0, 2)
+    assert (result.precision, result.recall, result.f1, result.map50) == (0.0, 0.0, 0.0, 0.0)
+    assert result.labels == ["car", "dog", "background"]
+    assert result.confusion_matrix == [[0, 0, 1], [0, 0, 1], [0, 0, 0]]
+
+
+def test_evaluate_empty_run():
+    result = Evaluator().evaluate([], {})
+    assert (result.tp, result.fp, result.fn) == (0, 0, 0)
+    assert result.map50 == 0.0
+
+
+def test_filter_matches_python_comparison_at_the_threshold():
+    # float32 values just below, at and above thresholds that float32 rounds down or up
+    confs = []
+    for t in (0.1, 0.3, 0.7, 0.57):
+        c = np.float32(t)
+        confs += [float(np.nextafter(c, np.float32(0))), float(c), float(np.nextafter(c, np.float32(1)))]
+    boxes = [Box("car", 0, 0, 1, 1, c) for c in confs]
+    table = DetectionTable.from_mapping({"a.jpg": boxes})
+    for t in (0.1, 0.3, 0.7, 0.57):
+        expected = [b.confidence for b in boxes if b.confidence >= t]
+        assert [b.confidence for b in table.filter(t)["a.jpg"]] == expected
@@ -0,0 +1,119 @@
+import numpy as np
+import pytest
+
+from src.datasets.detections import DetectionTable
+from src.datasets.xml_loader import Annotation, Box
+from src.metrics.evaluator import Evaluator, iou
+
+
+def _baseline_counts(annotations, predictions, iou_threshold=0.5, class_names=None):
+    """TP/FP/FN and confusion matrix of the original per-box matching loop."""
+    if class_names is not None:
+        labels = list(class_names)
+    else:
+        labels = sorted(
+            {b.label for ann in annotations for b in ann.boxes}
+            | {b.label for boxes in predictions.values() for b in boxes}
+        )
+    labels.append("background")
+    bg = len(labels) - 1
+    idx = {l: i for i, l in enumerate(labels)}
+    confusion = [[0] * len(labels) for _ in labels]
+    tp = fp = fn = 0
+    for ann in annotations:
+        gts = [b for b in ann.boxes if class_names is None or b.label in class_names]
+        preds = [b for b in predictions.get(ann.image_path, []) if class_names is None or b.label in class_names]
+        matched = set()
+        for pred in preds:
+            best_i, best_j = 0.0, -1
+            for j, gt in enumerate(gts):
+                if j in matched:
+                    continue
+                v = iou(pred, gt)
+                if v >= iou_threshold and v > best_i:
+                    best_i, best_j = v, j
+            if best_j >= 0:
+                matched.add(best_j)
+                tp += 1
+                confusion[idx.get(gts[best_j].label, bg)][idx.get(pred.label, bg)] += 1
+            else:
+                fp += 1
+                confusion[bg][idx.get(pred.label, bg)] += 1
+        for j, gt in enumerate(gts):
+            if j not in matched:
+                fn += 1
+                confusion[idx.get(gt.label, bg)][bg] += 1
+    return tp, fp, fn, confusion
+
+
+def _dataset(seed=0, images=30, float32_ties=False, crowded=0):
+    """Random overlapping boxes of three classes; with ``float32_ties`` the
+    confidences sit on or next to the float32 rounding of 0.01-step thresholds."""
+    rng = np.random.default_rng(seed)
+    labels = ["car", "dog", "person"]
+    steps = np.round(np.arange(0.0, 1.0, 0.01), 2)
+    annotations, predictions = [], {}
+    for i in range(images):
+        path = f"img{i}.jpg"
+        gts = []
+        for _ in range(rng.integers(0, 5) + crowded):
+            x, y = rng.integers(0, 80, size=2)
+            w, h = rng.integers(5, 30, size=2)
+            gts.append(Box(str(rng.choice(labels)), int(x), int(y), int(x + w), int(y + h)))
+        preds = []
+        for _ in range(rng.integers(0, 7) + crowded):
+            if gts and rng.random() < 0.7:
+                g = gts[rng.integers(len(gts))]
+                dx, dy = rng.integers(-4, 5, size=2)
+                x1, y1, x2, y2 = g.xmin + dx, g.ymin + dy, g.xmax + dx, g.ymax + dy
+            else:
+                x1, y1 = rng.integers(0, 80, size=2)
+                x2, y2 = x1 + rng.integers(5, 30), y1 + rng.integers(5, 30)
+            if float32_ties:
+                c = np.float32(rng.choice(steps))
+                conf = float(np.nextafter(c, np.float32(rng.choice([0, 1])))) if rng.random() < 0.5 else float(c)
+            else:
+                conf = float(np.float32(rng.random()))
+            preds.append(Box(str(rng.choice(labels)), int(x1), int(y1), int(x2), int(y2), conf))
+        annotations.append(Annotation(path, gts))
+        # detectors return boxes by descending confidence
+        predictions[path] = sorted(preds, key=lambda b: -b.confidence)
+    return annotations, predictions
+
+
+def test_sweep_matches_filtered_evaluate_at_ties():
+    annotations, predictions = _dataset(float32_ties=True, images=60)
+    evaluator = Evaluator()
+    thresholds = np.round(np.arange(0.0, 1.0, 0.01), 2)
+    result = evaluator.sweep(annotations, predictions, thresholds)
+    for k, t in enumerate(thresholds):
+        # the baseline rule: ``>=`` on Python floats
+        kept = {p: [b for b in boxes if b.confidence >= t] for p, boxes in predictions.items()}
+        expected = evaluator.evaluate(annotations, kept)
+        assert result.confusion_matrices[k].tolist() == expected.confusion_matrix
+        assert result.precision[k] == expected.precision
+        assert result.recall[k] == expected.recall
+
+
+@pytest.mark.parametrize(
+    "seed, crowded, class_names",
+    [(0, 0, None), (1, 0, ["car", "dog"]), (2, 80, None)],
+)
+def test_evaluate_matches_baseline_loop(seed, crowded, class_names):
+    # ``crowded`` images exceed the dense-pair cut-off and take the IoU-matrix path
+    annotations, predictions = _dataset(seed, images=12 if crowded else 40, crowded=crowded)
+    result = Evaluator(0.5, class_names).evaluate(annotations, predictions)
+    tp, fp, fn, confusion = _baseline_counts(annotations, predictions, 0.5, class_names)
+    assert (result.tp, result.fp, result.fn) == (tp, fp, fn)
+    assert result.confusion_matrix == confusion
+
+
+def test_table_and_mapping_give_the_same_result():
+    annotations, predictions = _dataset(3)
+    evaluator = Evaluator()
+    table = DetectionTable.from_mapping(predictions)
+    assert dict(table.items()) == predictions
+    assert evaluator.evaluate(annotations, table) == evaluator.evaluate(annotations, predictions)
+    from_table = evaluator.sweep(annotations, table, [0.2, 0.6])
+    from_mapping = evaluator.sweep(annotations, predictions, [0.2, 0.6])
+    assert from_table.confusion_matrices.tolist() == from_mapping.confusion_matrices.tolist()
@@ -0,0 +1,163 @@
+"""ONNX Runtime against ultralytics on the same weights.
+
+The end-to-end check runs by default on a tiny detector built here as an
+ONNX graph, exported the way ultralytics exports: dynamic axes and the
+``names``/``stride`` metadata. ``PARITY_MODEL`` names an ``.onnx`` file to
+check instead and the optional ``PARITY_REFERENCE`` the weights it was
+exported from.
+"""
+
+import os
+from pathlib import Path
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from benchmarks.parity_onnx import check, compare
+from src.utils.file_utils import list_images
+
+ROOT = Path(__file__).resolve().parents[1]
+
+
+def _tiny_detector(path):
+    """Write a YOLOv8-style ``(N, 4 + 3, anchors)`` model to ``path``.
+
+    Every 16x16 cell is one anchor whose box size follows its green and
+    blue mean and whose red/green/blue scores follow how much that colour
+    dominates the cell. Scores also grow with the position relative to the
+    input width, so, like a real CNN, the output depends on how the image
+    is padded.
+    """
+    onnx = pytest.importorskip("onnx")
+    from onnx import TensorProto, helper, numpy_helper
+
+    nodes = []
+
+    def node(op, inputs, output, **attrs):
+        nodes.append(helper.make_node(op, inputs, [output], **attrs))
+        return output
+
+    def const(name, value, dtype=np.float32):
+        return node("Constant", [], name, value=numpy_helper.from_array(np.array(value, dtype=dtype), name))
+
+    cells = node("AveragePool", ["images"], "cells", kernel_shape=[16, 16], strides=[16, 16])
+    shape = node("Shape", [cells], "shape")
+    zero, one = const("zero", 0, np.int64), const("one", 1, np.int64)
+    centres = {}
+    for axis, dim, view in (("x", 3, [1, 1, 1, -1]), ("y", 2, [1, 1, -1, 1])):
+        count = node("Gather", [shape, const(f"dim_{axis}", dim, np.int64)], f"n_{axis}")
+        index = node("Cast", [node("Range", [zero, count, one], f"i_{axis}")], f"f_{axis}", to=TensorProto.FLOAT)
+        centre = node("Add", [index, const(f"half_{axis}", 0.5)], f"c_{axis}")
+        centre = node("Mul", [centre, const(f"stride_{axis}", 16.0)], f"px_{axis}")
+        centres[axis] = node("Reshape", [centre, const(f"view_{axis}", view, np.int64)], f"grid_{axis}")
+    channel = {}
+    for i in range(3):
+        bounds = [const(f"lo{i}", [i], np.int64), const(f"hi{i}", [i + 1], np.int64), const(f"ax{i}", [1], np.int64)]
+        channel[i] = node("Slice", [cells, *bounds], f"ch{i}")
+    batch_zero = node("Mul", [channel[0], const("nil", 0.0)], "batch_zero")
+    cx = node("Add", [centres["x"], batch_zero], "cx")
+    cy = node("Add", [centres["y"], batch_zero], "cy")
+    w = node("Add", [node("Mul", [channel[1], const("w_gain", 96.0)], "w0"), const("w_min", 16.0)], "w")
+    h = node("Add", [node("Mul", [channel[2], const("h_gain", 96.0)], "h0"), const("h_min", 16.0)], "h")
+    excess = node("Sub", [cells, node("ReduceMean", [cells], "grey", axes=[1], keepdims=1)], "excess")
+    logit = node("Add", [node("Mul", [excess, const("gain", 20.0)], "scaled"), const("bias", -2.0)], "logit0")
+    width = node("Cast", ["n_x"], "width", to=TensorProto.FLOAT)
+    position = node("Mul", [node("Div", [centres["x"], width], "rel_x"), const("pos_gain", 1 / 16)], "pos")
+    scores = node("Sigmoid", [node("Add", [logit, position], "logit")], "scores")
+    grid = node("Concat", [cx, cy, w, h, scores], "grid", axis=1)
+    node("Reshape", [grid, const("flat", [0, 7, -1], np.int64)], "output0")
+
+    graph = helper.make_graph(
+        nodes,
+        "tiny_detector",
+        [helper.make_tensor_value_info("images", TensorProto.FLOAT, ["batch", 3, "height", "width"])],
+        [helper.make_tensor_value_info("output0", TensorProto.FLOAT, ["batch", 7, "anchors"])],
+    )
+    model = helper.make_model(graph, opset_imports=[helper.make_opsetid("", 17)])
+    model.ir_version = 8
+    metadata = {
+        "task": "detect",
+        "stride": "32",
+        "batch": "1",
+        "imgsz": "[192, 320]",
+        "names": str({0: "red", 1: "green", 2: "blue"}),
+        "args": str({"dynamic": True, "nms": False}),
+    }
+    for key, value in metadata.items():
+        model.metadata_props.append(onnx.StringStringEntryProto(key=key, value=value))
+    onnx.checker.check_model(model)
+    onnx.save(model, str(path))
+    return str(path)
+
+
+@pytest.fixture(scope="session")
+def tiny_model(tmp_path_factory):
+    return _tiny_detector(tmp_path_factory.mktemp("model") / "tiny.onnx")
+
+
+@pytest.fixture(scope="session")
+def parity_images(tmp_path_factory):
+    """Coloured rectangles on grey; the first four share a shape, so they
+    are batched with reduced padding, the rest mix shapes and odd padding."""
+    root = tmp_path_factory.mktemp("images")
+    rng = np.random.default_rng(0)
+    shapes = [(480, 480)] * 4 + [(300, 800), (600, 400), (333, 517), (333, 517), (1000, 250), (241, 377)]
+    paths = []
+    for i, (h, w) in enumerate(shapes):
+        image = np.full((h, w, 3), 114, dtype=np.uint8)
+        for _ in range(8):
+            y, x = rng.integers(0, h - 40), rng.integers(0, w - 40)
+            image[y : y + rng.integers(20, 120), x : x + rng.integers(20, 160)] = rng.integers(0, 256, 3)
+        path = root / f"{i}.jpg"
+        Image.fromarray(image).save(path, quality=95)
+        paths.append(str(path))
+    return paths + sorted(list_images(str(ROOT / "test_data")))
+
+
+def _detections(rows):
+    rows = np.array(rows, dtype=np.float32).reshape(-1, 6)
+    return rows[:, :4], rows[:, 4], rows[:, 5]
+
+
+def test_compare_pairs_boxes_by_class_and_iou():
+    ref = _detections([[0, 0, 10, 10, 0, 0.9], [20, 20, 40, 40, 1, 0.8]])
+    out = _detections([[21, 20, 40, 41, 1, 0.79], [0, 0, 10, 10, 0, 0.9]])
+    unmatched, dxy, dconf = compare(ref, out, min_iou=0.8)
+    assert unmatched == 0
+    assert dxy == pytest.approx(1.0)
+    assert dconf == pytest.approx(0.01)
+
+
+def test_compare_ignores_only_borderline_extras():
+    ref = _detections([[0, 0, 10, 10, 0, 0.9], [50, 50, 60, 60, 0, 0.26]])
+    out = _detections([[0, 0, 10, 10, 1, 0.9]])  # same box, other class
+    assert compare(ref, out, 0.8, borderline=0.27)[0] == 2
+    ref = _detections([[0, 0, 10, 10, 0, 0.9], [50, 50, 60, 60, 0, 0.26]])
+    out = _detections([[0, 0, 10, 10, 0, 0.9]])
+    assert compare(ref, out, 0.8, borderline=0.27)[0] == 0
+
+
+def _assert_parity(stats):
+    assert stats["names_equal"]
+    assert stats["boxes"] > 0
+    assert stats["unmatched"] == 0
+    assert stats["max_dxy"] <= 2.0
+    assert stats["max_dconf"] <= 0.02
+
+
+@pytest.mark.parametrize("batch_size", [1, 4])
+def test_onnxruntime_matches_ultralytics(tiny_model, parity_images, batch_size):
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("ultralytics")
+    _assert_parity(check(tiny_model, parity_images, batch_size=batch_size))
+
+
+def test_onnxruntime_matches_ultralytics_on_given_weights():
+    model = os.environ.get("PARITY_MODEL")
+    if model is None or not Path(model).exists():
+        pytest.skip("set PARITY_MODEL to an exported .onnx file")
+    pytest.importorskip("onnxruntime")
+    pytest.importorskip("ultralytics")
+    paths = sorted(list_images(str(ROOT / "test_data")))[:50]
+    _assert_parity(check(model, paths, os.environ.get("PARITY_REFERENCE"), batch_size=4))
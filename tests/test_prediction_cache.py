@@ -0,0 +1,22 @@
+import sqlite3
+
+from src.datasets.xml_loader import Box
+from src.inference.prediction_cache import CACHE_NAME, PredictionCache
+
+
+def test_running_total_tracks_the_table(tmp_path):
+    weights = tmp_path / "model.onnx"
+    weights.write_bytes(b"weights")
+    cache = PredictionCache(str(tmp_path), str(weights), (192, 320), 0.25, max_bytes=2000)
+    boxes = [Box("car", 1, 2, 3, 4, 0.5)] * 3
+    for i in range(50):
+        cache.put_many({f"{i}/{j}": boxes for j in range(3)})
+    # replacing an entry must not count it twice
+    cache.put_many({"49/0": boxes[:1]})
+    cache.close()
+
+    conn = sqlite3.connect(tmp_path / CACHE_NAME)
+    (total,) = conn.execute("SELECT total FROM stored").fetchone()
+    (actual,) = conn.execute("SELECT SUM(size) FROM predictions").fetchone()
+    assert total == actual <= 2000
+    conn.close()
@@ -0,0 +1,65 @@
+import threading
+import time
+
+import cv2
+import numpy as np
+from PIL import Image
+
+from src.inference.prefetch import ImagePrefetcher, load_image, load_image_reduced
+
+
+def _rotated_jpeg(path, orientation=6, size=(40, 80)):
+    """A JPEG of ``size`` (h, w) whose EXIF tag asks for it to be shown rotated."""
+    pixels = np.zeros((*size, 3), dtype=np.uint8)
+    pixels[:, : size[1] // 2] = (255, 0, 0)  # left half red
+    exif = Image.Exif()
+    exif[0x0112] = orientation
+    Image.fromarray(pixels).save(path, exif=exif, quality=95)
+    return str(path)
+
+
+def test_load_image_applies_exif_orientation(tmp_path):
+    path = _rotated_jpeg(tmp_path / "rotated.jpg")
+    image = load_image(path)
+    reference = cv2.imread(path)
+    assert image.shape == reference.shape == (80, 40, 3)
+    # same orientation and channel order as cv2, up to JPEG decoder noise
+    assert np.abs(image.astype(int) - reference.astype(int)).max() <= 8
+
+
+def test_load_image_reduced_applies_exif_orientation(tmp_path):
+    path = _rotated_jpeg(tmp_path / "rotated.jpg", size=(800, 1600))
+    image, scale = load_image_reduced(path, (192, 320))
+    assert scale == 4
+    assert image.shape == (400, 200, 3)
+    reference = cv2.resize(cv2.imread(path), (200, 400), interpolation=cv2.INTER_AREA)
+    assert np.abs(image.astype(int) - reference.astype(int)).mean() < 4
+
+
+def test_load_image_without_orientation(tmp_path):
+    path = tmp_path / "plain.png"
+    Image.fromarray(np.full((30, 50, 3), (10, 20, 30), dtype=np.uint8)).save(path)
+    image = load_image(str(path))
+    assert image.shape == (30, 50, 3)
+    assert image[0, 0].tolist() == [30, 20, 10]
+
+
+def test_prefetcher_keeps_at_most_depth_batches_ahead():
+    loaded = []
+    lock = threading.Lock()
+
+    def loader(path):
+        with lock:
+            loaded.append(path)
+        return path
+
+    paths = [str(i) for i in range(40)]
+    prefetcher = ImagePrefetcher(paths, batch_size=2, workers=2, depth=2, loader=loader)
+    out = []
+    for chunk, images in prefetcher:
+        time.sleep(0.05)  # let the producer run as far ahead as it can
+        with lock:
+            # the batch being consumed plus ``depth`` ahead of it
+            assert len(loaded) <= len(out) + 2 + 2 * 2
+        out.extend(images)
+    assert out == paths
@@ -0,0 +1,68 @@
+import numpy as np
+from PIL import Image
+
+from src.datasets.prediction_store import BOXES_NAME, IMAGES_NAME, PredictionWriter, load_predictions
+from src.inference.backends import Backend, read_image
+from src.inference.predictor import Predictor
+
+
+class ShapeBackend(Backend):
+    """Detections that depend only on the image, whatever batch it is in."""
+
+    names = ["car", "dog", "person"]
+
+    def __init__(self):
+        self.seen = []
+
+    def infer(self, sources):
+        out = []
+        for src in sources:
+            self.seen.append(src)
+            h, w = read_image(src).shape[:2]
+            rng = np.random.default_rng((h, w))
+            n = int(rng.integers(0, 5))
+            xy = rng.uniform(0, [w / 2, h / 2], size=(n, 2))
+            xyxy = np.concatenate([xy, xy + [w / 4, h / 4]], axis=1).astype(np.float32)
+            cls = rng.integers(0, len(self.names), n).astype(np.float32)
+            conf = rng.uniform(0.0, 1.0, n).astype(np.float32)
+            out.append((xyxy, cls, conf))
+        return out
+
+
+def _images(root, n):
+    paths = []
+    for i in range(n):
+        path = root / f"{i}.png"
+        Image.fromarray(np.zeros((40 + 3 * i, 60 + 5 * i, 3), dtype=np.uint8)).save(path)
+        paths.append(str(path))
+    return paths
+
+
+def _run(paths, store, resume=False, engine=None):
+    engine = engine or ShapeBackend()
+    predictor = Predictor("stub", batch_size=2, prefetch_depth=0, engine=engine)
+    with PredictionWriter(
+        store, predictor.names, text_path=store / "predictions.txt", text_min_conf=0.25, resume=resume
+    ) as writer:
+        return predictor.predict_all(paths, batch_cb=writer.write, completed=writer.completed)
+
+
+def test_resumed_run_matches_an_uninterrupted_one(tmp_path):
+    paths = _images(tmp_path, 9)
+    full = _run(paths, tmp_path / "full")
+
+    store = tmp_path / "resumed"
+    _run(paths[:5], store)
+    # a crash mid-batch leaves half a record and half an index line behind
+    with (store / BOXES_NAME).open("ab") as fh:
+        fh.write(b"\x01" * 7)
+    with (store / IMAGES_NAME).open("a", encoding="utf-8") as fh:
+        fh.write("99\tpartial")
+    engine = ShapeBackend()
+    resumed = _run(paths, store, resume=True, engine=engine)
+
+    assert engine.seen == paths[5:]
+    for table in (resumed, load_predictions(store)):
+        assert table.image_paths == full.image_paths
+        assert dict(table.items()) == dict(full.items())
+    assert (store / "predictions.txt").read_text() == (tmp_path / "full" / "predictions.txt").read_text()
@@ -0,0 +1,80 @@
+import io
+import json
+import socket
+import threading
+from http.server import ThreadingHTTPServer
+
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.inference.backends import Backend
+from src.inference.predictor import Predictor
+from src.serve import MAX_BODY_BYTES, MicroBatcher, make_handler
+
+
+class OneBoxBackend(Backend):
+    names = ["car"]
+
+    def infer(self, sources):
+        box = np.array([[1, 2, 10, 12]], dtype=np.float32)
+        return [(box, np.zeros(1, np.float32), np.full(1, 0.9, np.float32)) for _ in sources]
+
+
+@pytest.fixture
+def server():
+    predictor = Predictor("stub", batch_size=4, prefetch_depth=0, engine=OneBoxBackend())
+    batcher = MicroBatcher(predictor, 4, max_wait_ms=1)
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(batcher, {}))
+    httpd.daemon_threads = True
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield httpd.server_address
+    httpd.shutdown()
+    httpd.server_close()
+    batcher.close()
+
+
+def _post(address, headers, body=b""):
+    head = "".join(f"{k}: {v}\r\n" for k, v in headers.items())
+    with socket.create_connection(address, timeout=10) as sock:
+        sock.sendall(f"POST /predict HTTP/1.1\r\nHost: x\r\n{head}\r\n".encode() + body)
+        data = b""
+        while chunk := sock.recv(65536):
+            data += chunk
+            if b"\r\n\r\n" in data:
+                head, _, rest = data.partition(b"\r\n\r\n")
+                length = int([l for l in head.split(b"\r\n") if l.lower().startswith(b"content-length")][0].split(b":")[1])
+                if len(rest) >= length:
+                    break
+    status = int(data.split(b" ", 2)[1])
+    return status, json.loads(data.partition(b"\r\n\r\n")[2])
+
+
+def _png():
+    buf = io.BytesIO()
+    Image.fromarray(np.zeros((20, 30, 3), dtype=np.uint8)).save(buf, format="PNG")
+    return buf.getvalue()
+
+
+@pytest.mark.parametrize(
+    "headers, status",
+    [
+        ({}, 411),
+        ({"Content-Length": "abc"}, 400),
+        ({"Content-Length": "-5"}, 400),
+        ({"Content-Length": "0"}, 400),
+        ({"Content-Length": str(MAX_BODY_BYTES + 1)}, 413),
+    ],
+)
+def test_bad_content_length_is_refused(server, headers, status):
+    code, body = _post(server, headers)
+    assert code == status
+    assert "error" in body
+
+
+def test_predict(server):
+    image = _png()
+    code, body = _post(server, {"Content-Length": len(image)}, image)
+    assert code == 200
+    assert [b["label"] for b in body["boxes"]] == ["car"]
@@ -0,0 +1,96 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from src.inference.backends import Backend, letterbox, read_image
+from src.inference.predictor import Predictor
+from src.inference.tensor_cache import TensorCache
+
+SIZE = (64, 96)
+
+
+class RecordingBackend(Backend):
+    """Keeps the letterboxed input of every image and detects nothing."""
+
+    names = ["car"]
+
+    def __init__(self):
+        self.inputs = []
+
+    def infer(self, sources):
+        for src in sources:
+            self.inputs.append(letterbox(read_image(src), SIZE)[0])
+        empty = np.zeros((0, 4), dtype=np.float32), np.zeros(0, np.float32), np.zeros(0, np.float32)
+        return [empty for _ in sources]
+
+
+def _images(root):
+    rng = np.random.default_rng(0)
+    paths = []
+    for i, orientation in enumerate([1, 6, 8]):
+        path = root / f"{i}.jpg"
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        pixels = rng.integers(0, 255, (120 + 10 * i, 200, 3), dtype=np.uint8)
+        Image.fromarray(pixels).save(path, exif=exif, quality=90)
+        paths.append(str(path))
+    return paths
+
+
+def _inputs(paths, **kwargs):
+    engine = RecordingBackend()
+    Predictor("stub", image_size=SIZE, batch_size=2, engine=engine, **kwargs).predict_all(paths)
+    return engine.inputs
+
+
+@pytest.mark.parametrize("reduced_decode", [False, True])
+def test_tensor_cache_feeds_the_uncached_inputs(tmp_path, reduced_decode):
+    paths = _images(tmp_path)
+    expected = _inputs(paths, reduced_decode=reduced_decode)
+    cache_dir = str(tmp_path / "tensors")
+    for _ in range(2):  # filling the cache, then reading it
+        got = _inputs(paths, reduced_decode=reduced_decode, tensor_cache_dir=cache_dir)
+        assert len(got) == len(expected)
+        for a, b in zip(got, expected):
+            assert np.array_equal(a, b)
+
+
+def test_tensor_cache_records_the_upright_size(tmp_path):
+    paths = _images(tmp_path)
+    cache = TensorCache(str(tmp_path / "tensors"), paths, SIZE, reduced_decode=True)
+    assert [cache.load(p).meta[2] for p in paths] == [(120, 200), (200, 130), (200, 140)]
+
+
+def test_tensor_cache_feeds_ultralytics_the_uncached_inputs(tmp_path, monkeypatch):
+    ultralytics = pytest.importorskip("ultralytics")
+    from ultralytics.engine.predictor import BasePredictor
+
+    weights = str(tmp_path / "tiny.pt")
+    ultralytics.YOLO("yolov8n.yaml").save(weights)
+    rng = np.random.default_rng(1)
+    paths = []
+    for i, shape in enumerate([(480, 480)] * 4 + [(333, 517), (241, 377)]):
+        path = tmp_path / f"{i}.png"
+        Image.fromarray(rng.integers(0, 255, (*shape, 3), dtype=np.uint8)).save(path)
+        paths.append(str(path))
+
+    seen = []
+    preprocess = BasePredictor.preprocess
+
+    def record(self, im):
+        out = preprocess(self, im)
+        seen.extend(out.cpu().numpy())
+        return out
+
+    monkeypatch.setattr(BasePredictor, "preprocess", record)
+    runs = []
+    for cache_dir in (None, str(tmp_path / "tensors"), str(tmp_path / "tensors")):
+        seen.clear()
+        Predictor(weights, image_size=(192, 320), batch_size=4, tensor_cache_dir=cache_dir).predict_all(paths)
+        runs.append(list(seen))
+    expected = runs[0]
+    assert expected[0].shape[1:] == (192, 192)  # one shape: padded to the stride only
+    for got in runs[1:]:
+        assert len(got) == len(expected)
+        for a, b in zip(got, expected):
+            assert np.array_equal(a, b)
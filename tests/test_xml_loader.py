@@ -0,0 +1,37 @@
+import os
+
+import pytest
+
+from src.datasets.xml_loader import DatasetConsistencyError, load_dataset
+
+
+def _xml(path, filename=None):
+    name = f"<filename>{filename}</filename>" if filename else ""
+    path.write_text(
+        f"<annotation>{name}<object><name>car</name>"
+        "<bndbox><xmin>1</xmin><ymin>2</ymin><xmax>3</xmax><ymax>4</ymax></bndbox>"
+        "</object></annotation>",
+        encoding="utf-8",
+    )
+
+
+@pytest.mark.parametrize("use_index", [False, True])
+def test_xml_without_filename_is_accepted_at_any_depth(tmp_path, use_index):
+    sub = tmp_path / "sub"
+    sub.mkdir()
+    _xml(tmp_path / "root.xml")
+    _xml(sub / "nested.xml")
+    (sub / "a.jpg").write_bytes(b"")
+    _xml(sub / "a.xml", "a.jpg")
+    annotations = load_dataset(str(tmp_path), workers=1, use_index=use_index)
+    # as before, the folder of the XML stands in for the missing file name
+    assert sorted(os.path.normpath(a.image_path) for a in annotations) == sorted(
+        [str(tmp_path), str(sub), str(sub / "a.jpg")]
+    )
+
+
+def test_missing_image_is_reported(tmp_path):
+    _xml(tmp_path / "a.xml", "a.jpg")
+    with pytest.raises(DatasetConsistencyError) as info:
+        load_dataset(str(tmp_path), workers=1, use_index=False)
+    assert info.value.annotations == []